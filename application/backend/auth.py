@@ -1,10 +1,13 @@
 from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from jose import jwt  
 from datetime import datetime, timedelta
 from . import models, schemas
 from .database import get_db
+from .utils.db_writer import db_writer
+from .utils.passwords import password_hasher, PasswordHasherBusy
+from .utils.token_cache import token_cache
 from fastapi.security import OAuth2PasswordBearer
 import os 
 from dotenv import load_dotenv
@@ -16,19 +19,17 @@ ALGORITHM = os.getenv("ALGORITHM")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES"))
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 auth_router = APIRouter(prefix='/auth', tags=['auth'])
 
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def hash_password(password):
+    """Hash a password on the password hashing pool"""
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Server busy, try again shortly", headers={"Retry-After": "1"})
 
 
 def create_access_token(data: dict, expires_delta: timedelta = None):
@@ -38,29 +39,56 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
 
+def create_user_token(user):
+    """Access token for a user, keyed on the immutable id and the user's current token version"""
+    return create_access_token(data={"sub": str(user.id), "ver": user.token_version})
+
+
+def decode_access_token(token):
+    """Return the claims of a valid token, raises JWTError otherwise
+
+    Tokens that were already verified are served from token_cache until they expire.
+    """
+    claims = token_cache.get(token)
+    if claims is None:
+        claims = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        token_cache.set(token, claims)
+    return claims
+
+
 @auth_router.post("/register", response_model=schemas.Token)
-async def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    if db.query(models.User).filter(models.User.username == user.username).first():
+async def register(user: schemas.UserCreate, db: AsyncSession = Depends(get_db)):
+    if await db.scalar(select(models.User.id).where(models.User.username == user.username)):
         raise HTTPException(status_code=400, detail="Username already registered")
-    if db.query(models.User).filter(models.User.email == user.email).first():
+    if await db.scalar(select(models.User.id).where(models.User.email == user.email)):
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await hash_password(user.password)
     db_user = models.User(username=user.username, email=user.email, hashed_password=hashed_password)
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    access_token = create_access_token(data={"sub": db_user.username})
+    await db_writer.run(db.commit)
+    await db.refresh(db_user)
+    access_token = create_user_token(db_user)
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 @auth_router.post("/login", response_model=schemas.Token)
-async def login(form_data: schemas.UserLogin, db: Session = Depends(get_db)):
+async def login(form_data: schemas.UserLogin, db: AsyncSession = Depends(get_db)):
     if form_data.email is not None:
-        user = db.query(models.User).filter(models.User.email == form_data.email).first()
-        if not user or not verify_password(form_data.password, user.hashed_password):
+        user = await db.scalar(select(models.User).where(models.User.email == form_data.email))
+        if not user:
+            raise HTTPException(status_code=401, detail="Incorrect email or password")
+        try:
+            valid, new_hash = await password_hasher.verify_and_update(form_data.password, user.hashed_password)
+        except PasswordHasherBusy:
+            raise HTTPException(status_code=503, detail="Too many login attempts in progress, try again shortly", headers={"Retry-After": "1"})
+        if not valid:
             raise HTTPException(status_code=401, detail="Incorrect email or password")
-        access_token = create_access_token(data={"sub": user.username})
+        if new_hash is not None:
+            # The stored hash used another bcrypt cost, upgrade it while we have the plain password
+            user.hashed_password = new_hash
+            await db_writer.run(db.commit)
+        access_token = create_user_token(user)
         return {"access_token": access_token, "token_type": "bearer"}
     else:
         raise HTTPException(status_code=401, detail="Incorrect username or email")
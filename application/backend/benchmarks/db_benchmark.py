@@ -0,0 +1,151 @@
+"""Compare sync ORM calls inside async handlers with the async session layer under concurrent load
+
+Run from the application directory:
+
+    python -m backend.benchmarks.db_benchmark --requests 2000 --concurrency 50
+
+Each simulated request loads a user and one page of their history, like
+GET /tracker/history does. Besides throughput it reports the event loop lag,
+i.e. how late a 1 ms ticker wakes up while the requests are running: blocking
+sync calls stall every other coroutine on the loop.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from sqlalchemy import create_engine, select, insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import sessionmaker
+from ..database import async_database_url, sync_database_url, engine_options
+from ..migrations import upgrade_database
+from .. import models
+
+
+def seed(engine, users, entries_per_user):
+    with engine.begin() as connection:
+        connection.execute(insert(models.User), [
+            {"id": i, "username": f"bench{i}", "email": f"bench{i}@example.com", "hashed_password": "x"}
+            for i in range(1, users + 1)
+        ])
+        start = date(2024, 1, 1)
+        connection.execute(insert(models.TrackerEntry), [
+            {
+                "user_id": user_id,
+                "date": start + timedelta(days=day),
+                "sleep_hours": 7.0,
+                "sleep_quality": "Good",
+                "screen_time": 4.0,
+                "physical_activity": 30,
+                "social_interaction": 2.0,
+                "work_productivity": 7,
+                "weather": "Sunny",
+                "diet_quality": "Good",
+                "mood_score": 6.0,
+                "stress_level": 4.0,
+                "recommendation_status": "ready",
+            }
+            for user_id in range(1, users + 1)
+            for day in range(entries_per_user)
+        ])
+
+
+def history_query(user_id):
+    return (
+        select(models.TrackerEntry)
+        .where(models.TrackerEntry.user_id == user_id)
+        .order_by(models.TrackerEntry.date.desc(), models.TrackerEntry.id.desc())
+        .limit(5)
+    )
+
+
+async def measure_loop_lag(stop, lags, interval=0.001):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def run(handler, requests, concurrency, users):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, lags = [], []
+    stop = asyncio.Event()
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await handler(random.randint(1, users))
+            latencies.append(time.perf_counter() - start)
+
+    ticker = asyncio.create_task(measure_loop_lag(stop, lags))
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+    latencies.sort()
+    return {
+        "req/s": requests / elapsed,
+        "p50 ms": latencies[len(latencies) // 2] * 1000,
+        "p99 ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "max loop lag ms": max(lags, default=0) * 1000,
+        "mean loop lag ms": statistics.fmean(lags) * 1000 if lags else 0,
+    }
+
+
+async def benchmark(url, requests, concurrency, users):
+    sync_engine = create_engine(sync_database_url(url), **engine_options(sync_database_url(url)))
+    async_engine = create_async_engine(async_database_url(url), **engine_options(async_database_url(url)))
+    SyncSession = sessionmaker(bind=sync_engine)
+    AsyncSession = async_sessionmaker(async_engine, expire_on_commit=False)
+
+    async def sync_handler(user_id):
+        # What the routes did before: blocking ORM calls straight inside the coroutine
+        db = SyncSession()
+        try:
+            db.get(models.User, user_id)
+            db.scalars(history_query(user_id)).all()
+        finally:
+            db.close()
+
+    async def async_handler(user_id):
+        async with AsyncSession() as db:
+            await db.get(models.User, user_id)
+            (await db.scalars(history_query(user_id))).all()
+
+    try:
+        for name, handler in (("sync", sync_handler), ("async", async_handler)):
+            # Warm up the pool before measuring
+            await run(handler, concurrency, concurrency, users)
+            result = await run(handler, requests, concurrency, users)
+            print(f"{name:>5}: " + "  ".join(f"{key}={value:.2f}" for key, value in result.items()))
+    finally:
+        await async_engine.dispose()
+        sync_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Database URL to benchmark, a temporary SQLite file when omitted")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--entries-per-user", type=int, default=60)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.url
+        if url is None:
+            url = f"sqlite:///{os.path.join(tmp, 'benchmark.db')}"
+            engine = create_engine(url)
+            upgrade_database(engine)
+            seed(engine, args.users, args.entries_per_user)
+            engine.dispose()
+        asyncio.run(benchmark(url, args.requests, args.concurrency, args.users))
+
+
+if __name__ == "__main__":
+    main()
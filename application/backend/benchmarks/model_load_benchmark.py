@@ -0,0 +1,103 @@
+"""Per-worker cold start and memory of the joblib loader vs the memory-mapped compiled model
+
+Run from the application directory:
+
+    python -m backend.benchmarks.model_load_benchmark --workers 4
+
+Starts --workers processes per loader, the way uvicorn starts its workers, each
+loading the live model version and predicting one row. Cold start is the time
+from spawning the process to its first prediction. Memory is read from
+/proc/<pid>/smaps_rollup once every worker of a loader is up: RSS counts shared
+pages in every process, PSS splits them between the processes sharing them and
+private is what each extra worker really costs.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+ROW = (7.0, "Good", 4.0, 30, 2.0, 7, "Sunny", "Good")
+
+
+def memory():
+    """RSS, PSS and private memory of this process in MiB (Linux only)"""
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    return {
+        "rss": fields["Rss"],
+        "pss": fields["Pss"],
+        "private": fields["Private_Clean"] + fields["Private_Dirty"],
+    }
+
+
+def worker(loader, version):
+    start = time.perf_counter()
+    from ..utils.model_registry import ModelBundle, model_registry
+    base = memory()
+    bundle = ModelBundle.load(os.path.join(model_registry.path, version), mmap=loader == "mmap")
+    bundle.predict_many([ROW])
+    print(json.dumps({
+        "load_ms": (time.perf_counter() - start) * 1000,
+        "model_private": memory()["private"] - base["private"],
+        "sklearn": "sklearn" in sys.modules,
+    }), flush=True)
+    # Stay alive until every worker is loaded, so shared pages are counted as shared
+    sys.stdin.readline()
+    print(json.dumps(memory()), flush=True)
+
+
+def run(loader, workers, version):
+    processes, ready = [], []
+    for _ in range(workers):
+        spawned = time.perf_counter()
+        process = subprocess.Popen(
+            [sys.executable, "-W", "ignore", "-m", __spec__.name, "--worker", loader, "--version", version],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True
+        )
+        report = json.loads(process.stdout.readline())
+        report["cold_start_ms"] = (time.perf_counter() - spawned) * 1000
+        processes.append(process)
+        ready.append(report)
+    usage = []
+    for process in processes:
+        process.stdin.write("\n")
+        process.stdin.flush()
+        usage.append(json.loads(process.stdout.readline()))
+        process.wait()
+
+    def mean(rows, key):
+        return sum(row[key] for row in rows) / len(rows)
+
+    return {
+        "cold start ms": round(mean(ready, "cold_start_ms")),
+        "load ms": round(mean(ready, "load_ms"), 1),
+        "model private MiB": round(mean(ready, "model_private"), 1),
+        "RSS MiB": round(mean(usage, "rss"), 1),
+        "PSS MiB": round(mean(usage, "pss"), 1),
+        "private MiB": round(mean(usage, "private"), 1),
+        "imports sklearn": all(row["sklearn"] for row in ready),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--version", help="Model version to load, default: the live one")
+    parser.add_argument("--worker", choices=["joblib", "mmap"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.version is None:
+        from ..utils.model_registry import model_registry, CURRENT_POINTER
+        args.version = model_registry.read_pointer(CURRENT_POINTER)
+    if args.worker:
+        worker(args.worker, args.version)
+    else:
+        for loader in ("joblib", "mmap"):
+            print(f"{loader:>6}: {run(loader, args.workers, args.version)}")
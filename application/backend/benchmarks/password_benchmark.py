@@ -0,0 +1,65 @@
+"""Login (bcrypt verify) throughput on the event loop vs the password hashing pool
+
+Run from the application directory:
+
+    python -m backend.benchmarks.password_benchmark --logins 64 --rounds 12
+
+"inline" verifies on the event loop like the old /auth/login did, the pool
+rows use PasswordHasher with 1, 2, 4 ... workers up to the number of cores.
+bcrypt releases the GIL, so pool throughput should grow with the worker count
+until it reaches the core count, while the event loop stays responsive.
+"""
+import argparse
+import asyncio
+import os
+import time
+from ..utils.passwords import PasswordHasher, create_password_context
+from .db_benchmark import measure_loop_lag
+
+
+async def run(verify, logins, password, hashed_password):
+    lags = []
+    stop = asyncio.Event()
+    ticker = asyncio.create_task(measure_loop_lag(stop, lags))
+    start = time.perf_counter()
+    results = await asyncio.gather(*(verify(password, hashed_password) for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await ticker
+    assert all(results)
+    return {"logins/s": round(logins / elapsed, 1), "max loop lag ms": round(max(lags, default=0) * 1000, 1)}
+
+
+async def benchmark(logins, rounds, max_workers):
+    context = create_password_context(rounds)
+    password = "correct horse battery staple"
+    hashed_password = context.hash(password)
+
+    async def inline_verify(password, hashed_password):
+        return context.verify(password, hashed_password)
+
+    print(f"{'inline':>10}: " + "  ".join(f"{k}={v}" for k, v in (await run(inline_verify, logins, password, hashed_password)).items()))
+
+    workers = 1
+    while True:
+        hasher = PasswordHasher(context=context, workers=workers, max_queue=logins)
+        result = await run(hasher.verify, logins, password, hashed_password)
+        hasher.shutdown()
+        print(f"{workers:>2} workers: " + "  ".join(f"{k}={v}" for k, v in result.items()))
+        if workers >= max_workers:
+            break
+        workers = min(workers * 2, max_workers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    print(f"bcrypt rounds={args.rounds}, cores={os.cpu_count()}")
+    asyncio.run(benchmark(args.logins, args.rounds, args.max_workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""Mixed read/write throughput of SQLite with the default settings vs the performance mode
+
+Run from the application directory:
+
+    python -m backend.benchmarks.sqlite_benchmark --requests 3000 --concurrency 50 --write-ratio 0.2
+
+"default" uses the rollback journal and commits straight from every request,
+"performance" enables WAL + pragmas and sends the writes through DatabaseWriter.
+Reads load a history page, writes alternate between inserting a tracker entry
+and updating a profile, like /tracker/predict and PUT /account/profile.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from ..database import engine_options, apply_sqlite_pragmas
+from ..migrations import upgrade_database
+from ..utils.db_writer import DatabaseWriter
+from .db_benchmark import seed, history_query
+from .. import models
+
+
+async def run_mode(path, performance, requests, concurrency, users, write_ratio):
+    url = f"sqlite+aiosqlite:///{path}"
+    engine = create_async_engine(url, **engine_options(url))
+    if performance:
+        apply_sqlite_pragmas(engine)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    writer = DatabaseWriter(enabled=performance)
+    await writer.start()
+
+    # Every insert gets its own (user_id, date) so the unique index never rejects it
+    new_dates = itertools.count(1)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = {"read": [], "write": []}
+    errors = 0
+
+    async def read(db, user_id):
+        await db.get(models.User, user_id)
+        (await db.scalars(history_query(user_id))).all()
+
+    async def write(db, user_id, n):
+        user = await db.get(models.User, user_id)
+        if n % 2:
+            db.add(models.TrackerEntry(
+                user_id=user_id, date=date(2030, 1, 1) + timedelta(days=next(new_dates)),
+                sleep_hours=7.0, sleep_quality="Good", screen_time=4.0, physical_activity=30,
+                social_interaction=2.0, work_productivity=7, weather="Sunny", diet_quality="Good",
+                mood_score=6.0, stress_level=4.0, recommendation_status="ready"
+            ))
+        else:
+            user.full_name = f"Bench User {n}"
+        await writer.run(db.commit)
+
+    async def one(n):
+        nonlocal errors
+        kind = "write" if random.random() < write_ratio else "read"
+        user_id = random.randint(1, users)
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                async with Session() as db:
+                    if kind == "read":
+                        await read(db, user_id)
+                    else:
+                        await write(db, user_id, n)
+            except OperationalError:
+                errors += 1
+                return
+            latencies[kind].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(n) for n in range(requests)))
+    elapsed = time.perf_counter() - start
+    await writer.stop()
+    await engine.dispose()
+
+    def p99(values):
+        values = sorted(values)
+        return values[max(0, int(len(values) * 0.99) - 1)] * 1000 if values else 0
+
+    return {
+        "req/s": round(requests / elapsed, 1),
+        "read p99 ms": round(p99(latencies["read"]), 2),
+        "write p99 ms": round(p99(latencies["write"]), 2),
+        "errors": errors,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--entries-per-user", type=int, default=60)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, performance in (("default", False), ("performance", True)):
+            path = os.path.join(tmp, f"{name}.db")
+            engine = create_engine(f"sqlite:///{path}")
+            upgrade_database(engine)
+            seed(engine, args.users, args.entries_per_user)
+            engine.dispose()
+            result = asyncio.run(run_mode(
+                path, performance, args.requests, args.concurrency, args.users, args.write_ratio
+            ))
+            print(f"{name:>11}: " + "  ".join(f"{key}={value}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""Reproducible micro-benchmarks and in-process load test of the Calmora API
+
+Run from the application directory:
+
+    python -m backend.benchmarks.suite --output results.json
+    python -m backend.benchmarks.suite --compare backend/benchmarks/baseline.json
+
+Micro-benchmarks time prepare_input_data, predict_mental_health, a 32-row
+predict_many and load_models cold (both loaders) and warm. The load test seeds
+synthetic multi-year users (see synthetic.py) into a throwaway SQLite database
+and drives the app in-process with concurrent simulated users: new users
+register -> login -> predict -> history -> export, returning users skip the
+registration and page through years of history. The LLM is the fake provider
+and bcrypt runs at a low cost factor, so the numbers measure this code rather
+than Gemini or the password hash.
+
+Results are written as JSON. With --compare, p50 micro timings, p95 step
+latencies and request throughput are checked against a baseline file and the
+exit status is 1 when any of them regressed by more than --tolerance.
+Baselines are machine specific, regenerate one with --save-baseline on the
+machine that runs the comparison.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+PASSWORD = "benchmark-password"
+
+
+def configure_environment(workdir, bcrypt_rounds, llm_latency):
+    """Point the app at local stand-ins, must run before any backend module reads its settings"""
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{os.path.join(workdir, 'benchmark.db')}"
+    os.environ.pop("SYNC_DATABASE_URL", None)
+    os.environ["LLM_PROVIDER"] = "fake"
+    os.environ["FAKE_LLM_LATENCY"] = str(llm_latency)
+    os.environ["FAKE_LLM_FAILURE_RATE"] = "0"
+    os.environ["BCRYPT_ROUNDS"] = str(bcrypt_rounds)
+    os.environ["MODEL_WATCH_INTERVAL"] = "0"
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret")
+    os.environ.setdefault("ALGORITHM", "HS256")
+    os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+    os.environ["MEDIA_DIR"] = os.path.join(workdir, "media")
+    os.chdir(workdir)
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+def summarize(samples, scale, unit):
+    ordered = sorted(samples)
+    summary = {"count": len(ordered)}
+    for name, q in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99)):
+        summary[f"{name}_{unit}"] = round(percentile(ordered, q) * scale, 2)
+    summary[f"mean_{unit}"] = round(sum(ordered) / len(ordered) * scale, 2)
+    return summary
+
+
+def time_calls(call, repeat, number=1):
+    """Seconds per call of `repeat` timed rounds of `number` calls each"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            call()
+        samples.append((time.perf_counter() - start) / number)
+    return samples
+
+
+def run_micro(repeat, population):
+    from ..utils.encoding import FEATURES, prepare_input_data
+    from ..utils.model_registry import model_registry, ModelBundle
+    from ..utils.prediction import load_models, load_feature_encoder, predict_mental_health, predict_many
+
+    path = os.path.join(model_registry.path, model_registry.current().version)
+    columns = population.user_days(32)
+    rows = [tuple(columns[feature][i].item() for feature in FEATURES) for i in range(32)]
+    row = dict(zip(FEATURES, rows[0]))
+    _, _, _, _, scaler = load_models()
+    encoder = load_feature_encoder()
+
+    results = {
+        "prepare_input_data": time_calls(lambda: prepare_input_data(**row, encoder=encoder, scaler=scaler), repeat),
+        "predict_mental_health": time_calls(lambda: predict_mental_health(**row), repeat),
+        "predict_many_32": time_calls(lambda: predict_many(rows), repeat),
+        "load_models_cold_mmap": time_calls(lambda: ModelBundle.load(path, mmap=True), max(3, repeat // 20)),
+        "load_models_cold_joblib": time_calls(lambda: ModelBundle.load(path, mmap=False).as_tuple(), 3),
+        "load_models_warm": time_calls(load_models, repeat, 100),
+    }
+    return {name: summarize(samples, 1e6, "us") for name, samples in results.items()}
+
+
+def seed(returning_users, years, seed_value):
+    from ..database import SessionLocal, init_db
+    from ..utils.passwords import password_hasher
+    from .synthetic import seed_users
+
+    init_db()
+    db = SessionLocal()
+    try:
+        return seed_users(db, returning_users, years=years, seed=seed_value, hashed_password=password_hasher.context.hash(PASSWORD))
+    finally:
+        db.close()
+
+
+async def run_load(new_users, returning_emails, concurrency, history_pages, population, seed_value):
+    import httpx
+    from ..main import app
+    from ..utils.encoding import FEATURES
+
+    latencies = defaultdict(list)
+    errors = Counter()
+    order = random.Random(seed_value)
+    flows = [("new", f"loadtest{i}@example.com") for i in range(new_users)] + [("returning", email) for email in returning_emails]
+    order.shuffle(flows)
+    # One synthetic user's day per flow, so the predict inputs vary like real submissions
+    payloads = [population.user_days(1) for _ in flows]
+
+    async def step(client, name, method, url, **kwargs):
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        latencies[name].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            errors[name] += 1
+        return response
+
+    async def flow(client, index, kind, email):
+        if kind == "new":
+            await step(client, "register", "POST", "/auth/register", json={"username": email.split("@")[0], "email": email, "password": PASSWORD})
+        login = await step(client, "login", "POST", "/auth/login", json={"email": email, "password": PASSWORD})
+        if login.status_code != 200:
+            return
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+        entry = {feature: payloads[index][feature][0].item() for feature in FEATURES}
+        await step(client, "predict", "POST", "/tracker/predict", json=entry, headers=headers)
+        cursor = None
+        for _ in range(history_pages):
+            params = {"limit": 50, **({"cursor": cursor} if cursor else {})}
+            page = await step(client, "history", "GET", "/tracker/history", params=params, headers=headers)
+            cursor = page.json().get("next_cursor") if page.status_code == 200 else None
+            if cursor is None:
+                break
+        await step(client, "export", "GET", "/tracker/export", params={"format": "csv"}, headers=headers)
+
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            pending = list(enumerate(flows))
+            pending.reverse()
+
+            async def user():
+                while pending:
+                    index, (kind, email) = pending.pop()
+                    await flow(client, index, kind, email)
+
+            start = time.perf_counter()
+            await asyncio.gather(*(user() for _ in range(concurrency)))
+            elapsed = time.perf_counter() - start
+
+    requests = sum(len(samples) for samples in latencies.values())
+    steps = {}
+    for name, samples in latencies.items():
+        steps[name] = summarize(samples, 1000, "ms")
+        steps[name]["errors"] = errors[name]
+    return {
+        "flows": len(flows),
+        "requests": requests,
+        "seconds": round(elapsed, 3),
+        "flows_per_s": round(len(flows) / elapsed, 2),
+        "requests_per_s": round(requests / elapsed, 2),
+        "steps": steps,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print result vs baseline and return the regressed metrics: slower by more than tolerance, or less throughput"""
+    checks = []
+    for name, summary in baseline.get("micro", {}).items():
+        if name in results["micro"]:
+            checks.append((f"micro.{name}.p50_us", summary["p50_us"], results["micro"][name]["p50_us"], False))
+    if "load" in baseline and "load" in results:
+        for name, summary in baseline["load"]["steps"].items():
+            if name in results["load"]["steps"]:
+                checks.append((f"load.{name}.p95_ms", summary["p95_ms"], results["load"]["steps"][name]["p95_ms"], False))
+        checks.append(("load.requests_per_s", baseline["load"]["requests_per_s"], results["load"]["requests_per_s"], True))
+
+    regressions = []
+    print(f"{'metric':<40} {'baseline':>12} {'current':>12} {'change':>8}")
+    for metric, before, after, higher_is_better in checks:
+        change = (after - before) / before if before else 0.0
+        regressed = change < -tolerance if higher_is_better else change > tolerance
+        print(f"{metric:<40} {before:>12.2f} {after:>12.2f} {change:>+8.1%}{'  REGRESSION' if regressed else ''}")
+        if regressed:
+            regressions.append(metric)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calmora micro-benchmarks and in-process load test")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", nargs="?", const=DEFAULT_BASELINE, help="Baseline JSON to compare with")
+    parser.add_argument("--save-baseline", nargs="?", const=DEFAULT_BASELINE, help="Store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown before a metric counts as regressed")
+    parser.add_argument("--repeat", type=int, default=300, help="Timed rounds per micro-benchmark")
+    parser.add_argument("--new-users", type=int, default=100, help="Simulated users that register first")
+    parser.add_argument("--returning-users", type=int, default=20, help="Seeded users with multi-year history")
+    parser.add_argument("--years", type=float, default=3)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--history-pages", type=int, default=3)
+    parser.add_argument("--bcrypt-rounds", type=int, default=4)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Fake LLM provider latency in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip-load", action="store_true", help="Only run the micro-benchmarks")
+    args = parser.parse_args()
+
+    # Resolve output paths before switching to the scratch directory
+    output, baseline_path, save_path = (os.path.abspath(path) if path else None for path in (args.output, args.compare, args.save_baseline))
+    application_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+    sys.path.insert(0, application_dir)
+
+    with tempfile.TemporaryDirectory(prefix="calmora-bench-") as workdir:
+        configure_environment(workdir, args.bcrypt_rounds, args.llm_latency)
+        from .synthetic import SyntheticPopulation
+
+        population = SyntheticPopulation(seed=args.seed)
+        results = {
+            "meta": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "save_baseline")},
+            },
+            "micro": run_micro(args.repeat, population),
+        }
+        if not args.skip_load:
+            seeded = seed(args.returning_users, args.years, args.seed)
+            results["load"] = asyncio.run(run_load(
+                args.new_users, seeded, args.concurrency, args.history_pages, population, args.seed
+            ))
+
+    print(json.dumps(results, indent=2))
+    for path in (output, save_path):
+        if path:
+            with open(path, "w") as f:
+                json.dump(results, f, indent=2)
+                f.write("\n")
+    if baseline_path:
+        with open(baseline_path) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
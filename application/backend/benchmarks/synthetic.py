@@ -0,0 +1,104 @@
+"""Synthetic multi-year tracker users drawn from the distributions of data/mental_wellness_tracker.csv
+
+Each synthetic user is modelled on a randomly picked user of the dataset: their
+numeric features wander around that user's means with the dataset's pooled
+within-user spread, and categorical answers follow that user's frequencies
+blended with the overall ones. Mood and stress come from the live model, like
+entries submitted through /tracker/predict.
+"""
+import os
+from datetime import date, timedelta
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert, select, func
+from ..utils.encoding import FEATURES, DATASET_COLUMNS
+
+
+DATASET_PATH = os.path.join(os.path.dirname(__file__), '../../../data/mental_wellness_tracker.csv')
+
+NUMERIC_FEATURES = ["sleep_hours", "screen_time", "physical_activity", "social_interaction", "work_productivity"]
+CATEGORICAL_FEATURES = ["sleep_quality", "weather", "diet_quality"]
+INTEGER_FEATURES = {"physical_activity", "work_productivity"}
+
+# Weight of the template user's own category frequencies against the dataset-wide ones
+TEMPLATE_WEIGHT = 0.5
+
+
+class SyntheticPopulation:
+    """Per-user means, within-user spread and category frequencies fitted from the dataset"""
+
+    def __init__(self, path=DATASET_PATH, seed=0):
+        data = pd.read_csv(path)
+        self.random = np.random.default_rng(seed)
+        by_user = data.groupby("User_ID")
+        columns = {feature: DATASET_COLUMNS[feature] for feature in NUMERIC_FEATURES}
+        self.user_means = by_user[list(columns.values())].mean().rename(columns={v: k for k, v in columns.items()})
+        residuals = data[list(columns.values())] - by_user[list(columns.values())].transform("mean")
+        self.spread = residuals.std().rename({v: k for k, v in columns.items()})
+        self.bounds = {feature: (data[column].min(), data[column].max()) for feature, column in columns.items()}
+        self.categories = {}
+        self.user_frequencies = {}
+        for feature in CATEGORICAL_FEATURES:
+            column = DATASET_COLUMNS[feature]
+            overall = data[column].value_counts(normalize=True)
+            self.categories[feature] = overall.index.tolist()
+            per_user = pd.crosstab(data["User_ID"], data[column], normalize="index").reindex(columns=overall.index, fill_value=0)
+            self.user_frequencies[feature] = TEMPLATE_WEIGHT * per_user.to_numpy() + (1 - TEMPLATE_WEIGHT) * overall.to_numpy()
+
+    def user_days(self, days):
+        """Feature columns (feature -> array) of one synthetic user's `days` entries"""
+        template = self.random.integers(len(self.user_means))
+        columns = {}
+        for feature in NUMERIC_FEATURES:
+            low, high = self.bounds[feature]
+            values = self.user_means.iloc[template][feature] + self.random.normal(0, self.spread[feature], days)
+            values = np.clip(values, low, high)
+            columns[feature] = np.round(values).astype(int) if feature in INTEGER_FEATURES else np.round(values, 1)
+        for feature in CATEGORICAL_FEATURES:
+            probabilities = self.user_frequencies[feature][template]
+            columns[feature] = self.random.choice(self.categories[feature], size=days, p=probabilities / probabilities.sum())
+        return columns
+
+
+def seed_users(db, users, years=3, log_rate=0.8, seed=0, hashed_password="x", end=None, prefix="synthetic"):
+    """Insert `users` users with `years` of daily entries (each day logged with probability log_rate)
+
+    Runs on a sync session. The last entry is at the latest on the day before end
+    (default: today), so every seeded user can still submit today. Returns the emails.
+    """
+    from .. import models
+    from ..utils.model_registry import model_registry
+    from ..utils.rollups import rebuild_rollups
+
+    population = SyntheticPopulation(seed=seed)
+    bundle = model_registry.current()
+    end = end or date.today()
+    days = int(years * 365)
+    first_id = (db.scalar(select(func.max(models.User.id))) or 0) + 1
+    emails = []
+    for user_id in range(first_id, first_id + users):
+        email = f"{prefix}{user_id}@example.com"
+        db.execute(insert(models.User), [{"id": user_id, "username": f"{prefix}{user_id}", "email": email, "hashed_password": hashed_password}])
+        columns = population.user_days(days)
+        # The compiled forest takes any number of rows without unpickling the sklearn model
+        predictions = np.round(bundle.compiled.predict(bundle.encoder.encode_columns(columns)), 1)
+        logged = population.random.random(days) < log_rate
+        rows = []
+        for day in np.flatnonzero(logged):
+            row = {feature: columns[feature][day].item() for feature in FEATURES}
+            row.update(
+                user_id=user_id,
+                date=end - timedelta(days=days - int(day)),
+                mood_score=float(predictions[day, 0]),
+                stress_level=float(predictions[day, 1]),
+                recommendation_status="ready",
+                ai_recommendation="Synthetic entry",
+                model_version=bundle.version,
+            )
+            rows.append(row)
+        if rows:
+            db.execute(insert(models.TrackerEntry), rows)
+        emails.append(email)
+    db.commit()
+    rebuild_rollups(db, list(range(first_id, first_id + users)))
+    return emails
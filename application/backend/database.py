@@ -1,22 +1,127 @@
-from sqlalchemy import create_engine
+import os
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker
-from .models import Base 
+from .migrations import upgrade_database
 
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./calmora_tracker.db"
+load_dotenv()
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+# Any SQLAlchemy URL, sqlite:// and postgresql:// are switched to their async driver
+DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./calmora_tracker.db")
+# Sync URL for migrations, streamed exports and scripts, derived from DATABASE_URL when empty
+SYNC_DATABASE_URL = os.getenv("SYNC_DATABASE_URL", "")
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+
+# SQLite performance mode: WAL and the pragmas below on every connection, writes go through db_writer
+SQLITE_PERFORMANCE_MODE = os.getenv("SQLITE_PERFORMANCE_MODE", "true").lower() == "true"
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+# Negative values are KiB, so -65536 is a 64 MiB page cache per connection
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+SYNC_DRIVERS = {
+    "sqlite+aiosqlite": "sqlite",
+    "postgresql+asyncpg": "postgresql",
+}
+
+
+def async_database_url(url):
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+
+
+def sync_database_url(url):
+    url = make_url(url)
+    return url.set(drivername=SYNC_DRIVERS.get(url.drivername, url.drivername))
+
+
+def sqlite_pragmas():
+    return [
+        # Readers no longer block the writer (and vice versa)
+        "PRAGMA journal_mode=WAL",
+        # Safe with WAL: a power loss can drop the last commits but never corrupts the database
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}",
+        f"PRAGMA cache_size={SQLITE_CACHE_SIZE}",
+        f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+
+def apply_sqlite_pragmas(engine):
+    """Run the performance pragmas on every new connection of a (sync or async) SQLite engine"""
+    sync_engine = getattr(engine, "sync_engine", engine)
+    pragmas = sqlite_pragmas()
+
+    @event.listens_for(sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+def engine_options(url):
+    """Pool and driver settings shared by the async and sync engines"""
+    url = make_url(url)
+    options = {"echo": DB_ECHO}
+    if url.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+        if url.database in (None, "", ":memory:"):
+            # In-memory databases live in a single connection, there is no pool to tune
+            return options
+    else:
+        options["pool_pre_ping"] = True
+    options.update(
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    return options
+
+
+SQLALCHEMY_DATABASE_URL = async_database_url(DATABASE_URL)
+SQLALCHEMY_SYNC_DATABASE_URL = make_url(SYNC_DATABASE_URL) if SYNC_DATABASE_URL else sync_database_url(DATABASE_URL)
+
+async_engine = create_async_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL))
+
+# expire_on_commit=False: attributes stay loaded after commit, async sessions cannot lazy-load them
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Sync engine for Alembic and for work that already runs in a thread (streamed exports, scripts)
+engine = create_engine(SQLALCHEMY_SYNC_DATABASE_URL, **engine_options(SQLALCHEMY_SYNC_DATABASE_URL))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+SQLITE_WRITE_QUEUE = SQLITE_PERFORMANCE_MODE and SQLALCHEMY_DATABASE_URL.get_backend_name() == "sqlite"
+
+if SQLITE_WRITE_QUEUE:
+    apply_sqlite_pragmas(async_engine)
+if SQLITE_PERFORMANCE_MODE and SQLALCHEMY_SYNC_DATABASE_URL.get_backend_name() == "sqlite":
+    apply_sqlite_pragmas(engine)
+
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    upgrade_database(engine)
+
+async def close_db():
+    await async_engine.dispose()
+    engine.dispose()
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
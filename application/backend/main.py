@@ -1,9 +1,18 @@
+import asyncio
+import os
 from fastapi import FastAPI
-from .database import init_db
+from .database import init_db, close_db, async_engine, engine
 from .auth import auth_router
-from .routers import tracker_router, user_router
+from .routers import tracker_router, user_router, admin_router, metrics_router
+from .utils.recommendation_worker import recommendation_pool
+from .utils.batch_inference import batch_predictor
+from .utils.db_writer import db_writer
+from .utils.passwords import password_hasher
+from .utils.principal_cache import principal_cache
+from .utils.model_registry import model_registry
+from .utils.metrics import MetricsMiddleware, METRICS_ENABLED, instrument_engine
+from .utils.images import MediaFiles, MEDIA_DIR, image_pipeline
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
 app = FastAPI(
     title="Calmora API",
@@ -14,6 +23,9 @@ app = FastAPI(
 app.include_router(auth_router)
 app.include_router(tracker_router)
 app.include_router(user_router)
+app.include_router(admin_router)
+if METRICS_ENABLED:
+    app.include_router(metrics_router)
 
 app.add_middleware(
     CORSMiddleware,
@@ -22,12 +34,37 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Added last so it wraps CORS too and times the whole request
+app.add_middleware(MetricsMiddleware)
 
-app.mount("/media", StaticFiles(directory="./routers/media"), name="media")
+instrument_engine(async_engine.sync_engine)
+instrument_engine(engine)
+
+os.makedirs(MEDIA_DIR, exist_ok=True)
+app.mount("/media", MediaFiles(directory=MEDIA_DIR), name="media")
 
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     init_db()
+    # Load (and checksum) the live model before the first request instead of during it
+    await asyncio.to_thread(model_registry.load)
+    await model_registry.start_watcher()
+    await db_writer.start()
+    await batch_predictor.start()
+    await recommendation_pool.start()
+    await principal_cache.start_watcher()
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    await principal_cache.stop_watcher()
+    await recommendation_pool.stop()
+    await batch_predictor.stop()
+    await model_registry.stop_watcher()
+    await db_writer.stop()
+    await close_db()
+    password_hasher.shutdown()
+    image_pipeline.shutdown()
     
 
 @app.get("/")
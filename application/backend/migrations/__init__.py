@@ -0,0 +1,29 @@
+import os
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+
+
+MIGRATIONS_PATH = os.path.dirname(__file__)
+
+# Revision matching the schema that Base.metadata.create_all produced before migrations existed
+BASELINE_REVISION = "0001"
+
+
+def alembic_config(connection=None, url=None):
+    config = Config()
+    config.set_main_option("script_location", MIGRATIONS_PATH)
+    if url is not None:
+        config.set_main_option("sqlalchemy.url", url)
+    config.attributes["connection"] = connection
+    return config
+
+
+def upgrade_database(engine, revision="head"):
+    """Bring the database schema up to date, adopting databases created before migrations existed"""
+    with engine.begin() as connection:
+        tables = inspect(connection).get_table_names()
+        config = alembic_config(connection)
+        if "alembic_version" not in tables and "users" in tables:
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, revision)
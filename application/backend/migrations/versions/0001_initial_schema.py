@@ -0,0 +1,68 @@
+"""initial schema
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(), nullable=False),
+        sa.Column('email', sa.String(), nullable=False),
+        sa.Column('hashed_password', sa.String(), nullable=False),
+        sa.Column('full_name', sa.String(), nullable=True),
+        sa.Column('gender', sa.String(), nullable=True),
+        sa.Column('birth_date', sa.Date(), nullable=True),
+        sa.Column('profile_image', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_users_id', 'users', ['id'], unique=False)
+    op.create_index('ix_users_username', 'users', ['username'], unique=True)
+    op.create_index('ix_users_email', 'users', ['email'], unique=True)
+    op.create_table(
+        'tracker_entries',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('date', sa.Date(), nullable=True),
+        sa.Column('sleep_hours', sa.Float(), nullable=True),
+        sa.Column('sleep_quality', sa.String(), nullable=True),
+        sa.Column('screen_time', sa.Float(), nullable=True),
+        sa.Column('physical_activity', sa.Integer(), nullable=True),
+        sa.Column('social_interaction', sa.Float(), nullable=True),
+        sa.Column('work_productivity', sa.Integer(), nullable=True),
+        sa.Column('weather', sa.String(), nullable=True),
+        sa.Column('diet_quality', sa.String(), nullable=True),
+        sa.Column('mood_score', sa.Float(), nullable=True),
+        sa.Column('stress_level', sa.Float(), nullable=True),
+        sa.Column('ai_recommendation', sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_tracker_entries_id', 'tracker_entries', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tracker_entries_id', table_name='tracker_entries')
+    op.drop_table('tracker_entries')
+    op.drop_index('ix_users_email', table_name='users')
+    op.drop_index('ix_users_username', table_name='users')
+    op.drop_index('ix_users_id', table_name='users')
+    op.drop_table('users')
@@ -0,0 +1,42 @@
+"""recommendation status and admin flag
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _columns(table):
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Development databases created with create_all may already have these columns
+    if 'recommendation_status' not in _columns('tracker_entries'):
+        # Existing entries already carry their synchronous recommendation
+        with op.batch_alter_table('tracker_entries') as batch_op:
+            batch_op.add_column(sa.Column('recommendation_status', sa.String(), nullable=False, server_default='ready'))
+    if 'is_admin' not in _columns('users'):
+        with op.batch_alter_table('users') as batch_op:
+            batch_op.add_column(sa.Column('is_admin', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('is_admin')
+    with op.batch_alter_table('tracker_entries') as batch_op:
+        batch_op.drop_column('recommendation_status')
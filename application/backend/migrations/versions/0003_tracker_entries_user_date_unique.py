@@ -0,0 +1,34 @@
+"""one tracker entry per user per day
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 09:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The old check-then-insert could race, keep the first entry of each duplicated day
+    op.execute(sa.text(
+        "DELETE FROM tracker_entries WHERE id NOT IN "
+        "(SELECT MIN(id) FROM tracker_entries GROUP BY user_id, date)"
+    ))
+    # Serves both as the (user_id, date) lookup index and the one-entry-per-day constraint
+    op.create_index('ix_tracker_entries_user_id_date', 'tracker_entries', ['user_id', 'date'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tracker_entries_user_id_date', table_name='tracker_entries')
@@ -0,0 +1,49 @@
+"""tracker rollups
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Fill it for existing entries with: python -m backend.utils.rollups
+    op.create_table(
+        'tracker_rollups',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('period', sa.String(), nullable=False),
+        sa.Column('period_start', sa.Date(), nullable=False),
+        sa.Column('entry_count', sa.Integer(), nullable=False),
+        sa.Column('mood_score_sum', sa.Float(), nullable=False),
+        sa.Column('mood_score_min', sa.Float(), nullable=True),
+        sa.Column('mood_score_max', sa.Float(), nullable=True),
+        sa.Column('stress_level_sum', sa.Float(), nullable=False),
+        sa.Column('stress_level_min', sa.Float(), nullable=True),
+        sa.Column('stress_level_max', sa.Float(), nullable=True),
+        sa.Column('sleep_hours_sum', sa.Float(), nullable=False),
+        sa.Column('sleep_hours_min', sa.Float(), nullable=True),
+        sa.Column('sleep_hours_max', sa.Float(), nullable=True),
+        sa.Column('screen_time_sum', sa.Float(), nullable=False),
+        sa.Column('screen_time_min', sa.Float(), nullable=True),
+        sa.Column('screen_time_max', sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('user_id', 'period', 'period_start')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('tracker_rollups')
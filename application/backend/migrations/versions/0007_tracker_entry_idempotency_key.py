@@ -0,0 +1,35 @@
+"""tracker entry idempotency key
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('tracker_entries') as batch_op:
+        batch_op.add_column(sa.Column('idempotency_key', sa.String(), nullable=True))
+    # NULL keys never conflict, so entries created without the header are unaffected
+    op.create_index(
+        'ix_tracker_entries_user_id_idempotency_key', 'tracker_entries', ['user_id', 'idempotency_key'], unique=True
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tracker_entries_user_id_idempotency_key', table_name='tracker_entries')
+    with op.batch_alter_table('tracker_entries') as batch_op:
+        batch_op.drop_column('idempotency_key')
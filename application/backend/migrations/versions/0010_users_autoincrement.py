@@ -0,0 +1,35 @@
+"""users autoincrement
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, Sequence[str], None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # A plain SQLite INTEGER PRIMARY KEY hands the highest id out again once its row is deleted,
+    # and tokens name the user by id. AUTOINCREMENT never reuses one, other databases already don't
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('users', recreate='always', table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+        pass
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('users', recreate='always', table_kwargs={'sqlite_autoincrement': False}) as batch_op:
+        pass
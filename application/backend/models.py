@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, Float, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Date, Float, ForeignKey, DateTime, Boolean, Index
 from sqlalchemy.orm import relationship, declarative_base
 from datetime import datetime
 
@@ -8,6 +8,8 @@ Base = declarative_base()
 
 class User(Base):
     __tablename__ = "users"
+    # Ids are never handed out again after a delete, access tokens identify the user by id
+    __table_args__ = {"sqlite_autoincrement": True}
     id = Column(Integer, primary_key=True, index=True)
     username = Column(String, unique=True, index=True, nullable=False)
     email = Column(String, unique=True, index=True, nullable=False)
@@ -16,6 +18,12 @@ class User(Base):
     gender = Column(String)
     birth_date = Column(Date)
     profile_image = Column(String)
+    is_admin = Column(Boolean, default=False, nullable=False)
+    # Part of every access token, bumping it revokes all tokens issued to the user
+    token_version = Column(Integer, default=0, nullable=False)
+    # Bumped in every transaction changing the user's profile, entries or recommendations,
+    # cached profile and history responses of an older version are never served
+    data_version = Column(Integer, default=0, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     tracker_entries = relationship("TrackerEntry", back_populates="user", cascade="all, delete-orphan")
     
@@ -23,6 +31,12 @@ class User(Base):
 
 class TrackerEntry(Base):
     __tablename__ = "tracker_entries"
+    __table_args__ = (
+        # One entry per user per day, also the index behind every per-user date lookup
+        Index("ix_tracker_entries_user_id_date", "user_id", "date", unique=True),
+        # A retried /tracker/predict with the same Idempotency-Key replays the entry it created
+        Index("ix_tracker_entries_user_id_idempotency_key", "user_id", "idempotency_key", unique=True),
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     date = Column(Date, default=datetime.utcnow)
@@ -37,7 +51,32 @@ class TrackerEntry(Base):
     mood_score = Column(Float)
     stress_level = Column(Float)
     ai_recommendation = Column(String)
+    recommendation_status = Column(String, default="pending", nullable=False)
+    # Lease on a pending recommendation: the worker holding it last set this, stale leases are recovered
+    claimed_at = Column(DateTime)
+    # Registry version of the model that produced mood_score / stress_level
+    model_version = Column(String)
+    idempotency_key = Column(String)
     user = relationship("User", back_populates="tracker_entries")
-    
-    
 
+
+class TrackerRollup(Base):
+    """Weekly / monthly aggregates of a user's tracker entries, updated by every new entry"""
+    __tablename__ = "tracker_rollups"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    # "week" (ISO week, starts on Monday) or "month"
+    period = Column(String, primary_key=True)
+    period_start = Column(Date, primary_key=True)
+    entry_count = Column(Integer, nullable=False, default=0)
+    mood_score_sum = Column(Float, nullable=False, default=0)
+    mood_score_min = Column(Float)
+    mood_score_max = Column(Float)
+    stress_level_sum = Column(Float, nullable=False, default=0)
+    stress_level_min = Column(Float)
+    stress_level_max = Column(Float)
+    sleep_hours_sum = Column(Float, nullable=False, default=0)
+    sleep_hours_min = Column(Float)
+    sleep_hours_max = Column(Float)
+    screen_time_sum = Column(Float, nullable=False, default=0)
+    screen_time_min = Column(Float)
+    screen_time_max = Column(Float)
@@ -1,4 +1,6 @@
 from .tracker_router import tracker_router
 from .user_router import user_router
+from .admin_router import admin_router
+from .metrics_router import metrics_router
 
-__all__ = ['tracker_router', 'user_router']
\ No newline at end of file
+__all__ = ['tracker_router', 'user_router', 'admin_router', 'metrics_router']
\ No newline at end of file
@@ -0,0 +1,72 @@
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from .. import models, schemas
+from ..utils.exporters import export_stream, iter_gzip, MEDIA_TYPES, FILE_EXTENSIONS
+from ..utils.model_registry import model_registry, ModelIntegrityError
+from .user_router import get_current_admin
+from datetime import date
+from typing import List, Literal, Optional
+
+
+admin_router = APIRouter(prefix='/admin', tags=['admin'])
+
+
+@admin_router.get("/export", response_class=StreamingResponse)
+async def export_cohort(
+    request: Request,
+    export_format: Literal["csv", "ndjson", "parquet", "arrow"] = Query("parquet", alias="format"),
+    user_ids: Optional[List[int]] = Query(None, alias="user_id"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    current_admin: models.User = Depends(get_current_admin)
+):
+    """
+    Export tracker entries of a cohort (repeat user_id, or omit it for every user) for the retraining pipeline
+    """
+    chunks = export_stream(export_format, user_ids, start_date, end_date)
+    headers = {
+        "Content-Disposition": f"attachment; filename=tracker_entries.{FILE_EXTENSIONS[export_format]}",
+        "Vary": "Accept-Encoding"
+    }
+    if export_format != "parquet" and "gzip" in request.headers.get("accept-encoding", ""):
+        chunks = iter_gzip(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type=MEDIA_TYPES[export_format], headers=headers)
+
+
+async def _switch_model(switch, version):
+    try:
+        # Loading and checksumming the artifacts takes a while, keep it off the event loop
+        await asyncio.to_thread(switch, version)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Unknown model version: {version}")
+    except ModelIntegrityError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return model_registry.status()
+
+
+@admin_router.get("/models", response_model=schemas.ModelRegistryOutput)
+async def get_models(current_admin: models.User = Depends(get_current_admin)):
+    """
+    Registered model versions, the live and shadow ones and how far the shadow model is from the live one
+    """
+    return model_registry.status()
+
+
+@admin_router.post("/models/activate", response_model=schemas.ModelRegistryOutput)
+async def activate_model(payload: schemas.ModelVersionInput, current_admin: models.User = Depends(get_current_admin)):
+    """
+    Make a registered version the live model, other workers pick it up from the registry pointer
+    """
+    if payload.version is None:
+        raise HTTPException(status_code=400, detail="A model version is required")
+    return await _switch_model(model_registry.activate, payload.version)
+
+
+@admin_router.post("/models/shadow", response_model=schemas.ModelRegistryOutput)
+async def set_shadow_model(payload: schemas.ModelVersionInput, current_admin: models.User = Depends(get_current_admin)):
+    """
+    Score every prediction with a candidate version as well and compare it with the live one, null stops shadowing
+    """
+    return await _switch_model(model_registry.set_shadow, payload.version)
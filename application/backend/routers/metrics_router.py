@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+
+
+metrics_router = APIRouter(tags=['metrics'])
+
+
+@metrics_router.get("/metrics", include_in_schema=False)
+def metrics():
+    """
+    Prometheus scrape endpoint: request and span latency histograms, in-flight gauges, cache/pool/queue stats
+    """
+    return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
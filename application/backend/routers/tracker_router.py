@@ -1,35 +1,54 @@
-from fastapi import APIRouter, Depends, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from sqlalchemy import select, tuple_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..database import get_db
 from .. import models, schemas
-from ..utils.prediction import predict_mental_health, ai_recommendations
+from ..utils.batch_inference import batch_predictor
+from ..utils.db_writer import db_writer
+from ..utils.recommendation_worker import recommendation_pool, recommendation_features, RECOMMENDATION_PENDING
+from ..utils.exporters import export_stream, iter_gzip, MEDIA_TYPES, FILE_EXTENSIONS
+from ..utils.rollups import add_entry_to_rollups, dialect_insert, rollup_bucket
+from ..utils.single_flight import SingleFlight
+from ..utils.analytics import load_user_history, compute_insights
+from ..utils.response_cache import cached_json_response, bump_data_version
+from ..utils.principal_cache import principal_cache
 from .user_router import get_current_user
-from datetime import datetime
-from fastapi.encoders import jsonable_encoder
+from datetime import datetime, date
+from typing import Literal, Optional
 from fastapi.responses import StreamingResponse
-import csv 
-from io import StringIO
+import base64
 
 
 
 
 tracker_router = APIRouter(prefix='/tracker', tags=['tracker'])
 
-@tracker_router.post('/predict', status_code=status.HTTP_201_CREATED)
-async def predict(entry: schemas.TrackerEntryCreate, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)) -> schemas.PredictOutput:
-    """
-    Predict mental health based on user input
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+
+PREDICTION_EXISTS = "Prediction for today already exists. Please wait until tomorrow to make a new prediction."
+
+# Concurrent submissions of the same user and day share one prediction
+prediction_flight = SingleFlight()
+
+
+def entry_output(tracker_entry):
+    return {
+        "id": tracker_entry.id,
+        "mood_score": tracker_entry.mood_score,
+        "stress_level": tracker_entry.stress_level,
+        "recommendation_status": tracker_entry.recommendation_status,
+        "model_version": tracker_entry.model_version,
+        "date": tracker_entry.date
+    }
+
+
+async def create_entry(db, user_id, entry, today, idempotency_key):
+    """Predict and store the user's entry for today, returns (entry, created)
+
+    When the day (or the idempotency key) is already taken nothing is written
+    and the existing entry is returned instead.
     """
-    # Validasi prediksi harian
-    today = datetime.utcnow().date()
-    existing_entry = db.query(models.TrackerEntry).filter(
-        models.TrackerEntry.user_id == current_user.id,
-        models.TrackerEntry.date == today
-    ).first()
-    if existing_entry:
-        return {"detail": "Prediction for today already exists. Please wait until tomorrow to make a new prediction."}
-        
-    mood_score, stress_level = predict_mental_health(
+    mood_score, stress_level, model_version = await batch_predictor.predict((
         entry.sleep_hours,
         entry.sleep_quality,
         entry.screen_time,
@@ -38,107 +57,254 @@ async def predict(entry: schemas.TrackerEntryCreate, db: Session = Depends(get_d
         entry.work_productivity,
         entry.weather,
         entry.diet_quality
+    ))
+    # Claim and write in one statement: the unique (user_id, date) and (user_id, idempotency_key)
+    # indexes turn a duplicate into "no row returned" instead of an IntegrityError and a rollback
+    statement = (
+        dialect_insert(db.bind.dialect.name)(models.TrackerEntry)
+        .values(
+            user_id=user_id,
+            sleep_hours=entry.sleep_hours,
+            sleep_quality=entry.sleep_quality,
+            screen_time=entry.screen_time,
+            physical_activity=entry.physical_activity,
+            social_interaction=entry.social_interaction,
+            work_productivity=entry.work_productivity,
+            weather=entry.weather,
+            diet_quality=entry.diet_quality,
+            mood_score=mood_score,
+            stress_level=stress_level,
+            recommendation_status=RECOMMENDATION_PENDING,
+            # This process holds the recommendation lease from the start
+            claimed_at=datetime.utcnow(),
+            model_version=model_version,
+            idempotency_key=idempotency_key,
+            date=today
+        )
+        .on_conflict_do_nothing()
+        .returning(models.TrackerEntry)
     )
-    
-    recommendations = ai_recommendations(
-        mood_score,
-        stress_level,
-        entry.sleep_hours,
-        entry.screen_time,
-        entry.physical_activity,
-        entry.social_interaction,
-        entry.work_productivity,
-        entry.weather,
-        entry.diet_quality
-    )
-    
-    # Save the entry to the database
-    tracker_entry = models.TrackerEntry(
-        user_id=current_user.id,
-        sleep_hours=entry.sleep_hours,
-        sleep_quality=entry.sleep_quality,
-        screen_time=entry.screen_time,
-        physical_activity=entry.physical_activity,
-        social_interaction=entry.social_interaction,
-        work_productivity=entry.work_productivity,
-        weather=entry.weather,
-        diet_quality=entry.diet_quality,
-        mood_score=mood_score,
-        stress_level=stress_level,
-        ai_recommendation=recommendations,
-        date=datetime.utcnow()
+
+    async def save_entry():
+        tracker_entry = await db.scalar(statement)
+        if tracker_entry is not None:
+            # Same transaction, so the weekly/monthly rollups never drift from the entries
+            await add_entry_to_rollups(db, tracker_entry)
+            # and no worker serves a cached history page without the entry
+            await db.execute(bump_data_version(user_id))
+        await db.commit()
+        return tracker_entry
+
+    tracker_entry = await db_writer.run(save_entry)
+    if tracker_entry is not None:
+        # The cached principal still carries the old data_version
+        principal_cache.invalidate(str(user_id))
+        # The AI recommendation is generated in the background
+        recommendation_pool.submit(tracker_entry.id, recommendation_features(tracker_entry), tracker_entry.claimed_at)
+        return tracker_entry, True
+
+    conflict = models.TrackerEntry.date == today
+    if idempotency_key is not None:
+        conflict = or_(conflict, models.TrackerEntry.idempotency_key == idempotency_key)
+    existing = (await db.scalars(select(models.TrackerEntry).where(models.TrackerEntry.user_id == user_id, conflict))).all()
+    for tracker_entry in existing:
+        # Prefer the entry created with this key, it may be from an earlier day
+        if idempotency_key is not None and tracker_entry.idempotency_key == idempotency_key:
+            return tracker_entry, False
+    return (existing[0] if existing else None), False
+
+
+@tracker_router.post('/predict', status_code=status.HTTP_201_CREATED)
+async def predict(
+    entry: schemas.TrackerEntryCreate,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=IDEMPOTENCY_KEY_MAX_LENGTH),
+    db: AsyncSession = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+) -> schemas.PredictOutput:
+    """
+    Predict mental health based on user input
+
+    Send an Idempotency-Key header to make retries safe: a retry of a stored
+    submission returns the original result with status 200 instead of an error.
+    """
+    today = datetime.utcnow().date()
+    (tracker_entry, created), shared = await prediction_flight.run(
+        (current_user.id, today),
+        lambda: create_entry(db, current_user.id, entry, today, idempotency_key)
     )
-    db.add(tracker_entry)
-    db.commit()
-    db.refresh(tracker_entry)
+    if created and not shared:
+        return entry_output(tracker_entry)
+    if tracker_entry is not None and idempotency_key is not None and tracker_entry.idempotency_key == idempotency_key:
+        response.status_code = status.HTTP_200_OK
+        response.headers["Idempotent-Replayed"] = "true"
+        return entry_output(tracker_entry)
+    return {"detail": PREDICTION_EXISTS}
+
+
+@tracker_router.get("/recommendation/{entry_id}")
+async def get_recommendation(
+    entry_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+) -> schemas.RecommendationOutput:
+    """
+    Get the AI recommendation for a tracker entry, poll until the status is no longer pending
+    """
+    tracker_entry = await db.scalar(select(models.TrackerEntry).where(
+        models.TrackerEntry.id == entry_id,
+        models.TrackerEntry.user_id == current_user.id
+    ))
+    if not tracker_entry:
+        raise HTTPException(status_code=404, detail="Tracker entry not found")
     return {
-        "mood_score": mood_score,
-        "stress_level": stress_level,
-        "ai_recommendation": recommendations,
-        "date": tracker_entry.date
+        "id": tracker_entry.id,
+        "recommendation_status": tracker_entry.recommendation_status,
+        "ai_recommendation": tracker_entry.ai_recommendation
     }
 
 
+# Public columns of a history item, the default projection and the only names fields= accepts
+HISTORY_FIELDS = {column.name: column for column in (
+    models.TrackerEntry.id,
+    models.TrackerEntry.date,
+    models.TrackerEntry.sleep_hours,
+    models.TrackerEntry.sleep_quality,
+    models.TrackerEntry.screen_time,
+    models.TrackerEntry.physical_activity,
+    models.TrackerEntry.social_interaction,
+    models.TrackerEntry.work_productivity,
+    models.TrackerEntry.weather,
+    models.TrackerEntry.diet_quality,
+    models.TrackerEntry.mood_score,
+    models.TrackerEntry.stress_level,
+    models.TrackerEntry.ai_recommendation,
+    models.TrackerEntry.recommendation_status,
+)}
+HISTORY_MAX_LIMIT = 100
+
+
+def encode_history_cursor(entry_date, entry_id):
+    return base64.urlsafe_b64encode(f"{entry_date.isoformat()}|{entry_id}".encode()).decode()
+
+
+def decode_history_cursor(cursor):
+    try:
+        entry_date, entry_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return date.fromisoformat(entry_date), int(entry_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid history cursor")
+
+
 @tracker_router.get("/history")
 async def get_prediction_history(
-    db: Session = Depends(get_db),
+    request: Request,
+    limit: int = Query(5, ge=1, le=HISTORY_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return, e.g. date,mood_score,stress_level"),
+    db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
-):
+) -> schemas.HistoryPage:
     """
-    Get prediction history for the current user
+    Get prediction history for the current user, newest first, paginated with next_cursor
+
+    Pages are cached until the user's next entry or recommendation, send the ETag
+    back in If-None-Match to get a 304 while nothing changed.
     """
-    # Get the last 5 entries
-    entries = db.query(models.TrackerEntry).filter(
-        models.TrackerEntry.user_id == current_user.id
-    ).order_by(models.TrackerEntry.date.desc()).all()
-    # If data more than 5, take the last 5
-    if len(entries) > 5:
-        entries = entries[:5]
-    entries = list(reversed(entries))
-    return jsonable_encoder(entries)
+    async def build():
+        if fields:
+            names = [name.strip() for name in fields.split(",") if name.strip()]
+            unknown = [name for name in names if name not in HISTORY_FIELDS]
+            if unknown:
+                raise HTTPException(status_code=422, detail=f"Unknown history fields: {', '.join(unknown)}")
+        else:
+            names = list(HISTORY_FIELDS)
+        # id and date are the keyset, every item carries them
+        names = ["id", "date"] + [name for name in names if name not in ("id", "date")]
+        columns = [HISTORY_FIELDS[name] for name in names]
+
+        query = select(*columns).where(models.TrackerEntry.user_id == current_user.id)
+        if from_date is not None:
+            query = query.where(models.TrackerEntry.date >= from_date)
+        if to_date is not None:
+            query = query.where(models.TrackerEntry.date <= to_date)
+        if cursor is not None:
+            query = query.where(tuple_(models.TrackerEntry.date, models.TrackerEntry.id) < decode_history_cursor(cursor))
+        query = query.order_by(models.TrackerEntry.date.desc(), models.TrackerEntry.id.desc()).limit(limit + 1)
+        rows = (await db.execute(query)).all()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_history_cursor(rows[-1].date, rows[-1].id)
+        items = [{name: getattr(row, name) for name in names} for row in rows]
+        return {"items": items, "next_cursor": next_cursor}
+
+    key = ("history", limit, cursor, from_date, to_date, fields)
+    return await cached_json_response(request, current_user, key, schemas.HistoryPage, build)
+
+
+TRENDS_MAX_LIMIT = 120
+
+
+@tracker_router.get("/trends")
+async def get_trends(
+    period: Literal["week", "month"] = "week",
+    limit: int = Query(12, ge=1, le=TRENDS_MAX_LIMIT),
+    from_date: Optional[date] = Query(None, alias="from"),
+    to_date: Optional[date] = Query(None, alias="to"),
+    db: AsyncSession = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+) -> schemas.TrendsOutput:
+    """
+    Get weekly or monthly mood, stress, sleep and screen time aggregates, the latest `limit` buckets oldest first
+    """
+    query = select(models.TrackerRollup).where(
+        models.TrackerRollup.user_id == current_user.id,
+        models.TrackerRollup.period == period
+    )
+    if from_date is not None:
+        query = query.where(models.TrackerRollup.period_start >= from_date)
+    if to_date is not None:
+        query = query.where(models.TrackerRollup.period_start <= to_date)
+    rows = (await db.scalars(query.order_by(models.TrackerRollup.period_start.desc()).limit(limit))).all()
+    return {"period": period, "buckets": [rollup_bucket(row) for row in reversed(rows)]}
+
+
+@tracker_router.get("/insights")
+async def get_insights(
+    days: int = Query(30, ge=1, le=365, description="Length of the rolling mean series, ending today"),
+    db: AsyncSession = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+) -> schemas.InsightsOutput:
+    """
+    Get logging streaks, 7/30-day rolling mood and stress means and how sleep, screen time and activity correlate with them
+    """
+    history = await load_user_history(db, current_user)
+    return compute_insights(history, datetime.utcnow().date(), days)
 
 
 
 @tracker_router.get("/export", response_class=StreamingResponse)
-async def export_tracker_csv(
-    db: Session = Depends(get_db),
+async def export_tracker_data(
+    request: Request,
+    export_format: Literal["csv", "ndjson", "parquet", "arrow"] = Query("csv", alias="format"),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
     current_user: models.User = Depends(get_current_user)
 ):
     """
-    Export tracker data for the current user as CSV
+    Export tracker data for the current user as CSV, NDJSON, Parquet or Arrow IPC, optionally limited to a date range
     """
-    entries = db.query(models.TrackerEntry).filter(
-        models.TrackerEntry.user_id == current_user.id
-    ).order_by(models.TrackerEntry.date.asc()).all()
-    
-    output = StringIO()
-    writer = csv.writer(output)
-    
-    # Header
-    writer.writerow([
-        "created_at", "sleep_hours", "sleep_quality", "screen_time",
-        "physical_activity", "social_interaction", "work_productivity_score",
-        "weather", "diet_quality", "mood_score", "stress_level", "ai_recommendation"
-    ])
-    # Data rows
-    for entry in entries:
-        writer.writerow([
-            entry.date,
-            entry.sleep_hours,
-            entry.sleep_quality,
-            entry.screen_time,
-            entry.physical_activity,
-            entry.social_interaction,
-            entry.work_productivity,
-            entry.weather,
-            entry.diet_quality,
-            entry.mood_score,
-            entry.stress_level,
-            entry.ai_recommendation
-        ])
-    output.seek(0)
-    return StreamingResponse(
-        output,
-        media_type="text/csv",
-        headers={"Content-Disposition": f"attachment; filename=tracker_data_{current_user.username}.csv"}
-    )
\ No newline at end of file
+    chunks = export_stream(export_format, [current_user.id], start_date, end_date, legacy_csv=True)
+    headers = {
+        "Content-Disposition": f"attachment; filename=tracker_data_{current_user.username}.{FILE_EXTENSIONS[export_format]}",
+        "Vary": "Accept-Encoding"
+    }
+    # Parquet pages are already compressed
+    if export_format != "parquet" and "gzip" in request.headers.get("accept-encoding", ""):
+        chunks = iter_gzip(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type=MEDIA_TYPES[export_format], headers=headers)
@@ -1,63 +1,97 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Request
-from sqlalchemy.orm import Session
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncSession
 from ..database import get_db
 from .. import models, schemas
-from ..auth import oauth2_scheme, create_access_token
-from jose import jwt, JWTError
-import os
-from dotenv import load_dotenv
-import aiofiles
+from ..auth import oauth2_scheme, decode_access_token
+from ..utils.db_writer import db_writer
+from ..utils.principal_cache import principal_cache
+from ..utils.analytics import analytics_cache
+from ..utils.response_cache import response_cache, cached_json_response
+from ..utils.token_cache import token_cache
+from ..utils.metrics import span
+from ..utils.images import (
+    image_pipeline, avatar_urls, remove_legacy_image, InvalidImage, ImagePipelineBusy,
+    DEFAULT_THUMBNAIL, IMAGE_MAX_UPLOAD_BYTES,
+)
+from jose import JWTError
+import asyncio
 
 
-load_dotenv()
-
-SECRET_KEY = os.getenv("SECRET_KEY")
-ALGORITHM = os.getenv("ALGORITHM")
-MEDIA_FOLDER = os.path.join(os.path.dirname(__file__), 'media')
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
 user_router = APIRouter(prefix='/account', tags=['account'])
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)): 
-    credentials_exception = HTTPException(
-        status_code=401,
-        detail="Could not validate credentials",
-        headers={'WWW-Authenticate': 'Bearer'},
-    )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)): 
+    with span("auth.get_current_user"):
+        credentials_exception = HTTPException(
+            status_code=401,
+            detail="Could not validate credentials",
+            headers={'WWW-Authenticate': 'Bearer'},
+        )
+        try:
+            payload = decode_access_token(token)
+            subject: str = payload.get("sub")
+            token_version = payload.get("ver")
+            user_id = int(subject)
+        except (JWTError, TypeError, ValueError):
+            # TypeError/ValueError: no subject, or a pre user-id token with a username subject
+            raise credentials_exception
+        user = principal_cache.get(subject)
+        if user is None:
+            generation = principal_cache.generation
+            user = await db.get(models.User, user_id)
+            if user is None:
+                raise credentials_exception
+            # Cached users are shared between requests, keep them out of any session
+            db.expunge(user)
+            principal_cache.set(subject, user, generation)
+        # Revocation check from memory: tokens issued before the last token_version bump are
+        # rejected, bumps on other workers arrive with principal_cache.sync
+        if token_version != user.token_version:
             raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    user = db.query(models.User).filter(models.User.username == username).first()
-    if user is None:
-        raise credentials_exception
-    return user 
+        return user 
+
+
+async def get_current_admin(current_user: models.User = Depends(get_current_user)):
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin privileges required")
+    return current_user
+
 
 
+async def read_upload(file: UploadFile):
+    """Read an upload into memory, 413 once it exceeds IMAGE_MAX_UPLOAD_BYTES"""
+    chunks = []
+    size = 0
+    while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+        size += len(chunk)
+        if size > IMAGE_MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"Image is larger than {IMAGE_MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+        chunks.append(chunk)
+    return b"".join(chunks)
+
 
 @user_router.put("/profile")
 async def update_profile(
+    request: Request,
     full_name: str = Form(None),
     email: str = Form(None),
     username: str = Form(None),
     gender: str = Form(None),
     birth_date: str = Form(None),
     file: UploadFile = File(None),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ) -> schemas.UpdateProfileOutput:
-    user = db.query(models.User).filter(models.User.id == current_user.id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    # Attach a private copy of the authenticated user without querying it again
+    user = await db.merge(current_user, load=False)
     # Update fields
     if full_name is not None:
         user.full_name = full_name
     if email is not None:
         user.email = email 
-    old_username = current_user.username
     if username is not None:
         user.username = username 
     if gender is not None:
@@ -66,77 +100,94 @@ async def update_profile(
         from datetime import datetime 
         user.birth_date = datetime.strptime(birth_date, '%Y-%m-%d').date()
     # Handle file upload
+    old_image = None
     if file is not None:
-        if not os.path.exists(MEDIA_FOLDER):
-            os.makedirs(MEDIA_FOLDER)
-        
-        if file.content_type.lower().startswith('image/') or file.content_type.lower().endswith(("jpeg", "jpg", "png")):
-            # delete old image
-            if user.profile_image:
-                old_file_path = os.path.join(os.path.dirname(__file__), user.profile_image)
-                if os.path.exists(old_file_path):
-                    os.remove(old_file_path)
-            filename = f"user_{user.id}_{file.filename}"
-            file_path = os.path.join(MEDIA_FOLDER, filename)
-            async with aiofiles.open(file_path, 'wb') as f:
-                while True:
-                    chunk = await file.read(1024 * 1024)
-                    if not chunk:
-                        break 
-                    await f.write(chunk)
-            user.profile_image = f"{MEDIA_FOLDER}/{filename}"
-        else:
+        if not (file.content_type.lower().startswith('image/') or file.content_type.lower().endswith(("jpeg", "jpg", "png"))):
             raise HTTPException(status_code=400, detail="Invalid file type. Only images are allowed.")
-    db.commit()
-    db.refresh(user)
-    new_token = None 
-    if username is not None and username != old_username:
-        new_token = create_access_token({"sub": user.username})
-    return {"message": "Profile updated successfully", "profile_image": user.profile_image or "", "access_token": new_token, "gender": user.gender}
+        data = await read_upload(file)
+        try:
+            # Decoded and resized in the image worker processes, identical uploads reuse the stored thumbnails
+            profile_image = await image_pipeline.store(data)
+        except InvalidImage as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except ImagePipelineBusy:
+            raise HTTPException(status_code=503, detail="Too many image uploads, try again shortly", headers={"Retry-After": "1"})
+        old_image, user.profile_image = user.profile_image, profile_image
+    user.data_version = models.User.data_version + 1
+    await db_writer.run(db.commit)
+    principal_cache.invalidate(str(user.id))
+    if old_image != user.profile_image:
+        await asyncio.to_thread(remove_legacy_image, old_image)
+    images = avatar_urls(str(request.base_url), user.profile_image)
+    # Tokens carry the user id, so a username change no longer needs a new one
+    return {
+        "message": "Profile updated successfully",
+        "profile_image": images.get(DEFAULT_THUMBNAIL, ""),
+        "profile_images": images,
+        "access_token": None,
+        "gender": user.gender,
+    }
 
 
 @user_router.delete("/profile")
-async def delete_account(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)) -> schemas.DeleteAccountOutput:
-    user = db.query(models.User).filter(models.User.id == current_user.id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    # Delete profile image file
-    if user.profile_image:
-        file_path = os.path.join(MEDIA_FOLDER, user.profile_image)
-        if os.path.exists(file_path):
-            os.remove(file_path)
+async def delete_account(db: AsyncSession = Depends(get_db), current_user: models.User = Depends(get_current_user)) -> schemas.DeleteAccountOutput:
+    user = await db.merge(current_user, load=False)
     
-    # Delete tracker entries
-    db.query(models.TrackerEntry).filter(models.TrackerEntry.user_id == user.id).delete()
-    
-    # Delete user
-    db.delete(user)
-    db.commit()
+    async def delete_user():
+        # Delete tracker entries and their rollups
+        await db.execute(delete(models.TrackerEntry).where(models.TrackerEntry.user_id == user.id))
+        await db.execute(delete(models.TrackerRollup).where(models.TrackerRollup.user_id == user.id))
+        # Delete user
+        await db.delete(user)
+        await db.commit()
+
+    await db_writer.run(delete_user)
+    # Nothing cached for the account may outlive it
+    principal_cache.invalidate(str(user.id))
+    token_cache.evict_subject(str(user.id))
+    analytics_cache.evict(user.id)
+    response_cache.evict(user.id)
+    # Thumbnails may be shared with other users, only a pre-pipeline upload is deleted here
+    await asyncio.to_thread(remove_legacy_image, user.profile_image)
     return {"message": "Account deleted successfully"}
 
 
+@user_router.post("/logout")
+async def logout(db: AsyncSession = Depends(get_db), current_user: models.User = Depends(get_current_user)) -> schemas.LogoutOutput:
+    """
+    Revoke every access token issued to the current user
+    """
+    user = await db.merge(current_user, load=False)
+    user.token_version += 1
+    await db_writer.run(db.commit)
+    principal_cache.invalidate(str(user.id))
+    return {"message": "Logged out from all sessions"}
+
+
 
 @user_router.get("/profile")
 async def get_profile(
     request: Request,
-    db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ) -> schemas.GetProfileOutput:
     """
-    Get user profile
+    Get user profile, cached until the next profile update. Send the ETag back in If-None-Match to get a 304
     """
-    user = db.query(models.User).filter(models.User.id == current_user.id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-        
-    return {
-        "id": user.id,
-        "full_name": user.full_name,
-        "email": user.email,
-        "username": user.username,
-        "gender": user.gender,
-        "birth_date": user.birth_date.isoformat() if user.birth_date else None,
-        "profile_image": f"{str(request.base_url)}media/{os.path.basename(user.profile_image)}" if user.profile_image and os.path.exists(user.profile_image) else None,
-        "created_at": user.created_at.isoformat() if user.created_at else None
-    }
\ No newline at end of file
+    user = current_user
+
+    async def build():
+        images = avatar_urls(str(request.base_url), user.profile_image)
+        return {
+            "id": user.id,
+            "full_name": user.full_name,
+            "email": user.email,
+            "username": user.username,
+            "gender": user.gender,
+            "birth_date": user.birth_date.isoformat() if user.birth_date else None,
+            "profile_image": images.get(DEFAULT_THUMBNAIL),
+            "profile_images": images or None,
+            "created_at": user.created_at.isoformat() if user.created_at else None
+        }
+
+    # Image URLs embed the host the request came in on
+    return await cached_json_response(request, user, ("profile", str(request.base_url)), schemas.GetProfileOutput, build)
@@ -1,6 +1,7 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
-from datetime import datetime
+from pydantic import BaseModel, EmailStr, ValidationInfo, field_validator
+from typing import Any, Dict, List, Optional
+from datetime import date, datetime
+from .utils.prediction import load_feature_encoder
 
 class UserCreate(BaseModel):
     username: str 
@@ -29,26 +30,102 @@ class TrackerEntryCreate(BaseModel):
     weather: str 
     diet_quality: str 
     
+    @field_validator('sleep_quality', 'weather', 'diet_quality')
+    @classmethod
+    def validate_category(cls, value: str, info: ValidationInfo) -> str:
+        # Unknown categories are a 422 here instead of a 500 from the encoder
+        return load_feature_encoder().validate(info.field_name, value)
+    
 
 
 class PredictOutput(BaseModel):
+    id: Optional[int] = None
     mood_score: Optional[float] = None
     stress_level: Optional[float] = None
     ai_recommendation: Optional[str] = None
+    recommendation_status: Optional[str] = None
+    model_version: Optional[str] = None
     date: Optional[datetime] = None
     detail: Optional[str] = None
     
     
 
+class MetricSummary(BaseModel):
+    mean: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+
+
+class TrendBucket(BaseModel):
+    period_start: date
+    label: str
+    count: int
+    mood_score: MetricSummary
+    stress_level: MetricSummary
+    sleep_hours: MetricSummary
+    screen_time: MetricSummary
+
+
+class TrendsOutput(BaseModel):
+    period: str
+    buckets: List[TrendBucket]
+
+
+class StreakSummary(BaseModel):
+    current: int
+    longest: int
+    last_entry: Optional[date] = None
+
+
+class TargetValues(BaseModel):
+    mood_score: Optional[float] = None
+    stress_level: Optional[float] = None
+
+
+class InsightsPoint(BaseModel):
+    date: date
+    mood_score_7d: Optional[float] = None
+    stress_level_7d: Optional[float] = None
+    mood_score_30d: Optional[float] = None
+    stress_level_30d: Optional[float] = None
+
+
+class InsightsOutput(BaseModel):
+    entries: int
+    streak: StreakSummary
+    rolling: Dict[str, TargetValues]
+    correlations: Dict[str, TargetValues]
+    correlation_samples: int
+    series: List[InsightsPoint]
+
+
+class RecommendationOutput(BaseModel):
+    id: int 
+    recommendation_status: str 
+    ai_recommendation: Optional[str] = None 
+    
+    
+
+class HistoryPage(BaseModel):
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None
+    
+    
+
 class UpdateProfileOutput(BaseModel):
     message: str 
     profile_image: Optional[str] = None 
+    profile_images: Dict[str, str] = {}
     access_token: Optional[str] = None
     gender: Optional[str] = None
     
     
 class DeleteAccountOutput(BaseModel):
     message: str 
+
+
+class LogoutOutput(BaseModel):
+    message: str
     
     
 
@@ -60,6 +137,7 @@ class GetProfileOutput(BaseModel):
     gender: Optional[str] = None 
     birth_date: Optional[str] = None 
     profile_image: Optional[str] = None 
+    profile_images: Optional[Dict[str, str]] = None
     created_at: str 
     
     
@@ -69,3 +147,24 @@ class RegisterOutput(BaseModel):
     token_type: str 
     
     
+
+
+class ModelVersionInput(BaseModel):
+    version: Optional[str] = None
+
+
+class ShadowStats(BaseModel):
+    version: Optional[str] = None
+    rows: int
+    errors: int
+    mood_score_mean_abs_diff: float
+    stress_level_mean_abs_diff: float
+    mood_score_max_abs_diff: float
+    stress_level_max_abs_diff: float
+
+
+class ModelRegistryOutput(BaseModel):
+    live: Optional[str] = None
+    shadow: Optional[str] = None
+    versions: List[str]
+    shadow_stats: Optional[ShadowStats] = None
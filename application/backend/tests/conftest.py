@@ -0,0 +1,89 @@
+"""Shared fixtures: the app against a throwaway SQLite database, the fake LLM and a cheap bcrypt cost
+
+The environment is set before any backend module is imported, they read their
+settings at import time.
+"""
+import itertools
+import os
+import tempfile
+
+import pytest
+
+
+WORKDIR = tempfile.mkdtemp(prefix="calmora-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite+aiosqlite:///{os.path.join(WORKDIR, 'test.db')}",
+    "SECRET_KEY": "test-secret",
+    "ALGORITHM": "HS256",
+    "ACCESS_TOKEN_EXPIRE_MINUTES": "60",
+    "LLM_PROVIDER": "fake",
+    "FAKE_LLM_LATENCY": "0",
+    "FAKE_LLM_FAILURE_RATE": "0",
+    "BCRYPT_ROUNDS": "4",
+    "MODEL_WATCH_INTERVAL": "0",
+    "RECOMMENDATION_RECOVERY_INTERVAL": "0",
+    "PRINCIPAL_CACHE_SYNC_INTERVAL": "0",
+    "MEDIA_DIR": os.path.join(WORKDIR, "media"),
+    "IMAGE_WORKERS": "1",
+    "PROFILE_DIR": os.path.join(WORKDIR, "profiles"),
+})
+os.environ.pop("SYNC_DATABASE_URL", None)
+
+PASSWORD = "test-password"
+
+ENTRY = {
+    "sleep_hours": 7, "sleep_quality": "Good", "screen_time": 4, "physical_activity": 30,
+    "social_interaction": 2, "work_productivity": 7, "weather": "Sunny", "diet_quality": "Good",
+}
+
+_user_ids = itertools.count(1)
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from backend.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def db():
+    from backend.database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def register(client):
+    """Register a fresh user, returns (user_id, auth headers)"""
+    from backend.auth import decode_access_token
+
+    def register_user():
+        name = f"user{next(_user_ids)}_{os.getpid()}"
+        response = client.post("/auth/register", json={"username": name, "email": f"{name}@example.com", "password": PASSWORD})
+        assert response.status_code == 200, response.text
+        token = response.json()["access_token"]
+        return int(decode_access_token(token)["sub"]), {"Authorization": f"Bearer {token}"}
+
+    return register_user
+
+
+@pytest.fixture
+def add_entry(db):
+    """Insert a tracker entry directly, returns its id. Columns default to ENTRY and a ready recommendation"""
+    from backend import models
+
+    def insert(user_id, day, **values):
+        defaults = {**ENTRY, "mood_score": 6.0, "stress_level": 4.0, "recommendation_status": "ready"}
+        entry = models.TrackerEntry(user_id=user_id, date=day, **{**defaults, **values})
+        db.add(entry)
+        db.commit()
+        return entry.id
+
+    return insert
@@ -0,0 +1,72 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import update
+
+from backend.utils.analytics import UserHistory, compute_insights
+
+
+# (date, mood_score, stress_level, sleep_hours, screen_time, physical_activity)
+ROWS = [
+    (date(2024, 3, 20), 5.0, 4.0, 8.0, 10.0, 30),
+    (date(2024, 3, 21), 6.0, 3.0, 8.0, 12.0, 20),
+    (date(2024, 3, 22), 7.0, 2.0, 8.0, 14.0, 40),
+    (date(2024, 3, 29), 8.0, 1.0, 8.0, 16.0, 10),
+    # No mood on the last day, stress still counts
+    (date(2024, 3, 30), None, 5.0, 8.0, 9.0, 50),
+]
+
+
+@pytest.fixture
+def insights():
+    return compute_insights(UserHistory.from_rows(ROWS), date(2024, 3, 31), days=30)
+
+
+def point(insights, day):
+    return next(point for point in insights["series"] if point["date"] == day)
+
+
+def test_streaks(insights):
+    assert insights["entries"] == 5
+    assert insights["streak"] == {"current": 2, "longest": 3, "last_entry": date(2024, 3, 30)}
+    # Nothing logged yesterday or today breaks the current streak
+    later = compute_insights(UserHistory.from_rows(ROWS), date(2024, 4, 1), days=30)
+    assert later["streak"]["current"] == 0
+
+
+def test_window_means_skip_gaps_and_missing_values(insights):
+    assert insights["rolling"]["7d"] == {"mood_score": 8.0, "stress_level": 3.0}
+    assert insights["rolling"]["30d"] == {"mood_score": 6.5, "stress_level": 3.0}
+    # 22-28 March only holds the 22nd
+    assert point(insights, date(2024, 3, 28))["mood_score_7d"] == 7.0
+    # 13-19 March holds nothing
+    assert point(insights, date(2024, 3, 19))["mood_score_7d"] is None
+    assert len(insights["series"]) == 30
+
+
+def test_correlations_leave_constant_features_undefined(insights):
+    assert insights["correlation_samples"] == 4
+    assert insights["correlations"]["sleep_hours"] == {"mood_score": None, "stress_level": None}
+    assert insights["correlations"]["screen_time"] == {"mood_score": 1.0, "stress_level": -1.0}
+
+
+def test_empty_history():
+    insights = compute_insights(UserHistory.from_rows([]), date(2024, 3, 31), days=7)
+    assert insights["streak"] == {"current": 0, "longest": 0, "last_entry": None}
+    assert insights["rolling"]["7d"] == {"mood_score": None, "stress_level": None}
+    assert insights["correlation_samples"] == 0
+
+
+def test_entry_added_on_another_worker_reaches_insights(client, register, add_entry, db):
+    from backend import models
+    from backend.utils.principal_cache import principal_cache
+
+    user_id, headers = register()
+    add_entry(user_id, date(2024, 3, 1))
+    assert client.get("/tracker/insights", headers=headers).json()["entries"] == 1
+
+    add_entry(user_id, date(2024, 3, 2))
+    db.execute(update(models.User).where(models.User.id == user_id).values(data_version=models.User.data_version + 1))
+    db.commit()
+    client.portal.call(principal_cache.sync)
+    assert client.get("/tracker/insights", headers=headers).json()["entries"] == 2
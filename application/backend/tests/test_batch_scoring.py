@@ -0,0 +1,32 @@
+import pyarrow.parquet as pq
+
+from backend.utils.batch_scoring import ChunkWriter, score_file
+from backend.utils.compiled_model import PARITY_DATA_PATH
+
+
+def test_csv_to_parquet_keeps_one_schema_across_chunks(tmp_path):
+    source = tmp_path / "input.csv"
+    with open(PARITY_DATA_PATH) as f:
+        header, *lines = f.read().splitlines()[:7]
+    # The second chunk (rows 4-6) carries a blank and an extra column of fractions
+    source.write_text("\n".join([header + ",note,extra"] + [f"{line},,{1 if i < 3 else 1.5}" for i, line in enumerate(lines)]) + "\n")
+    output = tmp_path / "scored.parquet"
+
+    rows, _ = score_file(str(source), str(output), workers=0, chunk_size=3)
+
+    table = pq.read_table(output)
+    assert rows == table.num_rows == 6
+    assert table.column("extra").to_pylist() == [1, 1, 1, 1.5, 1.5, 1.5]
+    assert table.column("note").null_count == 6
+
+
+def test_parquet_writer_without_widen_keeps_integer_columns(tmp_path):
+    import pandas as pd
+
+    writer = ChunkWriter(str(tmp_path / "out.parquet"))
+    writer.write(pd.DataFrame({"id": [1, 2]}))
+    writer.write(pd.DataFrame({"id": [3]}))
+    writer.close()
+    table = pq.read_table(tmp_path / "out.parquet")
+    assert str(table.schema.field("id").type) == "int64"
+    assert table.column("id").to_pylist() == [1, 2, 3]
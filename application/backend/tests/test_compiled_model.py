@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from backend.utils.compiled_model import PARITY_DATA_PATH, compile_model
+from backend.utils.encoding import DATASET_COLUMNS
+from backend.utils.prediction import load_models, load_compiled_model, load_feature_encoder
+
+
+@pytest.fixture(scope="module")
+def artifacts():
+    model, _, _, _, scaler = load_models()
+    data = pd.read_csv(PARITY_DATA_PATH)
+    X = load_feature_encoder().encode_columns({feature: data[column] for feature, column in DATASET_COLUMNS.items()})
+    return model, scaler, X
+
+
+def test_served_forest_matches_joblib_model_on_test_csv(artifacts):
+    model, scaler, X = artifacts
+    assert np.allclose(load_compiled_model().predict(X), model.predict(scaler.transform(X)), rtol=0, atol=1e-9)
+
+
+def test_freshly_compiled_forest_matches_joblib_model_on_test_csv(artifacts):
+    model, scaler, X = artifacts
+    assert np.allclose(compile_model(model, scaler).predict(X), model.predict(scaler.transform(X)), rtol=0, atol=1e-9)
+
+
+def split_boundary_rows(model, X_scaled):
+    """Rows whose split feature sits on each root split threshold, in float32 and in float64
+
+    Float64 values just above the threshold that round down to it in float32 go
+    left in sklearn, which compares float32 inputs, a naive float64 comparison
+    sends them right.
+    """
+    base = np.median(X_scaled, axis=0)
+    rows = []
+    for estimator in model.estimators_:
+        for tree in estimator.estimators_[:25, 0]:
+            feature, threshold = tree.tree_.feature[0], tree.tree_.threshold[0]
+            # sklearn compares float32 inputs with a float64 threshold
+            on = np.float32(threshold)
+            if on > threshold:
+                on = np.nextafter(on, np.float32(-np.inf))
+            above = np.nextafter(on, np.float32(np.inf))
+            midpoint = (np.float64(on) + np.float64(above)) / 2
+            for value in (
+                on, above, np.nextafter(on, np.float32(-np.inf)),
+                threshold, np.nextafter(threshold, np.inf), np.nextafter(midpoint, -np.inf), midpoint,
+            ):
+                row = base.copy()
+                row[feature] = value
+                rows.append(row)
+    return np.array(rows)
+
+
+def test_rows_on_float32_split_thresholds_take_the_same_branch(artifacts):
+    model, scaler, X = artifacts
+    X_scaled = split_boundary_rows(model, scaler.transform(X))
+    # Without a folded scaler the compiled forest sees exactly the values sklearn compares
+    assert np.allclose(compile_model(model).predict(X_scaled), model.predict(X_scaled), rtol=0, atol=1e-9)
+    # With the scaler folded in, raw rows that scale onto those boundaries
+    X_raw = scaler.inverse_transform(X_scaled)
+    assert np.allclose(compile_model(model, scaler).predict(X_raw), model.predict(scaler.transform(X_raw)), rtol=0, atol=1e-9)
@@ -0,0 +1,34 @@
+def cached_keys(response_cache, user_id):
+    return [key for key in response_cache._entries if key[0] == user_id]
+
+
+def test_deleted_account_id_is_not_reused(client, register):
+    alice_id, alice = register()
+    assert client.delete("/account/profile", headers=alice).status_code == 200
+
+    bob_id, bob = register()
+    assert bob_id != alice_id
+    assert client.get("/account/profile", headers=alice).status_code == 401
+    assert client.get("/account/profile", headers=bob).status_code == 200
+
+
+def test_delete_evicts_every_cache_of_the_user(client, register, add_entry):
+    from datetime import date
+    from backend.utils.analytics import analytics_cache
+    from backend.utils.principal_cache import principal_cache
+    from backend.utils.response_cache import response_cache
+    from backend.utils.token_cache import token_cache
+
+    user_id, headers = register()
+    add_entry(user_id, date(2024, 3, 1))
+    for path in ("/account/profile", "/tracker/history", "/tracker/insights"):
+        assert client.get(path, headers=headers).status_code == 200
+    token = headers["Authorization"].removeprefix("Bearer ")
+    assert cached_keys(response_cache, user_id)
+    assert token_cache.get(token) is not None
+
+    assert client.delete("/account/profile", headers=headers).status_code == 200
+    assert not cached_keys(response_cache, user_id)
+    assert token_cache.get(token) is None
+    assert principal_cache.get(str(user_id)) is None
+    assert user_id not in analytics_cache._entries
@@ -0,0 +1,20 @@
+import io
+import json
+from datetime import date
+
+import pyarrow.parquet as pq
+import pytest
+
+
+@pytest.mark.parametrize("export_format", ["ndjson", "parquet"])
+def test_exports_leave_out_bookkeeping_columns(client, register, add_entry, export_format):
+    user_id, headers = register()
+    add_entry(user_id, date(2024, 3, 1), idempotency_key="retry-key")
+    response = client.get("/tracker/export", params={"format": export_format}, headers=headers)
+    assert response.status_code == 200
+    if export_format == "ndjson":
+        columns = set(json.loads(response.text.splitlines()[0]))
+    else:
+        columns = set(pq.read_table(io.BytesIO(response.content)).column_names)
+    assert {"date", "mood_score", "stress_level", "ai_recommendation"} <= columns
+    assert not {"idempotency_key", "claimed_at"} & columns
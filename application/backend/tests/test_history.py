@@ -0,0 +1,72 @@
+from datetime import date, timedelta
+
+import pytest
+
+from backend.routers.tracker_router import HISTORY_FIELDS
+
+
+def page_through(client, headers, **params):
+    """Follow next_cursor until the last page, returns the pages"""
+    pages = []
+    cursor = None
+    while True:
+        query = {**params, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/tracker/history", params=query, headers=headers)
+        assert response.status_code == 200, response.text
+        pages.append(response.json())
+        cursor = pages[-1]["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+@pytest.fixture
+def history_user(register, add_entry):
+    """A user with 10 entries on consecutive days, returns (headers, dates newest first)"""
+    user_id, headers = register()
+    start = date(2024, 1, 1)
+    dates = [start + timedelta(days=i) for i in range(10)]
+    for day in dates:
+        add_entry(user_id, day)
+    return headers, [day.isoformat() for day in reversed(dates)]
+
+
+@pytest.mark.parametrize("limit", [1, 3, 5, 10, 11])
+def test_cursor_pages_cover_every_entry_once_newest_first(client, history_user, limit):
+    headers, dates = history_user
+    pages = page_through(client, headers, limit=limit)
+    assert [item["date"] for page in pages for item in page["items"]] == dates
+    assert all(len(page["items"]) == limit for page in pages[:-1])
+    # An exact multiple of the limit ends without an empty trailing page
+    assert len(pages) == max(1, -(-len(dates) // limit))
+
+
+def test_cursor_paging_within_a_date_range(client, history_user):
+    headers, dates = history_user
+    pages = page_through(client, headers, limit=2, **{"from": dates[7], "to": dates[2]})
+    assert [item["date"] for page in pages for item in page["items"]] == dates[2:8]
+
+
+def test_invalid_cursor_is_rejected(client, history_user):
+    headers, _ = history_user
+    assert client.get("/tracker/history", params={"cursor": "not-a-cursor"}, headers=headers).status_code == 400
+
+
+def test_default_projection_is_the_public_columns_only(client, history_user):
+    headers, _ = history_user
+    item = client.get("/tracker/history", headers=headers).json()["items"][0]
+    assert set(item) == set(HISTORY_FIELDS)
+    assert not {"user_id", "idempotency_key", "model_version", "claimed_at"} & set(item)
+
+
+@pytest.mark.parametrize("field", ["user_id", "idempotency_key", "model_version", "claimed_at"])
+def test_internal_columns_cannot_be_requested(client, history_user, field):
+    headers, _ = history_user
+    response = client.get("/tracker/history", params={"fields": f"date,{field}"}, headers=headers)
+    assert response.status_code == 422
+
+
+def test_fields_projection_keeps_the_keyset_columns(client, history_user):
+    headers, dates = history_user
+    item = client.get("/tracker/history", params={"fields": "mood_score"}, headers=headers).json()["items"][0]
+    assert set(item) == {"id", "date", "mood_score"}
+    assert item["date"] == dates[0]
@@ -0,0 +1,63 @@
+import io
+import os
+import time
+
+from PIL import Image
+
+from backend.utils.images import AVATAR_DIR, THUMBNAIL_SIZES, collect_garbage, store_avatar
+
+
+def png(color="teal", size=(800, 600)):
+    output = io.BytesIO()
+    Image.new("RGB", size, color).save(output, "PNG")
+    return output.getvalue()
+
+
+def test_upload_serves_every_thumbnail_with_a_strong_etag(client, register):
+    _, headers = register()
+    response = client.put("/account/profile", files={"file": ("me.png", png(), "image/png")}, headers=headers)
+    assert response.status_code == 200, response.text
+    urls = response.json()["profile_images"]
+    assert set(urls) == set(THUMBNAIL_SIZES)
+    assert response.json()["profile_image"] == urls["medium"]
+
+    for name, size in THUMBNAIL_SIZES.items():
+        thumbnail = client.get(urls[name])
+        assert thumbnail.status_code == 200
+        assert Image.open(io.BytesIO(thumbnail.content)).size == (size, size)
+        etag = thumbnail.headers["etag"]
+        assert etag == f'"{os.path.basename(urls[name]).removesuffix(".webp")}"'
+        assert "immutable" in thumbnail.headers["cache-control"]
+
+        revalidated = client.get(urls[name], headers={"If-None-Match": etag})
+        assert revalidated.status_code == 304
+        assert revalidated.headers["etag"] == etag
+
+
+def test_invalid_image_is_rejected(client, register):
+    _, headers = register()
+    response = client.put("/account/profile", files={"file": ("me.png", b"not an image", "image/png")}, headers=headers)
+    assert response.status_code == 400
+
+
+def test_deduplicated_upload_is_not_collected(tmp_path, db):
+    data = png("purple")
+    key, created = store_avatar(data, str(tmp_path))
+    assert created
+    directory = tmp_path / AVATAR_DIR
+    old = time.time() - 7200
+    for path in directory.iterdir():
+        os.utime(path, (old, old))
+
+    # The same image uploaded again, its profile update not committed yet
+    assert store_avatar(data, str(tmp_path)) == (key, False)
+    assert collect_garbage(db, str(tmp_path), min_age=3600) == []
+    assert len(list(directory.iterdir())) == len(THUMBNAIL_SIZES)
+
+
+def test_deleted_thumbnails_are_written_again(tmp_path):
+    data = png("orange")
+    key, _ = store_avatar(data, str(tmp_path))
+    os.remove(tmp_path / AVATAR_DIR / f"{key}_{THUMBNAIL_SIZES['small']}.webp")
+    assert store_avatar(data, str(tmp_path)) == (key, True)
+    assert len(list((tmp_path / AVATAR_DIR).iterdir())) == len(THUMBNAIL_SIZES)
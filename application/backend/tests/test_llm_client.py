@@ -0,0 +1,42 @@
+import os
+import subprocess
+import sys
+
+
+APPLICATION_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../.."))
+
+
+def test_importing_the_prediction_helpers_builds_no_llm_agent():
+    # schemas.py imports utils.prediction, the Gemini agent is only created by the gemini provider
+    code = "import sys, backend.schemas, backend.utils.prediction; sys.exit('backend.utils.ai_agent' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", code], cwd=APPLICATION_DIR).returncode == 0
+
+
+def test_cancelled_probe_lets_the_breaker_recover():
+    import asyncio
+    from backend.utils.llm_client import CircuitBreaker, RecommendationClient
+
+    class HangingProvider:
+        async def generate(self, prompt):
+            await asyncio.sleep(60)
+
+    class WorkingProvider:
+        async def generate(self, prompt):
+            return "Take a walk."
+
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    async def main():
+        client = RecommendationClient(provider=HangingProvider(), max_retries=0, breaker=breaker, cache=None)
+        probe = asyncio.create_task(client._generate("prompt"))
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        await asyncio.gather(probe, return_exceptions=True)
+
+        client.provider = WorkingProvider()
+        return await client._generate("prompt")
+
+    assert asyncio.run(main()) == "Take a walk."
+    assert breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,43 @@
+from sqlalchemy import update
+
+
+def test_logout_revokes_token(client, register):
+    _, headers = register()
+    assert client.get("/account/profile", headers=headers).status_code == 200
+    assert client.post("/account/logout", headers=headers).status_code == 200
+    assert client.get("/account/profile", headers=headers).status_code == 401
+
+
+def test_logout_on_another_worker_revokes_cached_principal(client, register, db):
+    from backend import models
+    from backend.utils.principal_cache import principal_cache
+
+    user_id, headers = register()
+    assert client.get("/account/profile", headers=headers).status_code == 200
+    assert principal_cache.get(str(user_id)) is not None
+
+    # What another process's logout leaves behind: the stored version bumped, this cache untouched
+    db.execute(update(models.User).where(models.User.id == user_id).values(token_version=models.User.token_version + 1))
+    db.commit()
+    # Picked up by the periodic sync, never by a query on the request path
+    assert client.portal.call(principal_cache.sync) >= 1
+    assert client.get("/account/profile", headers=headers).status_code == 401
+
+
+def test_warm_profile_runs_no_sql(client, register):
+    from sqlalchemy import event
+    from backend.database import async_engine
+
+    _, headers = register()
+    assert client.get("/account/profile", headers=headers).status_code == 200
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", record)
+    try:
+        assert client.get("/account/profile", headers=headers).status_code == 200
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", record)
+    assert statements == []
@@ -0,0 +1,37 @@
+import pytest
+from sqlalchemy import update
+
+from backend.utils.model_registry import ModelRegistry, model_registry
+
+
+@pytest.fixture
+def admin_headers(register, db):
+    from backend import models
+    from backend.utils.principal_cache import principal_cache
+
+    user_id, headers = register()
+    db.execute(update(models.User).where(models.User.id == user_id).values(is_admin=True))
+    db.commit()
+    principal_cache.invalidate(str(user_id))
+    return headers
+
+
+@pytest.mark.parametrize("version", ["../models/v1", "v1/../v1", "..", ".v1", "v1\x00", "v2"])
+def test_unknown_or_malformed_versions_are_404(client, admin_headers, version):
+    live = model_registry.status()["live"]
+    for endpoint in ("/admin/models/activate", "/admin/models/shadow"):
+        response = client.post(endpoint, json={"version": version}, headers=admin_headers)
+        assert response.status_code == 404, response.text
+    assert model_registry.status()["live"] == live
+
+
+def test_registry_only_resolves_listed_versions(tmp_path):
+    registry = ModelRegistry(str(tmp_path / "registry"), watch_interval=0)
+    (tmp_path / "registry").mkdir()
+    # A manifest outside the registry must not be reachable through a relative name
+    (tmp_path / "outside").mkdir()
+    (tmp_path / "outside" / "manifest.json").write_text("{}")
+    with pytest.raises(FileNotFoundError):
+        registry.bundle("../outside")
+    with pytest.raises(ValueError):
+        registry.register(str(tmp_path), "../outside")
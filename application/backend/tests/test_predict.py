@@ -0,0 +1,64 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select
+
+from backend.routers.tracker_router import PREDICTION_EXISTS
+from backend.tests.conftest import ENTRY
+
+
+def predict(client, headers, key=None):
+    if key is not None:
+        headers = {**headers, "Idempotency-Key": key}
+    return client.post("/tracker/predict", json=ENTRY, headers=headers)
+
+
+def entry_count(db, user_id):
+    from backend import models
+
+    return db.scalar(select(func.count()).select_from(models.TrackerEntry).where(models.TrackerEntry.user_id == user_id))
+
+
+def test_retry_with_the_same_key_replays_the_entry(client, register, db):
+    user_id, headers = register()
+    first = predict(client, headers, "retry-1")
+    assert first.status_code == 201
+    assert "Idempotent-Replayed" not in first.headers
+
+    retry = predict(client, headers, "retry-1")
+    assert retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    # The recommendation may have been generated in between
+    assert {**retry.json(), "recommendation_status": None} == {**first.json(), "recommendation_status": None}
+    assert entry_count(db, user_id) == 1
+
+
+def test_key_of_an_earlier_day_replays_that_entry(client, register, add_entry):
+    user_id, headers = register()
+    yesterday = datetime.utcnow().date() - timedelta(days=1)
+    entry_id = add_entry(user_id, yesterday, idempotency_key="sent-yesterday")
+
+    retry = predict(client, headers, "sent-yesterday")
+    assert retry.status_code == 200
+    assert retry.json()["id"] == entry_id
+
+
+def test_second_prediction_of_the_day_is_refused(client, register, db):
+    user_id, headers = register()
+    assert predict(client, headers, "first").status_code == 201
+    for key in ("second", None):
+        response = predict(client, headers, key)
+        assert response.json()["detail"] == PREDICTION_EXISTS
+        assert response.json()["id"] is None
+        assert "Idempotent-Replayed" not in response.headers
+    assert entry_count(db, user_id) == 1
+
+
+def test_concurrent_duplicates_store_one_entry(client, register, db):
+    user_id, headers = register()
+    with ThreadPoolExecutor(8) as pool:
+        responses = list(pool.map(lambda _: predict(client, headers, "storm"), range(8)))
+
+    assert sorted(response.status_code for response in responses) == [200] * 7 + [201]
+    assert len({response.json()["id"] for response in responses}) == 1
+    assert entry_count(db, user_id) == 1
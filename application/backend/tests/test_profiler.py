@@ -0,0 +1,53 @@
+import asyncio
+import sys
+import time
+
+from backend.utils.metrics import SamplingProfiler
+
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def busy_in_profiled_task():
+    busy(0.05)
+
+
+def busy_in_other_task():
+    busy(0.05)
+
+
+def test_profiler_samples_only_its_task():
+    async def profiled():
+        profiler = SamplingProfiler(asyncio.current_task(), sys._getframe(), interval=0.002)
+        profiler.start()
+        try:
+            for _ in range(3):
+                busy_in_profiled_task()
+                # The other task runs the loop thread meanwhile
+                await asyncio.sleep(0.03)
+        finally:
+            profiler.stop()
+        return profiler.samples
+
+    async def other():
+        for _ in range(6):
+            busy_in_other_task()
+            await asyncio.sleep(0)
+
+    async def request():
+        # Like the middleware's frame, the profiled one is not the task's outermost coroutine
+        return await profiled()
+
+    async def main():
+        samples, _ = await asyncio.gather(request(), other())
+        return samples
+
+    samples = asyncio.run(main())
+    stacks = "\n".join(samples)
+    assert "busy_in_profiled_task" in stacks
+    assert "busy_in_other_task" not in stacks
+    assert all(stack.startswith("profiled (test_profiler.py)") for stack in samples)
+    assert any(stack.endswith("(waiting)") for stack in samples)
@@ -0,0 +1,35 @@
+import asyncio
+import threading
+
+from backend.utils.recommendation_cache import RecommendationCache
+
+
+def test_persistent_tier_survives_a_restart_and_runs_off_the_loop(tmp_path, monkeypatch):
+    path = str(tmp_path / "recommendations.db")
+    loop_threads = set()
+    db_threads = []
+
+    cache = RecommendationCache(db_path=path)
+    for name in ("_load", "_persist"):
+        original = getattr(cache, name)
+
+        def recorded(*args, original=original):
+            db_threads.append(threading.get_ident())
+            return original(*args)
+
+        monkeypatch.setattr(cache, name, recorded)
+
+    async def fill():
+        loop_threads.add(threading.get_ident())
+        assert await cache.get("key") is None
+        await cache.set("key", "Sleep a little more.")
+
+    asyncio.run(fill())
+    assert db_threads and loop_threads.isdisjoint(db_threads)
+
+    restarted = RecommendationCache(db_path=path)
+    assert asyncio.run(restarted.get("key")) == "Sleep a little more."
+    assert restarted.stats()["persistent_hits"] == 1
+    # Now in memory
+    assert asyncio.run(restarted.get("key")) == "Sleep a little more."
+    assert restarted.stats()["persistent_hits"] == 1
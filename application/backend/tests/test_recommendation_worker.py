@@ -0,0 +1,38 @@
+import asyncio
+from datetime import date, datetime, timedelta
+
+from backend import models
+from backend.utils.recommendation_worker import _claim_stale_jobs, _store_recommendation, RECOMMENDATION_READY
+
+
+def test_stale_leases_are_claimed_once_and_fresh_ones_left_alone(client, register, add_entry):
+    user_id, _ = register()
+    now = datetime.utcnow()
+    unclaimed = add_entry(user_id, date(2020, 1, 1), recommendation_status="pending", claimed_at=None)
+    expired = add_entry(user_id, date(2020, 1, 2), recommendation_status="pending", claimed_at=now - timedelta(hours=1))
+    held = add_entry(user_id, date(2020, 1, 3), recommendation_status="pending", claimed_at=now)
+
+    async def recover_twice():
+        return await asyncio.gather(_claim_stale_jobs(100, []), _claim_stale_jobs(100, []))
+
+    first, second = client.portal.call(recover_twice)
+    # Other tests' entries may be recovered too, each of ours must be claimed exactly once
+    claimed = [job[0] for job in first + second if job[0] in (unclaimed, expired, held)]
+    assert sorted(claimed) == [unclaimed, expired]
+
+
+def test_result_is_not_written_after_the_lease_was_taken_over(client, register, db, add_entry):
+    user_id, _ = register()
+    ours = datetime.utcnow() - timedelta(hours=1)
+    entry_id = add_entry(user_id, date(2020, 2, 1), recommendation_status="pending", claimed_at=ours)
+    # Another worker recovers the expired lease
+    [(_, _, theirs)] = [job for job in client.portal.call(_claim_stale_jobs, 100, []) if job[0] == entry_id]
+
+    client.portal.call(_store_recommendation, entry_id, ours, "late", RECOMMENDATION_READY)
+    db.expire_all()
+    assert db.get(models.TrackerEntry, entry_id).recommendation_status == "pending"
+
+    client.portal.call(_store_recommendation, entry_id, theirs, "fresh", RECOMMENDATION_READY)
+    db.expire_all()
+    entry = db.get(models.TrackerEntry, entry_id)
+    assert (entry.recommendation_status, entry.ai_recommendation, entry.claimed_at) == ("ready", "fresh", None)
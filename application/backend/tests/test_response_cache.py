@@ -0,0 +1,46 @@
+from datetime import date
+
+from sqlalchemy import update
+
+from backend.tests.conftest import ENTRY
+
+
+def bump(client, db, user_id, **values):
+    """A write served by another worker: data_version moved in the database, then this worker's next sync"""
+    from backend import models
+    from backend.utils.principal_cache import principal_cache
+
+    db.execute(update(models.User).where(models.User.id == user_id).values(data_version=models.User.data_version + 1, **values))
+    db.commit()
+    client.portal.call(principal_cache.sync)
+
+
+def test_history_is_revalidated_until_the_user_writes(client, register):
+    _, headers = register()
+    first = client.get("/tracker/history", headers=headers)
+    etag = first.headers["ETag"]
+    assert client.get("/tracker/history", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    assert client.post("/tracker/predict", json=ENTRY, headers=headers).status_code == 201
+    changed = client.get("/tracker/history", headers={**headers, "If-None-Match": etag})
+    assert changed.status_code == 200
+    assert len(changed.json()["items"]) == 1
+
+
+def test_write_on_another_worker_retires_cached_history(client, register, add_entry, db):
+    user_id, headers = register()
+    etag = client.get("/tracker/history", headers=headers).headers["ETag"]
+
+    add_entry(user_id, date(2024, 3, 1))
+    bump(client, db, user_id)
+    response = client.get("/tracker/history", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert [item["date"] for item in response.json()["items"]] == ["2024-03-01"]
+
+
+def test_profile_update_on_another_worker_is_served(client, register, db):
+    user_id, headers = register()
+    assert client.get("/account/profile", headers=headers).json()["full_name"] is None
+
+    bump(client, db, user_id, full_name="Changed Elsewhere")
+    assert client.get("/account/profile", headers=headers).json()["full_name"] == "Changed Elsewhere"
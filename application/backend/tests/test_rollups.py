@@ -0,0 +1,50 @@
+import sys
+from datetime import datetime
+
+from backend.routers.tracker_router import PREDICTION_EXISTS
+from backend.tests.conftest import ENTRY
+
+
+def trends(client, headers, period):
+    response = client.get("/tracker/trends", params={"period": period}, headers=headers)
+    assert response.status_code == 200
+    return response.json()["buckets"]
+
+
+def test_duplicate_predict_is_not_counted_twice(client, register):
+    _, headers = register()
+    first = client.post("/tracker/predict", json=ENTRY, headers=headers)
+    assert first.status_code == 201
+    again = client.post("/tracker/predict", json={**ENTRY, "sleep_hours": 3}, headers=headers)
+    assert again.json()["detail"] == PREDICTION_EXISTS
+
+    for period in ("week", "month"):
+        [bucket] = trends(client, headers, period)
+        assert bucket["count"] == 1
+        assert bucket["sleep_hours"] == {"mean": 7, "min": 7, "max": 7}
+        assert bucket["mood_score"]["mean"] == round(first.json()["mood_score"], 2)
+
+
+def test_rebuild_matches_incremental_totals(client, register, db, monkeypatch):
+    from backend.utils.rollups import rebuild_rollups
+
+    # The package exports the router under the module's name
+    router_module = sys.modules["backend.routers.tracker_router"]
+    user_id, headers = register()
+    # Two weeks of one month, the second week twice as long, each day submitted through predict
+    for day, sleep_hours in [(4, 6), (11, 8), (12, 5)]:
+        submitted = datetime(2024, 3, day, 12)
+        monkeypatch.setattr(router_module, "datetime", type("Clock", (datetime,), {"utcnow": staticmethod(lambda: submitted)}))
+        response = client.post("/tracker/predict", json={**ENTRY, "sleep_hours": sleep_hours}, headers=headers)
+        assert response.status_code == 201
+    incremental = {period: trends(client, headers, period) for period in ("week", "month")}
+    assert [bucket["count"] for bucket in incremental["week"]] == [1, 2]
+    assert incremental["month"][0]["count"] == 3
+    assert incremental["month"][0]["sleep_hours"] == {"mean": 6.33, "min": 5, "max": 8}
+
+    rebuild_rollups(db, [user_id])
+    assert {period: trends(client, headers, period) for period in ("week", "month")} == incremental
+
+    # Rebuilding again replaces the rows instead of adding to them
+    rebuild_rollups(db, [user_id])
+    assert {period: trends(client, headers, period) for period in ("week", "month")} == incremental
@@ -0,0 +1,202 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+from sqlalchemy import select
+from .. import models
+
+
+ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "512"))
+
+ROLLING_WINDOWS = [7, 30]
+TARGETS = ["mood_score", "stress_level"]
+CORRELATION_FEATURES = ["sleep_hours", "screen_time", "physical_activity"]
+
+
+class UserHistory:
+    """A user's tracker entries as column arrays, sorted by date (one entry per day)"""
+
+    def __init__(self, days, columns):
+        # Days since the epoch, int64
+        self.days = days
+        # Column name -> float64 array, NaN where the value is missing
+        self.columns = columns
+
+    def __len__(self):
+        return self.days.size
+
+    @classmethod
+    def from_rows(cls, rows):
+        names = TARGETS + CORRELATION_FEATURES
+        if not rows:
+            return cls(np.empty(0, dtype=np.int64), {name: np.empty(0) for name in names})
+        dates, *values = zip(*rows)
+        days = np.array(dates, dtype="datetime64[D]").astype(np.int64)
+        columns = {name: np.array(column, dtype=np.float64) for name, column in zip(names, values)}
+        return cls(days, columns)
+
+
+class AnalyticsCache:
+    """LRU cache of UserHistory arrays, each valid for one users.data_version
+
+    data_version moves in the transaction of every new entry, so an entry added
+    through any worker retires the cached arrays of every worker.
+    """
+
+    def __init__(self, max_size=ANALYTICS_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, version):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                entry_version, history = entry
+                if entry_version == version:
+                    self._entries.move_to_end(user_id)
+                    self.hits += 1
+                    return history
+                if entry_version < version:
+                    del self._entries[user_id]
+            self.misses += 1
+            return None
+
+    def set(self, user_id, version, history):
+        """Cache history, unless arrays of a newer version were stored meanwhile"""
+        with self._lock:
+            current = self._entries.get(user_id)
+            if current is not None and current[0] > version:
+                return
+            self._entries[user_id] = (version, history)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def evict(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+analytics_cache = AnalyticsCache()
+
+
+async def load_user_history(db, user):
+    """Load (or reuse) the column arrays of a user's tracker entries, user as returned by get_current_user"""
+    history = analytics_cache.get(user.id, user.data_version)
+    if history is not None:
+        return history
+    entry = models.TrackerEntry
+    query = (
+        select(entry.date, *[getattr(entry, name) for name in TARGETS + CORRELATION_FEATURES])
+        .where(entry.user_id == user.id)
+        .order_by(entry.date)
+    )
+    history = UserHistory.from_rows((await db.execute(query)).all())
+    analytics_cache.set(user.id, user.data_version, history)
+    return history
+
+
+def _rolling_means(history, today, days):
+    """Calendar rolling means of TARGETS for each window, over the last `days` days up to today
+
+    Returns an (n_windows, days, n_targets) array, NaN where a window holds no entry.
+    """
+    longest = max(ROLLING_WINDOWS)
+    start = today - days - longest + 2
+    n = today - start + 1
+    values = np.column_stack([history.columns[name] for name in TARGETS]) if len(history) else np.empty((0, len(TARGETS)))
+    offsets = history.days - start
+    keep = (offsets >= 0) & (offsets < n)
+
+    # Dense per-day sums and counts, the unique (user_id, date) index guarantees one entry per day
+    sums = np.zeros((n, len(TARGETS)))
+    counts = np.zeros((n, len(TARGETS)))
+    present = ~np.isnan(values[keep])
+    sums[offsets[keep]] = np.where(present, values[keep], 0)
+    counts[offsets[keep]] = present
+    cum_sums = np.vstack([np.zeros(len(TARGETS)), np.cumsum(sums, axis=0)])
+    cum_counts = np.vstack([np.zeros(len(TARGETS)), np.cumsum(counts, axis=0)])
+
+    end = np.arange(n - days, n) + 1
+    means = []
+    for window in ROLLING_WINDOWS:
+        begin = np.maximum(end - window, 0)
+        window_sums = cum_sums[end] - cum_sums[begin]
+        window_counts = cum_counts[end] - cum_counts[begin]
+        means.append(np.divide(window_sums, window_counts, out=np.full_like(window_sums, np.nan), where=window_counts > 0))
+    return np.stack(means)
+
+
+def _streaks(history, today):
+    """(current, longest) runs of consecutive logged days, the current run may end today or yesterday"""
+    if len(history) == 0:
+        return 0, 0
+    breaks = np.flatnonzero(np.diff(history.days) != 1)
+    run_starts = np.concatenate(([0], breaks + 1))
+    run_ends = np.concatenate((breaks, [len(history) - 1]))
+    lengths = run_ends - run_starts + 1
+    current = int(lengths[-1]) if history.days[-1] >= today - 1 else 0
+    return current, int(lengths.max())
+
+
+def _correlations(history):
+    """Pearson correlation of every CORRELATION_FEATURES column with every TARGETS column"""
+    X = np.column_stack([history.columns[name] for name in CORRELATION_FEATURES]) if len(history) else np.empty((0, len(CORRELATION_FEATURES)))
+    Y = np.column_stack([history.columns[name] for name in TARGETS]) if len(history) else np.empty((0, len(TARGETS)))
+    valid = ~(np.isnan(X).any(axis=1) | np.isnan(Y).any(axis=1))
+    X, Y = X[valid], Y[valid]
+    corr = np.full((len(CORRELATION_FEATURES), len(TARGETS)), np.nan)
+    if X.shape[0] >= 3:
+        Xc = X - X.mean(axis=0)
+        Yc = Y - Y.mean(axis=0)
+        denom = np.sqrt((Xc ** 2).sum(axis=0))[:, None] * np.sqrt((Yc ** 2).sum(axis=0))[None, :]
+        # A constant feature (e.g. always 8h of sleep) has no defined correlation
+        np.divide(Xc.T @ Yc, denom, out=corr, where=denom > 0)
+    return corr, int(X.shape[0])
+
+
+def _value(x, digits=2):
+    return None if np.isnan(x) else round(float(x), digits)
+
+
+def compute_insights(history, today, days=30):
+    """Streaks, rolling means and feature correlations of a UserHistory, as served by /tracker/insights"""
+    today_number = int(np.datetime64(today, "D").astype(np.int64))
+    rolling = _rolling_means(history, today_number, days)
+    current_streak, longest_streak = _streaks(history, today_number)
+    corr, samples = _correlations(history)
+
+    series_days = np.arange(today_number - days + 1, today_number + 1).astype("datetime64[D]").tolist()
+    series = []
+    for i, day in enumerate(series_days):
+        point = {"date": day}
+        for w, window in enumerate(ROLLING_WINDOWS):
+            for t, target in enumerate(TARGETS):
+                point[f"{target}_{window}d"] = _value(rolling[w, i, t])
+        series.append(point)
+
+    return {
+        "entries": len(history),
+        "streak": {
+            "current": current_streak,
+            "longest": longest_streak,
+            "last_entry": history.days[-1].astype("datetime64[D]").tolist() if len(history) else None,
+        },
+        "rolling": {
+            f"{window}d": {target: _value(rolling[w, -1, t]) for t, target in enumerate(TARGETS)}
+            for w, window in enumerate(ROLLING_WINDOWS)
+        },
+        "correlations": {
+            feature: {target: _value(corr[f, t], 3) for t, target in enumerate(TARGETS)}
+            for f, feature in enumerate(CORRELATION_FEATURES)
+        },
+        "correlation_samples": samples,
+        "series": series,
+    }
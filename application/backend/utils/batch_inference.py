@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import os
+from .model_registry import model_registry
+
+
+logger = logging.getLogger(__name__)
+
+PREDICT_MAX_BATCH_SIZE = int(os.getenv("PREDICT_MAX_BATCH_SIZE", "32"))
+PREDICT_MAX_WAIT_MS = float(os.getenv("PREDICT_MAX_WAIT_MS", "5"))
+
+
+class BatchPredictor:
+    """Micro-batch concurrent predict requests into a single model call
+
+    Requests are collected until max_batch_size rows are waiting or max_wait_ms
+    has passed since the first one arrived, then the whole batch is encoded,
+    scaled and predicted as one matrix in a worker thread. A batch is scored by
+    the model version that was live when it started, and by the shadow model
+    too when one is set.
+    """
+
+    def __init__(self, max_batch_size=PREDICT_MAX_BATCH_SIZE, max_wait_ms=PREDICT_MAX_WAIT_MS):
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = None
+        self._task = None
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        # Fail whatever is still waiting instead of leaving the callers hanging
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Batch predictor stopped"))
+        self._queue = None
+
+    async def predict(self, row):
+        """Predict (mood_score, stress_level, model_version) for one row in FEATURES order"""
+        if self._queue is None:
+            # Not started (e.g. scripts and tests), fall back to a direct call
+            bundle = await asyncio.to_thread(model_registry.current)
+            return (*(await asyncio.to_thread(bundle.predict_many, [row]))[0], bundle.version)
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((row, future))
+        return await future
+
+    def qsize(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = asyncio.get_running_loop().time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # Drain anything that is already waiting without extending the window
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            rows = [row for row, _ in batch]
+            bundle = model_registry.current()
+            try:
+                results = await asyncio.to_thread(bundle.predict_many, rows)
+            except asyncio.CancelledError:
+                for _, future in batch:
+                    if not future.done():
+                        future.cancel()
+                raise
+            except Exception as e:
+                if len(batch) == 1:
+                    if not batch[0][1].done():
+                        batch[0][1].set_exception(e)
+                    continue
+                # One bad row must not fail its neighbours, retry them one by one
+                logger.warning("Batch prediction failed, retrying %d rows individually", len(batch))
+                for row, future in batch:
+                    try:
+                        result = (*(await asyncio.to_thread(bundle.predict_many, [row]))[0], bundle.version)
+                    except Exception as row_error:
+                        if not future.done():
+                            future.set_exception(row_error)
+                    else:
+                        if not future.done():
+                            future.set_result(result)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result((*result, bundle.version))
+            if model_registry.shadow is not None:
+                # After the callers are answered, so shadow scoring stays off their latency
+                await asyncio.to_thread(model_registry.compare_shadow, rows, results)
+
+
+batch_predictor = BatchPredictor()
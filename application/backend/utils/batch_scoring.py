@@ -0,0 +1,183 @@
+"""Offline batch scoring of CSV / Parquet files with the trained model
+
+Run from the application directory:
+
+    python -m backend.utils.batch_scoring ../data/mental_wellness_tracker.csv scored.csv --workers 4
+
+The input is read in chunks, each chunk is encoded, scaled and predicted as one
+matrix in a worker process, and the rows are written back in input order and in
+the input format with predicted_mood_score / predicted_stress_level appended.
+Columns may use the training dataset names (Sleep_Hours, ...), the tracker
+names (sleep_hours, ...) or the /tracker/export CSV names.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .encoding import FEATURES, DATASET_COLUMNS
+
+
+SCORING_CHUNK_SIZE = 50000
+
+PREDICTION_COLUMNS = ["predicted_mood_score", "predicted_stress_level"]
+
+# Other accepted spellings of a feature column, on top of the feature name and DATASET_COLUMNS
+COLUMN_ALIASES = {
+    "work_productivity": ["work_productivity_score"],
+}
+
+
+def resolve_columns(columns):
+    """Map every model feature to the input column holding it"""
+    available = set(columns)
+    resolved = {}
+    for feature in FEATURES:
+        candidates = [feature, DATASET_COLUMNS[feature]] + COLUMN_ALIASES.get(feature, [])
+        column = next((name for name in candidates if name in available), None)
+        if column is None:
+            raise ValueError(f"Input has no column for {feature}, expected one of: {', '.join(candidates)}")
+        resolved[feature] = column
+    return resolved
+
+
+def iter_chunks(path, chunk_size):
+    """Yield DataFrames of at most chunk_size rows from a CSV or Parquet file"""
+    if file_format(path) == "parquet":
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+def file_format(path):
+    return "parquet" if path.endswith((".parquet", ".pq")) else "csv"
+
+
+def _model_bundle(version=None):
+    from .model_registry import model_registry
+    return model_registry.bundle(version) if version else model_registry.current()
+
+
+def _init_worker(version=None):
+    # Load the joblib artifacts once per process instead of once per chunk
+    _model_bundle(version)
+
+
+def score_columns(columns, version=None):
+    """Predict (mood_score, stress_level) for a mapping of feature -> column values, returns an (n, 2) array
+
+    version picks a registered model version, by default the live one is used.
+    """
+    bundle = _model_bundle(version)
+    X = bundle.encoder.encode_columns(columns)
+    return np.round(bundle.model.predict(bundle.scaler.transform(X)), 1)
+
+
+class ChunkWriter:
+    """Append scored chunks to a CSV or Parquet output file
+
+    Every Parquet chunk is converted with the schema of the first one. With widen
+    (chunks read from CSV, whose types pandas infers chunk by chunk) that schema
+    stores integer columns as float64 and all-empty columns as strings, so a later
+    chunk with fractions or blanks in the same column still fits.
+    """
+
+    def __init__(self, path, widen=False):
+        self.path = path
+        self.format = file_format(path)
+        self.widen = widen
+        self._schema = None
+        self._parquet = None
+        self._first = True
+
+    def _first_schema(self, table):
+        if not self.widen:
+            return table.schema
+        fields = []
+        for field in table.schema:
+            if pa.types.is_integer(field.type):
+                field = field.with_type(pa.float64())
+            elif pa.types.is_null(field.type):
+                field = field.with_type(pa.large_string())
+            fields.append(field)
+        return pa.schema(fields, metadata=table.schema.metadata)
+
+    def write(self, frame):
+        if self.format == "parquet":
+            if self._schema is None:
+                self._schema = self._first_schema(pa.Table.from_pandas(frame, preserve_index=False))
+                self._parquet = pq.ParquetWriter(self.path, self._schema)
+            self._parquet.write_table(pa.Table.from_pandas(frame, schema=self._schema, preserve_index=False))
+        else:
+            frame.to_csv(self.path, mode="w" if self._first else "a", header=self._first, index=False)
+        self._first = False
+
+    def close(self):
+        if self._parquet is not None:
+            self._parquet.close()
+
+
+def score_file(input_path, output_path, workers=os.cpu_count() or 1, chunk_size=SCORING_CHUNK_SIZE, progress=False, version=None):
+    """Score input_path into output_path, returns (rows, seconds)
+
+    workers=0 scores in this process. Otherwise at most 2 * workers chunks are in
+    flight, so memory stays bounded however large the input is.
+    """
+    start = time.perf_counter()
+    writer = ChunkWriter(output_path, widen=file_format(input_path) == "csv")
+    rows = 0
+    columns = None
+
+    def finish(frame, predictions):
+        nonlocal rows
+        frame[PREDICTION_COLUMNS[0]] = predictions[:, 0]
+        frame[PREDICTION_COLUMNS[1]] = predictions[:, 1]
+        writer.write(frame)
+        rows += len(frame)
+        if progress:
+            elapsed = time.perf_counter() - start
+            print(f"{rows} rows, {rows / elapsed:,.0f} rows/s", file=sys.stderr)
+
+    def feature_columns(frame):
+        return {feature: frame[column].to_numpy() for feature, column in columns.items()}
+
+    try:
+        if workers == 0:
+            _init_worker(version)
+            for frame in iter_chunks(input_path, chunk_size):
+                columns = columns or resolve_columns(frame.columns)
+                finish(frame, score_columns(feature_columns(frame), version))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(version,)) as pool:
+                pending = deque()
+                for frame in iter_chunks(input_path, chunk_size):
+                    columns = columns or resolve_columns(frame.columns)
+                    pending.append((frame, pool.submit(score_columns, feature_columns(frame), version)))
+                    if len(pending) >= 2 * workers:
+                        frame, future = pending.popleft()
+                        finish(frame, future.result())
+                while pending:
+                    frame, future = pending.popleft()
+                    finish(frame, future.result())
+    finally:
+        writer.close()
+    return rows, time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a CSV or Parquet file with the trained mood/stress model")
+    parser.add_argument("input", help="CSV or Parquet file to score")
+    parser.add_argument("output", help="Output path, .parquet/.pq writes Parquet, anything else CSV")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes, 0 scores in-process")
+    parser.add_argument("--chunk-size", type=int, default=SCORING_CHUNK_SIZE)
+    parser.add_argument("--progress", action="store_true", help="Report throughput after every chunk")
+    parser.add_argument("--model-version", help="Registered model version to score with, default: the live one")
+    args = parser.parse_args()
+    rows, seconds = score_file(args.input, args.output, args.workers, args.chunk_size, args.progress, args.model_version)
+    print(f"Scored {rows} rows in {seconds:.2f}s ({rows / seconds:,.0f} rows/s) with {args.workers} workers")
@@ -0,0 +1,190 @@
+import json
+import numpy as np
+import os
+import sys
+
+
+PARITY_DATA_PATH = os.path.join(os.path.dirname(__file__), '../../../data/mental_wellness_test.csv')
+
+# Rows evaluated per step, keeps the (rows x trees) node matrix small
+EVAL_CHUNK_SIZE = 4096
+
+# Node arrays of the on-disk format, one uncompressed .npy file each so they can be memory-mapped
+ARRAY_FIELDS = ["feature", "threshold", "left", "right", "value", "roots"]
+FOREST_META_FILE = "forest.json"
+
+
+class CompiledForest:
+    """Flat array representation of the MultiOutputRegressor gradient-boosting ensembles
+
+    Every tree of every output head is stored in the same contiguous node arrays.
+    Leaves point back to themselves, so all trees can be walked in lockstep for a
+    fixed number of steps (the maximum tree depth) with plain NumPy indexing.
+    Leaf values are pre-multiplied by the learning rate. When compiled with a
+    scaler, predict standardises raw rows exactly like StandardScaler.transform
+    first: folding the scaler into the thresholds cannot reproduce sklearn's
+    float32 rounding for values right at a split.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, base, depth, mean=None, scale=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.base = base
+        self.depth = depth
+        self.mean = mean
+        self.scale = scale
+
+    @property
+    def n_outputs(self):
+        return self.roots.shape[0]
+
+    def predict(self, X):
+        """Predict all outputs for raw feature rows, returns an (n_rows, n_outputs) array"""
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if self.mean is not None:
+            # The same two operations as StandardScaler.transform, so the result is bit for bit identical
+            X = X - self.mean
+            X /= self.scale
+        out = np.empty((X.shape[0], self.n_outputs))
+        for start in range(0, X.shape[0], EVAL_CHUNK_SIZE):
+            out[start:start + EVAL_CHUNK_SIZE] = self._predict_chunk(X[start:start + EVAL_CHUNK_SIZE])
+        return out
+
+    def _predict_chunk(self, X):
+        n_rows, n_features = X.shape
+        flat_X = X.ravel()
+        row_offsets = (np.arange(n_rows) * n_features)[:, None]
+        node = np.broadcast_to(self.roots.ravel(), (n_rows, self.roots.size))
+        for _ in range(self.depth):
+            go_left = flat_X[row_offsets + self.feature[node]] <= self.threshold[node]
+            node = np.where(go_left, self.left[node], self.right[node])
+        leaf_values = self.value[node].reshape(n_rows, *self.roots.shape)
+        return leaf_values.sum(axis=2) + self.base
+
+
+def _float32_split_boundary(threshold):
+    """Translate sklearn split thresholds into float64 boundaries with the same outcome
+
+    sklearn casts the input to float32 before comparing it with the threshold, and
+    thresholds often sit exactly on a float32 training value. The split goes left
+    iff the float32-rounded value is <= threshold, i.e. iff the float64 value is
+    below the midpoint between the largest float32 <= threshold and its successor.
+    The midpoint itself rounds half to even, so it only goes left when that float32
+    has an even mantissa.
+    """
+    lower = threshold.astype(np.float32)
+    lower = np.where(lower.astype(np.float64) > threshold, np.nextafter(lower, np.float32(-np.inf)), lower)
+    upper = np.nextafter(lower, np.float32(np.inf))
+    midpoint = (lower.astype(np.float64) + upper.astype(np.float64)) / 2
+    odd = (lower.view(np.uint32) & 1).astype(bool)
+    return np.where(odd, np.nextafter(midpoint, -np.inf), midpoint)
+
+
+def compile_model(model, scaler=None):
+    """Flatten a fitted MultiOutputRegressor of GradientBoostingRegressors into a CompiledForest
+
+    If a fitted StandardScaler is given the compiled model applies it, so it takes
+    the unscaled feature matrix directly.
+    """
+    features, thresholds, lefts, rights, values, roots, base = [], [], [], [], [], [], []
+    depth = 0
+    offset = 0
+    for estimator in model.estimators_:
+        head_roots = []
+        for tree in estimator.estimators_[:, 0]:
+            tree = tree.tree_
+            node_ids = np.arange(tree.node_count)
+            is_leaf = tree.children_left == -1
+
+            feature = np.where(is_leaf, 0, tree.feature)
+            threshold = _float32_split_boundary(tree.threshold)
+            # Leaves loop onto themselves: inf keeps them on the left branch
+            threshold = np.where(is_leaf, np.inf, threshold)
+
+            features.append(feature.astype(np.intp))
+            thresholds.append(threshold)
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+            values.append(tree.value[:, 0, 0] * estimator.learning_rate)
+            head_roots.append(offset)
+            depth = max(depth, tree.max_depth)
+            offset += tree.node_count
+        roots.append(head_roots)
+        if estimator.init_ == 'zero':
+            base.append(0.0)
+        else:
+            base.append(float(np.ravel(estimator.init_.predict(np.zeros((1, estimator.n_features_in_))))[0]))
+
+    return CompiledForest(
+        feature=np.concatenate(features),
+        threshold=np.concatenate(thresholds),
+        left=np.concatenate(lefts).astype(np.intp),
+        right=np.concatenate(rights).astype(np.intp),
+        value=np.concatenate(values),
+        roots=np.asarray(roots, dtype=np.intp),
+        base=np.asarray(base),
+        depth=depth,
+        mean=None if scaler is None else np.asarray(scaler.mean_, dtype=np.float64),
+        scale=None if scaler is None else np.asarray(scaler.scale_, dtype=np.float64),
+    )
+
+
+def save_compiled(forest, path):
+    """Write a CompiledForest as .npy node arrays plus forest.json, returns the written file names"""
+    os.makedirs(path, exist_ok=True)
+    files = []
+    for name in ARRAY_FIELDS:
+        np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(getattr(forest, name)))
+        files.append(f"{name}.npy")
+    with open(os.path.join(path, FOREST_META_FILE), "w") as f:
+        meta = {"base": forest.base.tolist(), "depth": forest.depth}
+        if forest.mean is not None:
+            # repr round-trips float64 exactly through JSON
+            meta.update(mean=forest.mean.tolist(), scale=forest.scale.tolist())
+        json.dump(meta, f)
+    files.append(FOREST_META_FILE)
+    return files
+
+
+def load_compiled(path, mmap=True):
+    """Load a CompiledForest written by save_compiled
+
+    With mmap the node arrays are read-only views of the files, so every process
+    serving the same model shares one page-cache copy and nothing is unpickled.
+    """
+    arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None) for name in ARRAY_FIELDS}
+    with open(os.path.join(path, FOREST_META_FILE)) as f:
+        meta = json.load(f)
+    # Forests compiled before the scaler was stored have it folded into their thresholds
+    scaler = {name: np.asarray(meta[name]) for name in ("mean", "scale") if name in meta}
+    return CompiledForest(base=np.asarray(meta["base"]), depth=meta["depth"], **scaler, **arrays)
+
+
+def verify_parity(csv_path=PARITY_DATA_PATH, atol=1e-6):
+    """Compare the compiled evaluator with model.predict on a labelled CSV, returns the max abs difference"""
+    import pandas as pd
+    from .encoding import DATASET_COLUMNS
+    from .prediction import load_models, load_compiled_model, load_feature_encoder
+
+    model, _, _, _, scaler = load_models()
+    compiled = load_compiled_model()
+    data = pd.read_csv(csv_path)
+    X = load_feature_encoder().encode_columns({feature: data[column] for feature, column in DATASET_COLUMNS.items()})
+
+    expected = model.predict(scaler.transform(X))
+    actual = compiled.predict(X)
+    max_diff = float(np.max(np.abs(expected - actual)))
+    if max_diff > atol:
+        raise AssertionError(f"Compiled model differs from model.predict by {max_diff} (atol={atol})")
+    return max_diff
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else PARITY_DATA_PATH
+    print(f"Parity OK, max abs difference: {verify_parity(path)}")
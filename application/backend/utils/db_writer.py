@@ -0,0 +1,72 @@
+import asyncio
+from ..database import SQLITE_WRITE_QUEUE
+
+
+class DatabaseWriter:
+    """Run database writes one at a time on a dedicated task
+
+    SQLite has a single writer lock, so concurrent commits just queue up on the
+    file lock (or fail with "database is locked" once busy_timeout runs out).
+    Sending every write unit through one task applies them back to back while
+    reads keep running concurrently against the WAL.
+    """
+
+    def __init__(self, enabled=SQLITE_WRITE_QUEUE):
+        self.enabled = enabled
+        self._queue = None
+        self._task = None
+
+    async def start(self):
+        if not self.enabled or self._task is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        while not self._queue.empty():
+            _, _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Database writer stopped"))
+        self._queue = None
+
+    async def run(self, write, *args):
+        """Await write(*args) on the writer task, e.g. run(db.commit), and return its result
+
+        write must not call run itself, the nested call would wait on its own queue.
+        """
+        if self._queue is None:
+            # Disabled (not SQLite) or not started (scripts and tests), write directly
+            return await write(*args)
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((write, args, future))
+        return await future
+
+    def qsize(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _run(self):
+        while True:
+            write, args, future = await self._queue.get()
+            if future.done():
+                # The caller went away while the write was queued
+                continue
+            try:
+                result = await write(*args)
+            except asyncio.CancelledError:
+                if not future.done():
+                    future.cancel()
+                raise
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+
+
+db_writer = DatabaseWriter()
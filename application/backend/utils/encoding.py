@@ -0,0 +1,165 @@
+import numpy as np
+
+
+# Model input order, categorical columns are replaced by their label codes
+FEATURES = [
+    'sleep_hours',
+    'sleep_quality',
+    'screen_time',
+    'physical_activity',
+    'social_interaction',
+    'work_productivity',
+    'weather',
+    'diet_quality'
+]
+
+CATEGORICAL_FEATURES = ['sleep_quality', 'weather', 'diet_quality']
+
+# Column names of the training dataset (data/mental_wellness_*.csv)
+DATASET_COLUMNS = {
+    'sleep_hours': 'Sleep_Hours',
+    'sleep_quality': 'Sleep_Quality',
+    'screen_time': 'Screen_Time_Hours',
+    'physical_activity': 'Physical_Activity_Min',
+    'social_interaction': 'Social_Interaction_Hours',
+    'work_productivity': 'Work_Productivity_Score',
+    'weather': 'Weather',
+    'diet_quality': 'Diet_Quality'
+}
+
+
+class UnknownCategoryError(ValueError):
+    def __init__(self, feature, value, categories):
+        self.feature = feature
+        self.value = value
+        self.categories = categories
+        super().__init__(f"Unknown {feature} '{value}', expected one of: {', '.join(categories)}")
+
+
+class CategoryEncoder:
+    """Dictionary-backed replacement for a fitted LabelEncoder"""
+
+    def __init__(self, feature, categories):
+        self.feature = feature
+        self.categories = [str(category) for category in categories]
+        self.codes = {category: code for code, category in enumerate(self.categories)}
+
+    @classmethod
+    def from_label_encoder(cls, feature, label_encoder):
+        return cls(feature, label_encoder.classes_)
+
+    def encode(self, value):
+        try:
+            return self.codes[value]
+        except (KeyError, TypeError):
+            raise UnknownCategoryError(self.feature, value, self.categories) from None
+
+    def encode_column(self, values):
+        """Encode a whole column at once, returns an int array"""
+        codes = self.codes
+        encoded = np.fromiter((codes.get(value, -1) for value in values), dtype=np.int64)
+        if encoded.size and encoded.min() < 0:
+            bad = next(value for value, code in zip(values, encoded) if code < 0)
+            raise UnknownCategoryError(self.feature, bad, self.categories)
+        return encoded
+
+
+class FeatureEncoder:
+    """Turn raw tracker inputs into the numeric feature matrix the model expects
+
+    Built once from the joblib label encoders, then every lookup is a dict access
+    instead of LabelEncoder.transform's validation and sorted-array search.
+    """
+
+    def __init__(self, sleep_quality, weather, diet_quality):
+        self.encoders = {
+            'sleep_quality': sleep_quality,
+            'weather': weather,
+            'diet_quality': diet_quality,
+        }
+
+    @classmethod
+    def from_label_encoders(cls, le_diet, le_sleep, le_weather):
+        return cls(
+            sleep_quality=CategoryEncoder.from_label_encoder('sleep_quality', le_sleep),
+            weather=CategoryEncoder.from_label_encoder('weather', le_weather),
+            diet_quality=CategoryEncoder.from_label_encoder('diet_quality', le_diet),
+        )
+
+    @classmethod
+    def from_categories(cls, categories):
+        """Build from a mapping of feature -> category list, as stored in a model manifest"""
+        return cls(**{feature: CategoryEncoder(feature, categories[feature]) for feature in ('sleep_quality', 'weather', 'diet_quality')})
+
+    def categories(self, feature):
+        return self.encoders[feature].categories
+
+    def validate(self, feature, value):
+        """Raise UnknownCategoryError if value is not a known category of feature"""
+        self.encoders[feature].encode(value)
+        return value
+
+    def encode_row(
+        self,
+        sleep_hours,
+        sleep_quality,
+        screen_time,
+        physical_activity,
+        social_interaction,
+        work_productivity,
+        weather,
+        diet_quality
+    ):
+        """Encode a single input, returns a (1, 8) float array"""
+        return np.array([[
+            sleep_hours,
+            self.encoders['sleep_quality'].encode(sleep_quality),
+            screen_time,
+            physical_activity,
+            social_interaction,
+            work_productivity,
+            self.encoders['weather'].encode(weather),
+            self.encoders['diet_quality'].encode(diet_quality)
+        ]], dtype=np.float64)
+
+    def encode_columns(self, columns):
+        """Encode a mapping of feature name -> column values, returns an (n, 8) float array"""
+        matrix = np.empty((len(columns[FEATURES[0]]), len(FEATURES)), dtype=np.float64)
+        for i, feature in enumerate(FEATURES):
+            if feature in self.encoders:
+                matrix[:, i] = self.encoders[feature].encode_column(columns[feature])
+            else:
+                matrix[:, i] = np.asarray(columns[feature], dtype=np.float64)
+        return matrix
+
+    def encode_rows(self, rows):
+        """Encode a sequence of rows in FEATURES order, returns an (n, 8) float array"""
+        if len(rows) == 0:
+            return np.empty((0, len(FEATURES)), dtype=np.float64)
+        return self.encode_columns(dict(zip(FEATURES, zip(*rows))))
+
+
+def prepare_input_data(
+    sleep_hours,
+    sleep_quality,
+    screen_time,
+    physical_activity,
+    social_interaction,
+    work_productivity,
+    weather,
+    diet_quality,
+    encoder,
+    scaler
+):
+    """Prepare input data for prediction"""
+    input_data = encoder.encode_row(
+        sleep_hours,
+        sleep_quality,
+        screen_time,
+        physical_activity,
+        social_interaction,
+        work_productivity,
+        weather,
+        diet_quality
+    )
+    return scaler.transform(input_data)
@@ -0,0 +1,208 @@
+import csv
+import json
+import os
+import zlib
+from io import StringIO
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import select, Integer, Float, String, Date, DateTime
+from ..database import SessionLocal
+from .. import models
+
+
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "500"))
+# Columnar formats write one row group / record batch per chunk, so they use bigger chunks
+COLUMNAR_EXPORT_CHUNK_SIZE = int(os.getenv("COLUMNAR_EXPORT_CHUNK_SIZE", "10000"))
+
+# Legacy CSV layout of /tracker/export
+CSV_COLUMNS = [
+    models.TrackerEntry.date,
+    models.TrackerEntry.sleep_hours,
+    models.TrackerEntry.sleep_quality,
+    models.TrackerEntry.screen_time,
+    models.TrackerEntry.physical_activity,
+    models.TrackerEntry.social_interaction,
+    models.TrackerEntry.work_productivity,
+    models.TrackerEntry.weather,
+    models.TrackerEntry.diet_quality,
+    models.TrackerEntry.mood_score,
+    models.TrackerEntry.stress_level,
+    models.TrackerEntry.ai_recommendation
+]
+
+CSV_HEADER = [
+    "created_at", "sleep_hours", "sleep_quality", "screen_time",
+    "physical_activity", "social_interaction", "work_productivity_score",
+    "weather", "diet_quality", "mood_score", "stress_level", "ai_recommendation"
+]
+
+# Bookkeeping of /tracker/predict and the recommendation workers, not tracker data
+INTERNAL_COLUMNS = {"idempotency_key", "claimed_at"}
+
+# Columnar formats export every other tracker_entries column under its own name
+TABLE_COLUMNS = [column for column in models.TrackerEntry.__table__.columns if column.name not in INTERNAL_COLUMNS]
+
+ARROW_TYPES = {
+    Integer: pa.int64(),
+    Float: pa.float64(),
+    String: pa.string(),
+    Date: pa.date32(),
+    DateTime: pa.timestamp("us"),
+}
+
+
+def arrow_schema(columns):
+    """Arrow schema mirroring the SQLAlchemy column types"""
+    return pa.schema([
+        pa.field(column.name, ARROW_TYPES[type(column.type)], nullable=column.nullable)
+        for column in columns
+    ])
+
+
+TRACKER_ENTRY_SCHEMA = arrow_schema(TABLE_COLUMNS)
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+FILE_EXTENSIONS = {
+    "csv": "csv",
+    "ndjson": "ndjson",
+    "parquet": "parquet",
+    "arrow": "arrows",
+}
+
+
+def iter_entry_rows(columns, user_ids=None, start_date=None, end_date=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield lists of tracker rows in chunks straight from the database cursor
+
+    user_ids limits the export to those users, None exports every user.
+    """
+    # Request-scoped sessions are closed before a response body is streamed, so use our own
+    db = SessionLocal()
+    try:
+        query = select(*columns)
+        if user_ids is not None:
+            query = query.where(models.TrackerEntry.user_id.in_(user_ids))
+        if start_date is not None:
+            query = query.where(models.TrackerEntry.date >= start_date)
+        if end_date is not None:
+            query = query.where(models.TrackerEntry.date <= end_date)
+        query = query.order_by(
+            models.TrackerEntry.user_id.asc(),
+            models.TrackerEntry.date.asc(),
+            models.TrackerEntry.id.asc()
+        )
+        result = db.execute(query.execution_options(yield_per=chunk_size))
+        for rows in result.partitions():
+            yield rows
+    finally:
+        db.close()
+
+
+def iter_csv(row_chunks, header=CSV_HEADER):
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for rows in row_chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_ndjson(row_chunks, names):
+    for rows in row_chunks:
+        yield "".join(json.dumps(dict(zip(names, row)), default=str) + "\n" for row in rows)
+
+
+class _ChunkSink:
+    """Write-only file object that hands whatever the Arrow writers produced back to a generator"""
+
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _record_batch(rows, schema):
+    columns = list(zip(*rows))
+    return pa.RecordBatch.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+        schema=schema
+    )
+
+
+def iter_parquet(row_chunks, schema=TRACKER_ENTRY_SCHEMA):
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for rows in row_chunks:
+            writer.write_batch(_record_batch(rows, schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def iter_arrow_ipc(row_chunks, schema=TRACKER_ENTRY_SCHEMA):
+    sink = _ChunkSink()
+    writer = pa.ipc.new_stream(sink, schema)
+    try:
+        for rows in row_chunks:
+            writer.write_batch(_record_batch(rows, schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def iter_gzip(chunks):
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(export_format, user_ids=None, start_date=None, end_date=None, legacy_csv=False):
+    """Build the streamed body of a tracker export in the given format
+
+    legacy_csv keeps the original /tracker/export CSV columns, otherwise CSV has every exported table column.
+    """
+    names = [column.name for column in TABLE_COLUMNS]
+    if export_format == "csv" and legacy_csv:
+        return iter_csv(iter_entry_rows(CSV_COLUMNS, user_ids, start_date, end_date))
+    if export_format == "csv":
+        return iter_csv(iter_entry_rows(TABLE_COLUMNS, user_ids, start_date, end_date), names)
+    if export_format == "ndjson":
+        return iter_ndjson(iter_entry_rows(TABLE_COLUMNS, user_ids, start_date, end_date), names)
+    row_chunks = iter_entry_rows(TABLE_COLUMNS, user_ids, start_date, end_date, COLUMNAR_EXPORT_CHUNK_SIZE)
+    if export_format == "parquet":
+        return iter_parquet(row_chunks)
+    if export_format == "arrow":
+        return iter_arrow_ipc(row_chunks)
+    raise ValueError(f"Unsupported export format: {export_format}")
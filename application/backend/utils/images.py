@@ -0,0 +1,297 @@
+"""Profile image pipeline: decode and resize uploads into fixed WebP thumbnails off the event loop
+
+Decoding and resampling are CPU bound and hold the GIL, so they run in a process
+pool. Thumbnails are stored content-addressed under MEDIA_DIR/avatars as
+<key>_<size>.webp, where the key is a hash of the uploaded bytes: the same upload
+is decoded once and every user who sends it shares the files. A file's name fully
+determines its content, so /media serves them with a strong ETag and an immutable
+Cache-Control. Only the key is stored on the user, URLs are built from it without
+touching the filesystem.
+
+Files are never deleted on upload or account deletion since other users may share
+them, remove the unreferenced ones with:
+
+    python -m backend.utils.images gc
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+
+MEDIA_DIR = os.getenv("MEDIA_DIR") or os.path.join(os.path.dirname(__file__), "../routers/media")
+# Decoding runs in separate processes, one per core by default
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS") or os.cpu_count() or 1)
+# Uploads allowed to wait for a worker before new ones are rejected
+IMAGE_MAX_QUEUE = int(os.getenv("IMAGE_MAX_QUEUE", "64"))
+IMAGE_MAX_UPLOAD_BYTES = int(os.getenv("IMAGE_MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+# Larger images are refused before decoding, a small compressed file can expand to gigabytes
+IMAGE_MAX_PIXELS = int(os.getenv("IMAGE_MAX_PIXELS", str(40_000_000)))
+
+AVATAR_DIR = "avatars"
+# Stored keys are "avatars/<key>", older rows hold the path of the uploaded file itself
+AVATAR_PREFIX = f"{AVATAR_DIR}/"
+THUMBNAIL_SIZES = {"small": 64, "medium": 256, "large": 512}
+DEFAULT_THUMBNAIL = "medium"
+WEBP_QUALITY = 80
+ALLOWED_FORMATS = {"JPEG", "PNG", "WEBP", "GIF", "BMP"}
+# Part of every key, bump it when the sizes or the encoding change so no stale file is reused
+PIPELINE_VERSION = "1"
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+AVATAR_FILE = re.compile(r"^([0-9a-f]{32})_(\d+)\.webp$")
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+class ImagePipelineBusy(RuntimeError):
+    pass
+
+
+def avatar_key(data):
+    return hashlib.sha256(PIPELINE_VERSION.encode() + b"\0" + data).hexdigest()[:32]
+
+
+def avatar_filename(key, size):
+    return f"{key}_{size}.webp"
+
+
+def avatar_urls(base_url, profile_image):
+    """Thumbnail URLs (size name -> URL) of a stored profile_image, without any filesystem access"""
+    if not profile_image:
+        return {}
+    if profile_image.startswith(AVATAR_PREFIX):
+        key = profile_image[len(AVATAR_PREFIX):]
+        return {name: f"{base_url}media/{AVATAR_DIR}/{avatar_filename(key, size)}" for name, size in THUMBNAIL_SIZES.items()}
+    # Uploaded before the pipeline: the original file, at every size
+    url = f"{base_url}media/{os.path.basename(profile_image)}"
+    return {name: url for name in THUMBNAIL_SIZES}
+
+
+def remove_legacy_image(profile_image, media_dir=MEDIA_DIR):
+    """Delete a pre-pipeline upload, those belong to a single user. Content-addressed files are left to gc"""
+    if not profile_image or profile_image.startswith(AVATAR_PREFIX):
+        return
+    try:
+        os.remove(os.path.join(media_dir, os.path.basename(profile_image)))
+    except FileNotFoundError:
+        pass
+
+
+def _write_atomic(path, data):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def store_avatar(data, media_dir=MEDIA_DIR):
+    """Decode an upload and write its square WebP thumbnails, returns (key, created)
+
+    Runs in a worker process. When every thumbnail of the key already exists the
+    image is not decoded at all, the files are touched instead: collect_garbage
+    spares recently modified files, and the profile pointing at them may not be
+    committed yet.
+    """
+    from PIL import Image, ImageOps
+
+    key = avatar_key(data)
+    directory = os.path.join(media_dir, AVATAR_DIR)
+    paths = {size: os.path.join(directory, avatar_filename(key, size)) for size in THUMBNAIL_SIZES.values()}
+    try:
+        for path in paths.values():
+            os.utime(path)
+        return key, False
+    except FileNotFoundError:
+        # Never stored, or collected meanwhile: write every size (again)
+        pass
+
+    try:
+        image = Image.open(io.BytesIO(data))
+        if image.format not in ALLOWED_FORMATS:
+            raise InvalidImage(f"Unsupported image format {image.format}")
+        # Only the header has been read so far
+        if image.width * image.height > IMAGE_MAX_PIXELS:
+            raise InvalidImage("Image dimensions are too large")
+        largest = max(paths)
+        # JPEG can decode straight at 1/2, 1/4 or 1/8 scale, far cheaper than a full decode
+        image.draft("RGB", (largest, largest))
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+        image = image.convert("RGBA" if has_alpha else "RGB")
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        # OSError covers unidentified and truncated images
+        raise InvalidImage("Invalid image file") from e
+
+    os.makedirs(directory, exist_ok=True)
+    # Largest first, each smaller size is resampled from the previous one
+    for size in sorted(paths, reverse=True):
+        image = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, "WEBP", quality=WEBP_QUALITY, method=4)
+        _write_atomic(paths[size], output.getvalue())
+    return key, True
+
+
+class ImagePipeline:
+    """Run store_avatar on a size-limited process pool
+
+    At most max_queue uploads may wait for a worker, later ones fail fast with
+    ImagePipelineBusy. Workers are spawned rather than forked, the app process
+    runs threads that a fork would copy mid-flight.
+    """
+
+    def __init__(self, workers=IMAGE_WORKERS, max_queue=IMAGE_MAX_QUEUE, media_dir=MEDIA_DIR):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.media_dir = media_dir
+        self.pending = 0
+        self.processed = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self.failed = 0
+        self.run_seconds = 0.0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    async def store(self, data):
+        """Store an upload's thumbnails, returns the profile_image value pointing at them"""
+        with self._lock:
+            if self.pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise ImagePipelineBusy("Too many image uploads in progress")
+            self.pending += 1
+        start = time.perf_counter()
+        executor = self._pool()
+        try:
+            key, created = await asyncio.get_running_loop().run_in_executor(executor, store_avatar, data, self.media_dir)
+        except InvalidImage:
+            with self._lock:
+                self.failed += 1
+            raise
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory), start a fresh pool for the next upload
+            with self._lock:
+                if self._executor is executor:
+                    self._executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.run_seconds += time.perf_counter() - start
+        with self._lock:
+            if created:
+                self.processed += 1
+            else:
+                self.deduplicated += 1
+        return AVATAR_PREFIX + key
+
+    def stats(self):
+        with self._lock:
+            done = self.processed + self.deduplicated
+            return {
+                "workers": self.workers,
+                "pending": self.pending,
+                "processed": self.processed,
+                "deduplicated": self.deduplicated,
+                "rejected": self.rejected,
+                "failed": self.failed,
+                "avg_ms": self.run_seconds / done * 1000 if done else 0.0,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+image_pipeline = ImagePipeline()
+
+
+class MediaFiles(StaticFiles):
+    """StaticFiles serving content-addressed thumbnails with a strong ETag and a year-long immutable cache
+
+    The ETag comes from the file name, not from the mtime and size, so it is the
+    same on every worker and survives copying the media directory.
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        name = os.path.basename(full_path)
+        if AVATAR_FILE.match(name) is None or os.path.basename(os.path.dirname(full_path)) != AVATAR_DIR:
+            return super().file_response(full_path, stat_result, scope, status_code)
+        headers = {"etag": f'"{name[:-len(".webp")]}"', "cache-control": CACHE_CONTROL}
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, headers=headers)
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+def collect_garbage(db, media_dir=MEDIA_DIR, min_age=3600, dry_run=False):
+    """Delete thumbnails no user points at, returns the removed file names
+
+    Files younger than min_age seconds are kept, their upload may not be committed yet.
+    """
+    from sqlalchemy import select
+    from .. import models
+
+    directory = os.path.join(media_dir, AVATAR_DIR)
+    if not os.path.isdir(directory):
+        return []
+    referenced = {
+        image[len(AVATAR_PREFIX):]
+        for image in db.scalars(select(models.User.profile_image).where(models.User.profile_image.like(f"{AVATAR_PREFIX}%")))
+    }
+    cutoff = time.time() - min_age
+    removed = []
+    for entry in os.scandir(directory):
+        match = AVATAR_FILE.match(entry.name)
+        if match is None or match.group(1) in referenced or entry.stat().st_mtime > cutoff:
+            continue
+        if not dry_run:
+            os.remove(entry.path)
+        removed.append(entry.name)
+    return removed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage stored profile images")
+    commands = parser.add_subparsers(dest="command", required=True)
+    gc = commands.add_parser("gc", help="Delete thumbnails no longer referenced by any user")
+    gc.add_argument("--min-age", type=int, default=3600, help="Keep files modified in the last N seconds")
+    gc.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    from ..database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        removed = collect_garbage(session, min_age=args.min_age, dry_run=args.dry_run)
+    finally:
+        session.close()
+    print(f"{'Would remove' if args.dry_run else 'Removed'} {len(removed)} file(s)")
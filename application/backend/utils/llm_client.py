@@ -0,0 +1,281 @@
+import argparse
+import asyncio
+import logging
+import os
+import random
+import time
+from .metrics import span
+from .prediction import build_recommendation_prompt
+from .recommendation_cache import recommendation_cache, quantize_features, cache_key
+
+
+logger = logging.getLogger(__name__)
+
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+LLM_BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+LLM_BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0.5"))
+FAKE_LLM_FAILURE_RATE = float(os.getenv("FAKE_LLM_FAILURE_RATE", "0"))
+
+
+class GeminiProvider:
+    """Calls the Dr. MindCare agno agent, each in-flight call checks out its own agent from a pool"""
+
+    def __init__(self, pool_size=LLM_MAX_CONCURRENCY):
+        self.pool_size = pool_size
+        self._agents = None
+
+    async def generate(self, prompt):
+        from .ai_agent import create_mental_health_agent
+
+        if self._agents is None:
+            self._agents = asyncio.Queue()
+            for _ in range(self.pool_size):
+                self._agents.put_nowait(create_mental_health_agent())
+        agent = await self._agents.get()
+        try:
+            response = await agent.arun(prompt)
+        except BaseException:
+            # A failed or cancelled run can leave the agent mid-run, replace it
+            agent = create_mental_health_agent()
+            raise
+        finally:
+            self._agents.put_nowait(agent)
+        return response.content
+
+
+class FakeProvider:
+    """Offline stand-in for load testing: fixed latency with jitter and an optional failure rate"""
+
+    def __init__(self, latency=FAKE_LLM_LATENCY, failure_rate=FAKE_LLM_FAILURE_RATE, seed=None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+
+    async def generate(self, prompt):
+        await asyncio.sleep(self.latency * self._random.uniform(0.5, 1.5))
+        if self._random.random() < self.failure_rate:
+            raise RuntimeError("Fake LLM provider failure")
+        return f"Fake recommendation for:\n{prompt.strip()}"
+
+
+PROVIDERS = {
+    "gemini": GeminiProvider,
+    "fake": FakeProvider,
+}
+
+
+class CircuitOpenError(RuntimeError):
+    pass
+
+
+class CircuitBreaker:
+    """Stop calling a failing provider for reset_timeout seconds after failure_threshold consecutive failures"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold=LLM_BREAKER_FAILURES, reset_timeout=LLM_BREAKER_RESET):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return self.CLOSED
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        state = self.state
+        if state == self.CLOSED:
+            return True
+        if state == self.HALF_OPEN and not self._probing:
+            # Let a single probe call through to test whether the provider recovered
+            self._probing = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._probing or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def record_abandoned(self):
+        """A call ended without an outcome (cancelled), the next caller may probe instead"""
+        self._probing = False
+
+
+def rule_based_recommendation(features):
+    """Deterministic recommendation used when the LLM provider is slow or unavailable"""
+    tips = []
+    if features["sleep_hours"] < 7:
+        tips.append("**Sleep:** aim for 7-9 hours. Keep a regular bedtime and avoid screens for the hour before sleep.")
+    if features["screen_time"] > 6:
+        tips.append("**Screen time:** take a 5-minute break every hour and set app limits for leisure screen use.")
+    if features["physical_activity"] < 30:
+        tips.append("**Activity:** try to move for at least 30 minutes a day, even a brisk walk counts.")
+    if features["social_interaction"] < 2:
+        tips.append("**Connection:** reach out to a friend or family member today, a short call helps.")
+    if features["diet_quality"] == "Poor":
+        tips.append("**Diet:** add one portion of fruit or vegetables to each meal and stay hydrated.")
+    if features["weather"] in ("Cloudy", "Rainy"):
+        tips.append("**Light:** on grey days, spend some time near a window or outdoors during daylight.")
+    if features["stress_level"] >= 6:
+        tips.append("**Stress:** try 5 minutes of slow breathing (inhale 4s, exhale 6s) and break big tasks into small steps.")
+    if features["mood_score"] < 5:
+        tips.append("**Mood:** plan one small activity you enjoy today and note one thing that went well.")
+    if not tips:
+        tips.append("**Keep it up:** your habits look balanced, keep your current sleep, activity and social routine.")
+
+    lines = ["### Recommendations", ""]
+    lines += [f"- {tip}" for tip in tips]
+    lines += [
+        "",
+        "_These are general wellness tips. If you feel persistently low or overwhelmed, "
+        "please talk to a mental health professional._",
+    ]
+    return "\n".join(lines)
+
+
+class RecommendationClient:
+    """Async recommendation client with bounded concurrency, timeouts, retries and a circuit breaker
+
+    Every call resolves to a recommendation: when the provider times out, keeps
+    failing or the circuit is open, the rule-based fallback is returned instead.
+    """
+
+    def __init__(
+        self,
+        provider=None,
+        max_concurrency=LLM_MAX_CONCURRENCY,
+        timeout=LLM_TIMEOUT,
+        max_retries=LLM_MAX_RETRIES,
+        backoff_base=LLM_BACKOFF_BASE,
+        backoff_max=LLM_BACKOFF_MAX,
+        breaker=None,
+        cache=recommendation_cache
+    ):
+        self.provider = provider if provider is not None else PROVIDERS[LLM_PROVIDER]()
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self.cache = cache
+        self.fallbacks = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def recommend(
+        self,
+        mood_score,
+        stress_level,
+        sleep_hours,
+        screen_time,
+        physical_activity,
+        social_interaction,
+        work_productivity,
+        weather,
+        diet_quality
+    ):
+        features = quantize_features(
+            mood_score,
+            stress_level,
+            sleep_hours,
+            screen_time,
+            physical_activity,
+            social_interaction,
+            work_productivity,
+            weather,
+            diet_quality
+        )
+        key = cache_key(features)
+        if self.cache is not None:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        try:
+            recommendation = await self._generate(build_recommendation_prompt(features))
+        except Exception as e:
+            logger.warning("LLM provider unavailable, using rule-based recommendation: %r", e)
+            self.fallbacks += 1
+            return rule_based_recommendation(features)
+
+        if self.cache is not None:
+            await self.cache.set(key, recommendation)
+        return recommendation
+
+    async def _generate(self, prompt):
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpenError("LLM circuit breaker is open")
+            try:
+                async with self._semaphore:
+                    with span("llm.generate"):
+                        recommendation = await asyncio.wait_for(self.provider.generate(prompt), self.timeout)
+                if not recommendation:
+                    raise RuntimeError("LLM provider returned an empty response")
+            except Exception as e:
+                self.breaker.record_failure()
+                if attempt == self.max_retries:
+                    raise
+                delay = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+                logger.info("LLM call failed (%r), retry %d in %.2fs", e, attempt + 1, delay)
+                # Full jitter keeps retrying callers from hitting the provider in lockstep
+                await asyncio.sleep(random.uniform(0, delay))
+            except BaseException:
+                # Cancelled: a probe left marked in flight would keep the breaker open for good
+                self.breaker.record_abandoned()
+                raise
+            else:
+                self.breaker.record_success()
+                return recommendation
+
+
+recommendation_client = RecommendationClient()
+
+
+async def _load_test(requests, concurrency, **provider_options):
+    client = RecommendationClient(provider=FakeProvider(**provider_options), max_concurrency=concurrency, cache=None)
+    latencies = []
+
+    async def one(i):
+        start = time.perf_counter()
+        await client.recommend(5 + i % 5, 4, 7, 5, 30, 3, 7, "Sunny", "Good")
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    print(f"{requests} requests in {elapsed:.2f}s ({requests / elapsed:.1f} req/s)")
+    print(f"p50={latencies[len(latencies) // 2]:.3f}s p99={latencies[int(len(latencies) * 0.99) - 1]:.3f}s")
+    print(f"fallbacks={client.fallbacks} breaker={client.breaker.state}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test the recommendation client against the fake provider")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=LLM_MAX_CONCURRENCY)
+    parser.add_argument("--latency", type=float, default=FAKE_LLM_LATENCY)
+    parser.add_argument("--failure-rate", type=float, default=FAKE_LLM_FAILURE_RATE)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.ERROR)
+    asyncio.run(_load_test(args.requests, args.concurrency, latency=args.latency, failure_rate=args.failure_rate))
@@ -0,0 +1,304 @@
+"""Request latency, timing spans and runtime gauges in Prometheus format, plus an opt-in sampling profiler
+
+Every request is timed by MetricsMiddleware and labelled with its route template,
+so /tracker/recommendation/1 and /2 share one series. span() times named steps
+inside a request (auth, DB queries, encoding, model, LLM). Cache, pool and queue
+sizes are read from their stats() when /metrics is scraped, so they cost nothing
+between scrapes.
+"""
+import asyncio
+import contextlib
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from prometheus_client import REGISTRY, Gauge, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from sqlalchemy import event
+
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+# Profile requests sent with "X-Profile: 1", off by default since anyone can send the header
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() == "true"
+# Fraction of all requests profiled without the header, e.g. 0.001
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+REQUEST_LATENCY = Histogram(
+    "calmora_request_duration_seconds", "HTTP request latency", ["method", "route", "status"], buckets=LATENCY_BUCKETS
+)
+REQUESTS_IN_PROGRESS = Gauge("calmora_requests_in_progress", "HTTP requests being served", ["method"])
+SPAN_LATENCY = Histogram("calmora_span_duration_seconds", "Time spent in a named step", ["span"], buckets=LATENCY_BUCKETS)
+SPANS_IN_PROGRESS = Gauge("calmora_spans_in_progress", "Named steps currently running", ["span"])
+
+_span_children = {}
+
+
+def _span_metrics(name):
+    # Resolving labels takes a lock and a dict lookup, do it once per span name
+    children = _span_children.get(name)
+    if children is None:
+        children = _span_children[name] = (SPAN_LATENCY.labels(name), SPANS_IN_PROGRESS.labels(name))
+    return children
+
+
+@contextlib.contextmanager
+def span(name):
+    """Time the enclosed block as a named span, works in sync and async code"""
+    if not METRICS_ENABLED:
+        yield
+        return
+    latency, in_progress = _span_metrics(name)
+    in_progress.inc()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        latency.observe(time.perf_counter() - start)
+        in_progress.dec()
+
+
+def instrument_engine(engine, name="db.query"):
+    """Time every statement a sync engine (or an async engine's sync_engine) executes"""
+    if not METRICS_ENABLED:
+        return
+    latency, in_progress = _span_metrics(name)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+        in_progress.inc()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        latency.observe(time.perf_counter() - conn.info["query_start"].pop())
+        in_progress.dec()
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+            in_progress.dec()
+
+
+class SamplingProfiler:
+    """Sample the stack of one asyncio task at a fixed interval, written out as collapsed stacks
+
+    The output is the "frame;frame;frame count" format read by flamegraph.pl and
+    speedscope. Stacks start at `frame`, a frame of the task (the middleware's).
+    While the event loop thread runs the task its live stack is sampled, while the
+    task is suspended the chain of coroutines it awaits in is, ending in
+    "(waiting)". Other requests served in between are left out, and so is the work
+    of threads and processes the task waits on: that time is the "(waiting)" leaf
+    under the await that offloaded it.
+    """
+
+    def __init__(self, task, frame, interval=PROFILE_INTERVAL_MS / 1000):
+        self.task = task
+        self.frame = frame
+        self.interval = interval
+        self.samples = Counter()
+        self._loop_thread = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _task_frames(self):
+        """Frames of the task from self.frame inwards, and whether it was running"""
+        frames = []
+        frame = sys._current_frames().get(self._loop_thread)
+        while frame is not None:
+            frames.append(frame)
+            if frame is self.frame:
+                return frames[::-1], True
+            frame = frame.f_back
+        # Suspended: the coroutines awaiting each other, Task.get_stack() only returns the outermost one
+        frames = []
+        coro = self.task.get_coro()
+        while getattr(coro, "cr_frame", None) is not None:
+            frames.append(coro.cr_frame)
+            coro = coro.cr_await
+        for index, frame in enumerate(frames):
+            if frame is self.frame:
+                return frames[index:], False
+        # Not started or already done
+        return [], False
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames, running = self._task_frames()
+            if not frames:
+                continue
+            stack = [f"{frame.f_code.co_name} ({os.path.basename(frame.f_code.co_filename)})" for frame in frames]
+            if not running:
+                stack.append("(waiting)")
+            self.samples[";".join(stack)] += 1
+
+    def write(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+# One profile at a time, so profiling never adds more than one sampling thread
+_profiler_lock = threading.Lock()
+
+
+def _wants_profile(scope):
+    if PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE:
+        return True
+    return PROFILER_ENABLED and any(name == PROFILE_HEADER and value == b"1" for name, value in scope["headers"])
+
+
+def route_label(scope):
+    """Route template of a served request, the mount path for static files, never the raw path"""
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    return scope.get("root_path") or "<unmatched>"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing every HTTP request, lighter than BaseHTTPMiddleware"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = None
+        profiler = None
+        if _wants_profile(scope) and _profiler_lock.acquire(blocking=False):
+            profile_id = uuid.uuid4().hex[:12]
+            profiler = SamplingProfiler(asyncio.current_task(), sys._getframe())
+            profiler.start()
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if profile_id is not None:
+                    message["headers"] = [*message.get("headers", []), (PROFILE_ID_HEADER, profile_id.encode())]
+            await send(message)
+
+        method = scope["method"]
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            in_progress.dec()
+            REQUEST_LATENCY.labels(method, route_label(scope), str(status)).observe(elapsed)
+            if profiler is not None:
+                profiler.stop()
+                _profiler_lock.release()
+                path = os.path.join(PROFILE_DIR, f"{profile_id}.collapsed")
+                await asyncio.to_thread(profiler.write, path)
+                logger.info("Profiled %s %s (%.1f ms) into %s", method, scope["path"], elapsed * 1000, path)
+
+
+class RuntimeCollector:
+    """Expose the stats() of the in-process caches, pools and queues at scrape time"""
+
+    def describe(self):
+        # Without this the registry calls collect() on registration, before the modules below are imported
+        return []
+
+    def collect(self):
+        # Imported here, the instrumented modules import this one
+        from .analytics import analytics_cache
+        from .batch_inference import batch_predictor
+        from .db_writer import db_writer
+        from .images import image_pipeline
+        from .llm_client import recommendation_client
+        from .model_registry import model_registry
+        from .passwords import password_hasher
+        from .principal_cache import principal_cache
+        from .recommendation_cache import recommendation_cache
+        from .recommendation_worker import recommendation_pool
+        from .response_cache import response_cache
+        from .token_cache import token_cache
+
+        hits = CounterMetricFamily("calmora_cache_hits", "In-memory cache hits", labels=["cache"])
+        misses = CounterMetricFamily("calmora_cache_misses", "In-memory cache misses", labels=["cache"])
+        sizes = GaugeMetricFamily("calmora_cache_entries", "Entries held by an in-memory cache", labels=["cache"])
+        for name, cache in (
+            ("principal", principal_cache),
+            ("token", token_cache),
+            ("analytics", analytics_cache),
+            ("recommendation", recommendation_cache),
+            ("response", response_cache),
+        ):
+            stats = cache.stats()
+            hits.add_metric([name], stats["hits"])
+            misses.add_metric([name], stats["misses"])
+            sizes.add_metric([name], stats["size"])
+        yield from (hits, misses, sizes)
+        yield CounterMetricFamily(
+            "calmora_not_modified_responses", "Cached responses answered with 304 Not Modified", value=response_cache.stats()["not_modified"]
+        )
+
+        queues = GaugeMetricFamily("calmora_queue_depth", "Jobs waiting in an in-process queue", labels=["queue"])
+        queues.add_metric(["db_writer"], db_writer.qsize())
+        queues.add_metric(["batch_predictor"], batch_predictor.qsize())
+        queues.add_metric(["recommendations"], recommendation_pool.qsize())
+        queues.add_metric(["image_pipeline"], image_pipeline.stats()["pending"])
+        yield queues
+
+        hasher = password_hasher.stats()
+        yield GaugeMetricFamily("calmora_password_hash_active", "bcrypt calls running", value=hasher["active"])
+        yield GaugeMetricFamily("calmora_password_hash_queued", "bcrypt calls waiting for a worker", value=hasher["queued"])
+        yield CounterMetricFamily("calmora_password_hash_completed", "bcrypt calls finished", value=hasher["completed"])
+        yield CounterMetricFamily("calmora_password_hash_rejected", "bcrypt calls rejected as busy", value=hasher["rejected"])
+
+        yield CounterMetricFamily(
+            "calmora_llm_fallbacks", "Recommendations served by the rule-based fallback", value=recommendation_client.fallbacks
+        )
+        breaker = GaugeMetricFamily("calmora_llm_breaker_state", "1 for the LLM circuit breaker's current state", labels=["state"])
+        for state in ("closed", "open", "half_open"):
+            breaker.add_metric([state], 1 if recommendation_client.breaker.state == state else 0)
+        yield breaker
+
+        live = GaugeMetricFamily("calmora_model_info", "1 for the live and the shadow model version", labels=["role", "version"])
+        for role, bundle in (("live", model_registry.live), ("shadow", model_registry.shadow)):
+            if bundle is not None:
+                live.add_metric([role, bundle.version], 1)
+        yield live
+        if model_registry.shadow is not None:
+            shadow = model_registry.shadow_stats.as_dict()
+            yield CounterMetricFamily("calmora_shadow_rows", "Rows scored by the shadow model", value=shadow["rows"])
+            diff = GaugeMetricFamily("calmora_shadow_mean_abs_diff", "Mean absolute shadow - live difference", labels=["target"])
+            diff.add_metric(["mood_score"], shadow["mood_score_mean_abs_diff"])
+            diff.add_metric(["stress_level"], shadow["stress_level_mean_abs_diff"])
+            yield diff
+
+
+if METRICS_ENABLED:
+    REGISTRY.register(RuntimeCollector())
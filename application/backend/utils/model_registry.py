@@ -0,0 +1,455 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+from datetime import datetime
+import joblib
+import numpy as np
+from .compiled_model import compile_model, save_compiled, load_compiled
+from .encoding import FeatureEncoder
+from .metrics import span
+
+
+logger = logging.getLogger(__name__)
+
+MODEL_REGISTRY_PATH = os.getenv("MODEL_REGISTRY_PATH") or os.path.join(os.path.dirname(__file__), "models")
+# Seconds between checks of the CURRENT / SHADOW pointers, 0 disables the watcher
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "10"))
+# Serve from the memory-mapped compiled/ arrays instead of unpickling the joblib model in every worker
+MODEL_MMAP = os.getenv("MODEL_MMAP", "true").lower() == "true"
+
+# Pointer files in the registry root holding the live and the shadow version name
+CURRENT_POINTER = "CURRENT"
+SHADOW_POINTER = "SHADOW"
+MANIFEST_FILE = "manifest.json"
+# Flat .npy copy of the compiled forest inside a version directory
+COMPILED_DIR = "compiled"
+
+# Artifact name -> file name written by the training notebook
+ARTIFACTS = {
+    "model": "gradient_boosting_tuning.joblib",
+    "le_diet": "le_diet_quality.joblib",
+    "le_sleep": "le_sleep_quality.joblib",
+    "le_weather": "le_weather.joblib",
+    "scaler": "scaler.joblib",
+}
+
+# A version is a single directory name: no separators and no leading dot (staging directories have one)
+VERSION_NAME = re.compile(r"^[A-Za-z0-9_-][A-Za-z0-9._-]*$")
+
+# Above this many rows sklearn's compiled tree code beats the NumPy evaluator
+COMPILED_MODEL_MAX_ROWS = 32
+
+
+def valid_version(version):
+    return isinstance(version, str) and VERSION_NAME.match(version) is not None and ".." not in version
+
+
+class ModelIntegrityError(RuntimeError):
+    pass
+
+
+def sha256sum(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _verify(path, entry):
+    artifact_path = os.path.join(path, entry["file"])
+    if sha256sum(artifact_path) != entry["sha256"]:
+        raise ModelIntegrityError(f"Checksum mismatch for {artifact_path}")
+    return artifact_path
+
+
+def load_artifacts(path, manifest=None):
+    """Unpickle a version's joblib artifacts, checked against the manifest when one is given"""
+    artifacts = {}
+    for name, file_name in ARTIFACTS.items():
+        artifact_path = _verify(path, manifest["artifacts"][name]) if manifest else os.path.join(path, file_name)
+        artifacts[name] = joblib.load(artifact_path)
+    return artifacts
+
+
+class ModelBundle:
+    """One model version: the compiled forest and encoder that serve it, plus the sklearn artifacts
+
+    Versions with a compiled/ directory are served from memory-mapped node arrays,
+    the joblib artifacts are only unpickled when something needs sklearn (batches
+    above COMPILED_MODEL_MAX_ROWS, offline scoring, parity checks).
+    """
+
+    def __init__(self, version, encoder, compiled, path=None, manifest=None, artifacts=None):
+        self.version = version
+        self.encoder = encoder
+        # The compiled model takes unscaled features and applies the scaler itself
+        self.compiled = compiled
+        self.path = path
+        self.manifest = manifest or {}
+        self._artifacts = artifacts
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_artifacts(cls, version, artifacts, path=None, manifest=None):
+        encoder = FeatureEncoder.from_label_encoders(artifacts["le_diet"], artifacts["le_sleep"], artifacts["le_weather"])
+        compiled = compile_model(artifacts["model"], artifacts["scaler"])
+        return cls(version, encoder, compiled, path, manifest, artifacts)
+
+    @classmethod
+    def load(cls, path, mmap=MODEL_MMAP):
+        """Load a version directory, every file is checked against the manifest before it is used"""
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        compiled = manifest.get("compiled")
+        if not mmap or compiled is None:
+            return cls.from_artifacts(manifest["version"], load_artifacts(path, manifest), path, manifest)
+        for entry in compiled["files"]:
+            _verify(path, entry)
+        encoder = FeatureEncoder.from_categories(compiled["categories"])
+        return cls(manifest["version"], encoder, load_compiled(os.path.join(path, COMPILED_DIR)), path, manifest)
+
+    @property
+    def artifacts(self):
+        if self._artifacts is None:
+            with self._lock:
+                if self._artifacts is None:
+                    self._artifacts = load_artifacts(self.path, self.manifest)
+        return self._artifacts
+
+    @property
+    def model(self):
+        return self.artifacts["model"]
+
+    @property
+    def scaler(self):
+        return self.artifacts["scaler"]
+
+    def as_tuple(self):
+        return tuple(self.artifacts[name] for name in ("model", "le_diet", "le_sleep", "le_weather", "scaler"))
+
+    def predict_matrix(self, X):
+        """Predict an encoded (n, 8) feature matrix, returns an (n, 2) array of mood_score, stress_level"""
+        with span("model.predict"):
+            if X.shape[0] <= COMPILED_MODEL_MAX_ROWS:
+                return self.compiled.predict(X)
+            return self.model.predict(self.scaler.transform(X))
+
+    def predict_many(self, rows):
+        """Predict rows in FEATURES order, returns a list of rounded (mood_score, stress_level) tuples"""
+        if len(rows) == 0:
+            return []
+        with span("model.encode"):
+            X = self.encoder.encode_rows(rows)
+        prediction = self.predict_matrix(X)
+        return [(round(mood_score, 1), round(stress_level, 1)) for mood_score, stress_level in prediction]
+
+
+class ShadowStats:
+    """Running comparison of the shadow model's predictions with the live ones"""
+
+    def __init__(self, version=None):
+        self.version = version
+        self.rows = 0
+        self.errors = 0
+        self.abs_diff_sum = np.zeros(2)
+        self.abs_diff_max = np.zeros(2)
+        self._lock = threading.Lock()
+
+    def record(self, live, shadow):
+        diff = np.abs(np.asarray(live, dtype=np.float64) - np.asarray(shadow, dtype=np.float64))
+        with self._lock:
+            self.rows += diff.shape[0]
+            self.abs_diff_sum += diff.sum(axis=0)
+            self.abs_diff_max = np.maximum(self.abs_diff_max, diff.max(axis=0))
+
+    def record_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def as_dict(self):
+        with self._lock:
+            mean = self.abs_diff_sum / self.rows if self.rows else np.zeros(2)
+            return {
+                "version": self.version,
+                "rows": self.rows,
+                "errors": self.errors,
+                "mood_score_mean_abs_diff": round(float(mean[0]), 4),
+                "stress_level_mean_abs_diff": round(float(mean[1]), 4),
+                "mood_score_max_abs_diff": round(float(self.abs_diff_max[0]), 4),
+                "stress_level_max_abs_diff": round(float(self.abs_diff_max[1]), 4),
+            }
+
+
+class ModelRegistry:
+    """Versioned model artifacts with an atomically swapped live model and an optional shadow
+
+    Layout: <path>/<version>/{manifest.json, *.joblib} plus the CURRENT and SHADOW
+    pointer files naming the live and the shadow version. Every worker polls the
+    pointers, so activating a version once (admin endpoint or CLI) rolls it out
+    everywhere without a restart. A new bundle is fully loaded before the swap,
+    in-flight batches finish on the bundle they started with.
+    """
+
+    def __init__(self, path=MODEL_REGISTRY_PATH, watch_interval=MODEL_WATCH_INTERVAL):
+        self.path = path
+        self.watch_interval = watch_interval
+        self.live = None
+        self.shadow = None
+        self.shadow_stats = ShadowStats()
+        self._pointers = (None, None)
+        self._bundles = {}
+        self._lock = threading.RLock()
+        self._task = None
+
+    def versions(self):
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(
+            name for name in os.listdir(self.path)
+            if os.path.isfile(os.path.join(self.path, name, MANIFEST_FILE))
+        )
+
+    def read_pointer(self, name):
+        try:
+            with open(os.path.join(self.path, name)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _write_pointer(self, name, version):
+        target = os.path.join(self.path, name)
+        if version is None:
+            if os.path.exists(target):
+                os.remove(target)
+            return
+        # Write then rename, so a watching worker never reads a half-written pointer
+        fd, tmp = tempfile.mkstemp(dir=self.path, prefix=f".{name}.")
+        with os.fdopen(fd, "w") as f:
+            f.write(version + "\n")
+        os.replace(tmp, target)
+
+    def version_path(self, version):
+        """Directory of a registered version, raises FileNotFoundError for malformed or unknown names
+
+        Versions come from requests and the CLI, only names listed by versions() ever reach the filesystem.
+        """
+        if not valid_version(version) or version not in self.versions():
+            raise FileNotFoundError(f"Unknown model version: {version}")
+        return os.path.join(self.path, version)
+
+    def bundle(self, version):
+        """Load (or reuse) a version, raises FileNotFoundError for unknown versions"""
+        with self._lock:
+            bundle = self._bundles.get(version)
+            if bundle is None:
+                bundle = ModelBundle.load(self.version_path(version))
+                self._bundles[version] = bundle
+            return bundle
+
+    def current(self):
+        """The live bundle, loaded on first use when the registry was not loaded at startup"""
+        bundle = self.live
+        if bundle is None:
+            self.load()
+            bundle = self.live
+        return bundle
+
+    def load(self):
+        """(Re)load the versions named by the pointer files and swap them in"""
+        with self._lock:
+            live_version = self.read_pointer(CURRENT_POINTER)
+            if live_version is None:
+                raise FileNotFoundError(f"No {CURRENT_POINTER} model version in {self.path}")
+            shadow_version = self.read_pointer(SHADOW_POINTER)
+            live = self.bundle(live_version)
+            shadow = self.bundle(shadow_version) if shadow_version and shadow_version != live_version else None
+            self.live = live
+            self._set_shadow(shadow)
+            self._pointers = (live_version, shadow_version)
+            # Keep only what is in use, old versions are freed once their last batch is done
+            self._bundles = {bundle.version: bundle for bundle in (live, shadow) if bundle is not None}
+            logger.info("Model registry: live=%s shadow=%s", live_version, shadow.version if shadow else None)
+
+    def reload_if_changed(self):
+        if (self.read_pointer(CURRENT_POINTER), self.read_pointer(SHADOW_POINTER)) != self._pointers:
+            self.load()
+            return True
+        return False
+
+    def activate(self, version):
+        """Make version the live model, here and (through the pointer file) in every other worker"""
+        with self._lock:
+            self.bundle(version)
+            self._write_pointer(CURRENT_POINTER, version)
+            if self.read_pointer(SHADOW_POINTER) == version:
+                # The candidate was promoted, there is nothing left to compare it with
+                self._write_pointer(SHADOW_POINTER, None)
+            self.load()
+            return self.live
+
+    def set_shadow(self, version):
+        """Score every batch with version as well and compare it with the live model, None stops shadowing"""
+        with self._lock:
+            if version is not None:
+                self.bundle(version)
+            self._write_pointer(SHADOW_POINTER, version)
+            self.load()
+            return self.shadow
+
+    def _set_shadow(self, bundle):
+        if (bundle.version if bundle else None) != self.shadow_stats.version:
+            self.shadow_stats = ShadowStats(bundle.version if bundle else None)
+        self.shadow = bundle
+
+    def compare_shadow(self, rows, live_results):
+        """Score rows with the shadow model and record how far it is from live_results"""
+        shadow, stats = self.shadow, self.shadow_stats
+        if shadow is None or not rows:
+            return
+        try:
+            stats.record(live_results, shadow.predict_many(rows))
+        except Exception:
+            stats.record_error()
+            logger.exception("Shadow model %s failed to score a batch", shadow.version)
+
+    def status(self):
+        return {
+            "live": self.live.version if self.live else None,
+            "shadow": self.shadow.version if self.shadow else None,
+            "versions": self.versions(),
+            "shadow_stats": self.shadow_stats.as_dict() if self.shadow else None,
+        }
+
+    def register(self, source_dir, version, description=""):
+        """Copy a training run's artifacts into a new version directory with a checksummed manifest"""
+        if not valid_version(version):
+            raise ValueError(f"Invalid model version name {version!r}, use letters, digits, '.', '_' and '-'")
+        target = os.path.join(self.path, version)
+        if os.path.exists(target):
+            raise FileExistsError(f"Model version {version} already exists")
+        os.makedirs(self.path, exist_ok=True)
+        staging = tempfile.mkdtemp(dir=self.path, prefix=f".{version}.")
+        try:
+            for file_name in ARTIFACTS.values():
+                shutil.copy2(os.path.join(source_dir, file_name), os.path.join(staging, file_name))
+            write_manifest(staging, version, description)
+            # Validate before publishing, a broken version never becomes visible
+            ModelBundle.load(staging)
+            # mkdtemp creates the directory private to this user
+            os.chmod(staging, 0o755)
+            os.rename(staging, target)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        return target
+
+    def compile(self, version):
+        """Add the memory-mappable compiled/ arrays to a version registered without them"""
+        path = self.version_path(version)
+        with open(os.path.join(path, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+        # The joblib files must still match before their checksums are recorded again
+        artifacts = load_artifacts(path, manifest)
+        return write_manifest(path, version, manifest.get("description", ""), manifest.get("created_at"), artifacts)
+
+    async def start_watcher(self):
+        if self._task is not None or self.watch_interval <= 0:
+            return
+        self._task = asyncio.create_task(self._watch())
+
+    async def stop_watcher(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.watch_interval)
+            try:
+                await asyncio.to_thread(self.reload_if_changed)
+            except Exception:
+                # Keep serving the loaded model, the pointer is retried on the next tick
+                logger.exception("Failed to reload models from %s", self.path)
+
+
+def write_manifest(path, version, description="", created_at=None, artifacts=None):
+    """Compile a version directory's artifacts into compiled/ and record every file's checksum in manifest.json"""
+    bundle = ModelBundle.from_artifacts(version, artifacts or load_artifacts(path))
+    compiled_files = save_compiled(bundle.compiled, os.path.join(path, COMPILED_DIR))
+    manifest = {
+        "version": version,
+        "created_at": created_at or datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "description": description,
+        "artifacts": {
+            name: {"file": file_name, "sha256": sha256sum(os.path.join(path, file_name))}
+            for name, file_name in ARTIFACTS.items()
+        },
+        "compiled": {
+            "files": [
+                {"file": f"{COMPILED_DIR}/{file_name}", "sha256": sha256sum(os.path.join(path, COMPILED_DIR, file_name))}
+                for file_name in compiled_files
+            ],
+            "categories": {feature: bundle.encoder.categories(feature) for feature in bundle.encoder.encoders},
+        },
+    }
+    fd, tmp = tempfile.mkstemp(dir=path, prefix=f".{MANIFEST_FILE}.")
+    with os.fdopen(fd, "w") as f:
+        json.dump(manifest, f, indent=2)
+        f.write("\n")
+    os.replace(tmp, os.path.join(path, MANIFEST_FILE))
+    return manifest
+
+
+model_registry = ModelRegistry()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the versioned model registry")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("list", help="Show the versions and which ones are live / shadow")
+    register = commands.add_parser("register", help="Add a training run's joblib files as a new version")
+    register.add_argument("source", help="Directory holding the joblib artifacts")
+    register.add_argument("version")
+    register.add_argument("--description", default="")
+    register.add_argument("--activate", action="store_true", help="Make it the live version right away")
+    activate = commands.add_parser("activate", help="Make a version live in every worker")
+    activate.add_argument("version")
+    shadow = commands.add_parser("shadow", help="Shadow-score with a version, omit it to stop shadowing")
+    shadow.add_argument("version", nargs="?")
+    verify = commands.add_parser("verify", help="Check a version's checksums and load it")
+    verify.add_argument("version")
+    compile_version = commands.add_parser("compile", help="(Re)write a version's memory-mappable compiled/ arrays")
+    compile_version.add_argument("version")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        live, candidate = model_registry.read_pointer(CURRENT_POINTER), model_registry.read_pointer(SHADOW_POINTER)
+        for version in model_registry.versions():
+            marks = [label for label, name in (("live", live), ("shadow", candidate)) if name == version]
+            print(version + (f" ({', '.join(marks)})" if marks else ""))
+    elif args.command == "register":
+        print(f"Registered {model_registry.register(args.source, args.version, args.description)}")
+        if args.activate:
+            model_registry.activate(args.version)
+            print(f"Activated {args.version}")
+    elif args.command == "activate":
+        model_registry.activate(args.version)
+        print(f"Activated {args.version}")
+    elif args.command == "shadow":
+        model_registry.set_shadow(args.version)
+        print(f"Shadow model: {args.version}")
+    elif args.command == "verify":
+        print(f"{model_registry.bundle(args.version).version} OK")
+    elif args.command == "compile":
+        model_registry.compile(args.version)
+        print(f"Compiled {args.version}")
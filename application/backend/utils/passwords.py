@@ -0,0 +1,113 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+
+
+# bcrypt cost factor, every +1 doubles the hashing time. Hashes with another cost are rehashed on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# bcrypt releases the GIL, so one thread per core hashes in parallel
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS") or os.cpu_count() or 1)
+# Hash/verify calls allowed to wait for a worker before new ones are rejected
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "256"))
+
+
+def create_password_context(rounds=BCRYPT_ROUNDS):
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+class PasswordHasherBusy(RuntimeError):
+    pass
+
+
+class PasswordHasher:
+    """Run bcrypt hash/verify on a dedicated, size-limited thread pool instead of the event loop
+
+    At most max_queue calls may wait for one of the workers, later calls fail
+    fast with PasswordHasherBusy so a login burst cannot pile up unbounded work.
+    """
+
+    def __init__(self, context=None, workers=PASSWORD_HASH_WORKERS, max_queue=PASSWORD_HASH_MAX_QUEUE):
+        self.context = context if context is not None else create_password_context()
+        self.workers = workers
+        self.max_queue = max_queue
+        self.active = 0
+        self.queued = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+
+    async def hash(self, password):
+        return await self._submit(self.context.hash, password)
+
+    async def verify(self, password, hashed_password):
+        return await self._submit(self.context.verify, password, hashed_password)
+
+    async def verify_and_update(self, password, hashed_password):
+        """Verify a password, returns (valid, new_hash) where new_hash is set when the stored hash is outdated"""
+        valid, new_hash = await self._submit(self.context.verify_and_update, password, hashed_password)
+        if new_hash is not None:
+            with self._lock:
+                self.rehashed += 1
+        return valid, new_hash
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "active": self.active,
+                "queued": self.queued,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "rehashed": self.rehashed,
+                "avg_wait_ms": self.wait_seconds / self.completed * 1000 if self.completed else 0.0,
+                "avg_run_ms": self.run_seconds / self.completed * 1000 if self.completed else 0.0,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _submit(self, fn, *args):
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise PasswordHasherBusy("Too many password checks in progress")
+            self.queued += 1
+        future = self._executor.submit(self._run, fn, args, time.perf_counter())
+        future.add_done_callback(self._release_cancelled)
+        return await asyncio.wrap_future(future)
+
+    def _release_cancelled(self, future):
+        # A caller cancelled before a worker picked the call up never reaches _run
+        if future.cancelled():
+            with self._lock:
+                self.queued -= 1
+
+    def _run(self, fn, args, submitted):
+        started = time.perf_counter()
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+            self.wait_seconds += started - submitted
+        try:
+            return fn(*args)
+        finally:
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+                self.run_seconds += time.perf_counter() - started
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import select
+from ..database import AsyncSessionLocal
+from .. import models
+
+
+logger = logging.getLogger(__name__)
+
+
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "1024"))
+# Backstop only, writes on other workers reach this one through the sync below
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+# Seconds between checks of the cached users' stored versions, 0 disables the check.
+# It bounds how long a logout or a write served by another worker goes unnoticed here
+PRINCIPAL_CACHE_SYNC_INTERVAL = float(os.getenv("PRINCIPAL_CACHE_SYNC_INTERVAL", "1"))
+
+SYNC_BATCH_SIZE = 500
+
+
+class PrincipalCache:
+    """LRU + TTL cache of authenticated users keyed by token subject
+
+    Values are detached User instances with every column loaded, they are shared
+    between requests and must be treated as read-only. Handlers that change the
+    user merge it into their session (db.merge(user, load=False)) and invalidate.
+    Requests never query the users table on a hit: every sync_interval one
+    batched SELECT compares token_version and data_version of all cached users
+    with the stored ones and drops those that moved in another worker.
+    """
+
+    def __init__(self, max_size=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL, sync_interval=PRINCIPAL_CACHE_SYNC_INTERVAL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.sync_interval = sync_interval
+        self._task = None
+        self.hits = 0
+        self.misses = 0
+        # Bumped by every invalidation, loads that started before it are not cached
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, subject):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is not None:
+                expires_at, user = entry
+                if expires_at > now:
+                    self._entries.move_to_end(subject)
+                    self.hits += 1
+                    return user
+                del self._entries[subject]
+            self.misses += 1
+            return None
+
+    def set(self, subject, user, generation):
+        """Cache a user loaded while self.generation was generation"""
+        with self._lock:
+            if generation != self.generation:
+                # Invalidated while the user was being loaded, it may be stale already
+                return
+            self._entries[subject] = (time.monotonic() + self.ttl, user)
+            self._entries.move_to_end(subject)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, *subjects):
+        with self._lock:
+            self.generation += 1
+            for subject in subjects:
+                self._entries.pop(subject, None)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    async def sync(self):
+        """Drop cached users whose stored token_version or data_version changed, returns how many"""
+        with self._lock:
+            cached = [(subject, user) for subject, (_, user) in self._entries.items()]
+        stale = []
+        async with AsyncSessionLocal() as db:
+            for start in range(0, len(cached), SYNC_BATCH_SIZE):
+                batch = cached[start:start + SYNC_BATCH_SIZE]
+                rows = await db.execute(
+                    select(models.User.id, models.User.token_version, models.User.data_version)
+                    .where(models.User.id.in_([user.id for _, user in batch]))
+                )
+                current = {row.id: (row.token_version, row.data_version) for row in rows}
+                # Missing rows are deleted accounts
+                stale += [subject for subject, user in batch if current.get(user.id) != (user.token_version, user.data_version)]
+        if stale:
+            self.invalidate(*stale)
+        return len(stale)
+
+    async def start_watcher(self):
+        if self._task is not None or self.sync_interval <= 0:
+            return
+        self._task = asyncio.create_task(self._watch())
+
+    async def stop_watcher(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _watch(self):
+        while True:
+            await asyncio.sleep(self.sync_interval)
+            try:
+                await self.sync()
+            except Exception:
+                # Keep the cache, the next tick retries
+                logger.exception("Failed to sync the principal cache")
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+principal_cache = PrincipalCache()
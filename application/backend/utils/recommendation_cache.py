@@ -0,0 +1,166 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+RECOMMENDATION_CACHE_SIZE = int(os.getenv("RECOMMENDATION_CACHE_SIZE", "1024"))
+RECOMMENDATION_CACHE_TTL = float(os.getenv("RECOMMENDATION_CACHE_TTL", str(24 * 60 * 60)))
+# Path of the SQLite file backing the persistent tier, leave empty to keep the cache in memory only
+RECOMMENDATION_CACHE_DB = os.getenv("RECOMMENDATION_CACHE_DB", "")
+
+# Bucket width per numeric prompt field, inputs inside one bucket share a recommendation
+QUANTIZATION_STEPS = {
+    "mood_score": 0.5,
+    "stress_level": 0.5,
+    "sleep_hours": 0.5,
+    "screen_time": 0.5,
+    "physical_activity": 10,
+    "social_interaction": 0.5,
+    "work_productivity": 1,
+}
+
+# Prune expired rows from the persistent tier every this many writes
+PRUNE_INTERVAL = 256
+
+
+def quantize_features(
+    mood_score,
+    stress_level,
+    sleep_hours,
+    screen_time,
+    physical_activity,
+    social_interaction,
+    work_productivity,
+    weather,
+    diet_quality
+):
+    """Snap the recommendation prompt fields onto their buckets, returns a dict of the same fields"""
+    values = {
+        "mood_score": mood_score,
+        "stress_level": stress_level,
+        "sleep_hours": sleep_hours,
+        "screen_time": screen_time,
+        "physical_activity": physical_activity,
+        "social_interaction": social_interaction,
+        "work_productivity": work_productivity,
+    }
+    quantized = {}
+    for name, value in values.items():
+        step = QUANTIZATION_STEPS[name]
+        bucket = round(float(value) / step) * step
+        quantized[name] = int(bucket) if isinstance(step, int) else round(bucket, 2)
+    quantized["weather"] = str(weather).strip().capitalize()
+    quantized["diet_quality"] = str(diet_quality).strip().capitalize()
+    return quantized
+
+
+def cache_key(features):
+    """Build the cache key from quantized prompt fields"""
+    return "|".join(f"{name}={features[name]}" for name in sorted(features))
+
+
+class RecommendationCache:
+    """LRU + TTL cache of AI recommendations with an optional SQLite tier that survives restarts
+
+    get and set are coroutines: the in-memory tier is a dict lookup, the SQLite
+    tier (queries, commits and their fsync) runs on a thread so it never blocks
+    the event loop.
+    """
+
+    def __init__(self, max_size=RECOMMENDATION_CACHE_SIZE, ttl=RECOMMENDATION_CACHE_TTL, db_path=RECOMMENDATION_CACHE_DB):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Serializes the SQLite connection, held off the event loop only
+        self._db_lock = threading.Lock()
+        self._writes = 0
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS recommendation_cache "
+                "(key TEXT PRIMARY KEY, recommendation TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.commit()
+
+    async def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, recommendation = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return recommendation
+                del self._entries[key]
+            if self._db is None:
+                self.misses += 1
+                return None
+        row = await asyncio.to_thread(self._load, key, now)
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self._store(key, row[0], row[1])
+            self.hits += 1
+            self.persistent_hits += 1
+        return row[0]
+
+    async def set(self, key, recommendation):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._store(key, recommendation, expires_at)
+        if self._db is not None:
+            await asyncio.to_thread(self._persist, key, recommendation, expires_at)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM recommendation_cache")
+                self._db.commit()
+
+    def _load(self, key, now):
+        with self._db_lock:
+            return self._db.execute(
+                "SELECT recommendation, expires_at FROM recommendation_cache WHERE key = ? AND expires_at > ?",
+                (key, now)
+            ).fetchone()
+
+    def _persist(self, key, recommendation, expires_at):
+        with self._db_lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO recommendation_cache (key, recommendation, expires_at) VALUES (?, ?, ?)",
+                (key, recommendation, expires_at)
+            )
+            self._writes += 1
+            if self._writes % PRUNE_INTERVAL == 0:
+                self._db.execute("DELETE FROM recommendation_cache WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "persistent_hits": self.persistent_hits,
+                "misses": self.misses,
+                "size": len(self._entries),
+            }
+
+    def _store(self, key, recommendation, expires_at):
+        self._entries[key] = (expires_at, recommendation)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+recommendation_cache = RecommendationCache()
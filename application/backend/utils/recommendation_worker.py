@@ -0,0 +1,215 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, or_, true
+from ..database import AsyncSessionLocal
+from .. import models
+from .llm_client import recommendation_client
+from .db_writer import db_writer
+from .principal_cache import principal_cache
+from .response_cache import bump_data_version
+
+
+logger = logging.getLogger(__name__)
+
+RECOMMENDATION_WORKERS = int(os.getenv("RECOMMENDATION_WORKERS", "4"))
+# Jobs waiting per process, entries that do not fit stay pending and are recovered later
+RECOMMENDATION_QUEUE_SIZE = int(os.getenv("RECOMMENDATION_QUEUE_SIZE", "1000"))
+# A pending entry whose lease is older than this is taken over by any worker, longer than an LLM call with retries
+RECOMMENDATION_LEASE_SECONDS = float(os.getenv("RECOMMENDATION_LEASE_SECONDS", "300"))
+# How often each process looks for pending entries with an expired lease, 0 only recovers at startup
+RECOMMENDATION_RECOVERY_INTERVAL = float(os.getenv("RECOMMENDATION_RECOVERY_INTERVAL", "60"))
+
+RECOMMENDATION_PENDING = "pending"
+RECOMMENDATION_READY = "ready"
+RECOMMENDATION_FAILED = "failed"
+
+
+async def _store_recommendation(entry_id, claimed_at, recommendation, status):
+    """Write the generated recommendation back to its tracker entry, unless the lease was lost meanwhile"""
+    async with AsyncSessionLocal() as db:
+        user_id = await db.scalar(
+            update(models.TrackerEntry)
+            .where(*_held(entry_id, claimed_at))
+            .values(ai_recommendation=recommendation, recommendation_status=status, claimed_at=None)
+            .returning(models.TrackerEntry.user_id)
+        )
+        if user_id is not None:
+            # History pages show the recommendation status
+            await db.execute(bump_data_version(user_id))
+        await db.commit()
+    if user_id is not None:
+        principal_cache.invalidate(str(user_id))
+
+
+def _held(entry_id, claimed_at):
+    """Conditions under which the holder of the lease taken at claimed_at still owns the entry"""
+    return (
+        models.TrackerEntry.id == entry_id,
+        models.TrackerEntry.recommendation_status == RECOMMENDATION_PENDING,
+        models.TrackerEntry.claimed_at == claimed_at,
+    )
+
+
+async def _renew_lease(entry_id, claimed_at):
+    """Move the lease to now if it is still ours, returns the new claimed_at or None once it was lost"""
+    renewed_at = datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(update(models.TrackerEntry).where(*_held(entry_id, claimed_at)).values(claimed_at=renewed_at))
+        await db.commit()
+    return renewed_at if result.rowcount == 1 else None
+
+
+async def _claim_stale_jobs(limit, exclude):
+    """Claim up to `limit` pending entries whose lease is missing or expired, returns their jobs
+
+    Every claim is a compare-and-set on the claimed_at that was read, so when several
+    workers recover at the same time each entry goes to exactly one of them. Entries
+    another live worker holds (a fresh lease) are left alone.
+    """
+    stale_before = datetime.utcnow() - timedelta(seconds=RECOMMENDATION_LEASE_SECONDS)
+    entry = models.TrackerEntry
+    async with AsyncSessionLocal() as db:
+        entries = (await db.scalars(
+            select(entry)
+            .where(
+                entry.recommendation_status == RECOMMENDATION_PENDING,
+                or_(entry.claimed_at.is_(None), entry.claimed_at < stale_before),
+                entry.id.not_in(exclude) if exclude else true(),
+            )
+            .order_by(entry.id)
+            .limit(limit)
+        )).all()
+        jobs = []
+        for tracker_entry in entries:
+            claimed_at = datetime.utcnow()
+            seen = entry.claimed_at.is_(None) if tracker_entry.claimed_at is None else entry.claimed_at == tracker_entry.claimed_at
+            result = await db.execute(
+                update(entry)
+                .where(entry.id == tracker_entry.id, entry.recommendation_status == RECOMMENDATION_PENDING, seen)
+                .values(claimed_at=claimed_at)
+            )
+            if result.rowcount == 1:
+                jobs.append((tracker_entry.id, recommendation_features(tracker_entry), claimed_at))
+        await db.commit()
+        return jobs
+
+
+def recommendation_features(entry):
+    """Collect the prompt fields used by RecommendationClient.recommend from a tracker entry"""
+    return {
+        "mood_score": entry.mood_score,
+        "stress_level": entry.stress_level,
+        "sleep_hours": entry.sleep_hours,
+        "screen_time": entry.screen_time,
+        "physical_activity": entry.physical_activity,
+        "social_interaction": entry.social_interaction,
+        "work_productivity": entry.work_productivity,
+        "weather": entry.weather,
+        "diet_quality": entry.diet_quality,
+    }
+
+
+class RecommendationWorkerPool:
+    """Generate AI recommendations in the background so /tracker/predict never waits on the LLM
+
+    A job is (entry_id, features, claimed_at): the entry's lease, set when it was
+    created or recovered. Only the lease holder calls the LLM and writes the result,
+    so with several app processes each entry costs one LLM call. Leases left behind
+    by a crashed process, and entries that did not fit in a full queue, are
+    recovered once they expire.
+    """
+
+    def __init__(self, workers=RECOMMENDATION_WORKERS, max_size=RECOMMENDATION_QUEUE_SIZE,
+                 lease_seconds=RECOMMENDATION_LEASE_SECONDS, recovery_interval=RECOMMENDATION_RECOVERY_INTERVAL):
+        self.workers = workers
+        self.max_size = max_size
+        self.lease_seconds = lease_seconds
+        self.recovery_interval = recovery_interval
+        self.dropped = 0
+        self.lost_leases = 0
+        self._queue = None
+        self._queued = set()
+        self._tasks = []
+
+    async def start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        await self.recover()
+        if self.recovery_interval > 0:
+            self._tasks.append(asyncio.create_task(self._recover_periodically()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self._queued.clear()
+
+    def submit(self, entry_id, features, claimed_at):
+        """Queue a recommendation job for a stored tracker entry leased at claimed_at"""
+        if self._queue is None:
+            raise RuntimeError("Recommendation worker pool is not running")
+        try:
+            self._queue.put_nowait((entry_id, features, claimed_at))
+        except asyncio.QueueFull:
+            # Still pending with our lease, any process recovers it once the lease expires
+            self.dropped += 1
+            logger.warning("Recommendation queue full, tracker entry %s is left for recovery", entry_id)
+            return
+        self._queued.add(entry_id)
+
+    async def recover(self):
+        """Queue pending entries with a missing or expired lease, as many as the queue has room for"""
+        room = self.max_size - self._queue.qsize()
+        if room <= 0:
+            return 0
+        jobs = await db_writer.run(_claim_stale_jobs, room, list(self._queued))
+        for job in jobs:
+            self.submit(*job)
+        if jobs:
+            logger.info("Recovered %d pending recommendation(s)", len(jobs))
+        return len(jobs)
+
+    async def _recover_periodically(self):
+        while True:
+            await asyncio.sleep(self.recovery_interval)
+            try:
+                await self.recover()
+            except Exception:
+                logger.exception("Failed to recover pending recommendations")
+
+    def qsize(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def _worker(self):
+        while True:
+            entry_id, features, claimed_at = await self._queue.get()
+            try:
+                # A job that waited long in the queue renews its lease first, so it cannot expire mid-call
+                age = (datetime.utcnow() - claimed_at).total_seconds()
+                if age > self.lease_seconds / 2:
+                    claimed_at = await db_writer.run(_renew_lease, entry_id, claimed_at)
+                    if claimed_at is None:
+                        self.lost_leases += 1
+                        continue
+                recommendation = await recommendation_client.recommend(**features)
+                await db_writer.run(_store_recommendation, entry_id, claimed_at, recommendation, RECOMMENDATION_READY)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Failed to generate recommendation for tracker entry %s", entry_id)
+                try:
+                    await db_writer.run(_store_recommendation, entry_id, claimed_at, None, RECOMMENDATION_FAILED)
+                except Exception:
+                    logger.exception("Failed to mark recommendation as failed for tracker entry %s", entry_id)
+            finally:
+                self._queued.discard(entry_id)
+                self._queue.task_done()
+
+
+recommendation_pool = RecommendationWorkerPool()
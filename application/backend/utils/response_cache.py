@@ -0,0 +1,116 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from fastapi import Request, Response
+from sqlalchemy import update
+from .. import models
+
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))
+
+# Per user and always revalidated, a 304 costs the client a round trip but no body
+CACHE_CONTROL = "private, no-cache"
+
+
+class CachedResponse:
+    """A serialized JSON body with its ETag, built once and reused until the user's data_version changes"""
+
+    __slots__ = ("version", "body", "etag", "headers")
+
+    def __init__(self, version, body):
+        self.version = version
+        self.body = body
+        # Derived from the content, so every worker hands out the same tag for the same body
+        self.etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        self.headers = {"ETag": self.etag, "Cache-Control": CACHE_CONTROL}
+
+    def matches(self, if_none_match):
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or any(tag.removeprefix("W/") == self.etag for tag in tags)
+
+
+class ResponseCache:
+    """LRU cache of per-user response bodies, each valid for one version of the user's data
+
+    The version is users.data_version, bumped in the same transaction as every
+    write the cached endpoints show, and taken from the authenticated user. The
+    worker serving a write drops that user from its principal cache right away,
+    the others within PRINCIPAL_CACHE_SYNC_INTERVAL, so a write retires the
+    entries of every worker.
+    """
+
+    def __init__(self, max_size=RESPONSE_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id, key, version):
+        with self._lock:
+            entry = self._entries.get((user_id, key))
+            if entry is not None:
+                if entry.version == version:
+                    self._entries.move_to_end((user_id, key))
+                    self.hits += 1
+                    return entry
+                if entry.version < version:
+                    del self._entries[(user_id, key)]
+            self.misses += 1
+            return None
+
+    def set(self, user_id, key, version, body):
+        """Wrap body in a CachedResponse, kept unless an entry of a newer version was stored meanwhile"""
+        entry = CachedResponse(version, body)
+        with self._lock:
+            current = self._entries.get((user_id, key))
+            if current is None or current.version <= version:
+                self._entries[(user_id, key)] = entry
+                self._entries.move_to_end((user_id, key))
+                while len(self._entries) > self.max_size:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def evict(self, user_id):
+        """Drop every entry of a user, their versions mean nothing once the account is gone"""
+        with self._lock:
+            for cache_key in [cache_key for cache_key in self._entries if cache_key[0] == user_id]:
+                del self._entries[cache_key]
+
+    def revalidate(self, entry, if_none_match):
+        """True when the client already holds entry (If-None-Match lists its ETag), counted as a 304"""
+        if if_none_match is None or not entry.matches(if_none_match):
+            return False
+        with self._lock:
+            self.not_modified += 1
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "not_modified": self.not_modified, "size": len(self._entries)}
+
+
+response_cache = ResponseCache()
+
+
+def bump_data_version(user_id):
+    """UPDATE retiring the user's cached responses, run it in the transaction of the write"""
+    return update(models.User).where(models.User.id == user_id).values(data_version=models.User.data_version + 1)
+
+
+async def cached_json_response(request: Request, user, key, model, build):
+    """Serve model-validated JSON from the response cache, 304 when If-None-Match carries its ETag
+
+    user comes from get_current_user, which keeps its data_version in step with
+    the database (see PrincipalCache). build() is awaited on a miss and returns the data to validate
+    against the pydantic model. A hit is a dict lookup plus a string comparison.
+    """
+    entry = response_cache.get(user.id, key, user.data_version)
+    if entry is None:
+        body = model.model_validate(await build()).model_dump_json().encode()
+        entry = response_cache.set(user.id, key, user.data_version, body)
+    if response_cache.revalidate(entry, request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=entry.headers)
+    return Response(entry.body, media_type="application/json", headers=entry.headers)
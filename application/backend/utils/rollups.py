@@ -0,0 +1,170 @@
+import argparse
+from datetime import timedelta
+from sqlalchemy import select, delete, insert, func
+from sqlalchemy.dialects import postgresql, sqlite
+from .. import models
+
+
+PERIODS = ["week", "month"]
+
+# Tracker entry columns aggregated per bucket
+ROLLUP_METRICS = ["mood_score", "stress_level", "sleep_hours", "screen_time"]
+
+BACKFILL_CHUNK_SIZE = 1000
+
+
+def period_start(day, period):
+    """First day of the bucket holding day: the Monday of its ISO week or the 1st of its month"""
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    raise ValueError(f"Unknown rollup period: {period}")
+
+
+def period_label(start, period):
+    if period == "week":
+        year, week, _ = start.isocalendar()
+        return f"{year}-W{week:02d}"
+    return start.strftime("%Y-%m")
+
+
+def dialect_insert(dialect_name):
+    """insert() of the dialect, with ON CONFLICT and RETURNING support"""
+    if dialect_name == "postgresql":
+        return postgresql.insert
+    if dialect_name == "sqlite":
+        return sqlite.insert
+    raise NotImplementedError(f"ON CONFLICT inserts are not supported on {dialect_name}")
+
+
+def _upsert_dialect(dialect_name):
+    """insert() with ON CONFLICT support plus the two-argument least/greatest of the dialect"""
+    if dialect_name == "postgresql":
+        return dialect_insert(dialect_name), func.least, func.greatest
+    # SQLite's min()/max() with two arguments are scalar functions
+    return dialect_insert(dialect_name), func.min, func.max
+
+
+def rollup_upserts(dialect_name, user_id, day, values):
+    """Statements adding one entry (values: metric -> value) to the week and month buckets of day"""
+    upsert, least, greatest = _upsert_dialect(dialect_name)
+    table = models.TrackerRollup.__table__
+    statements = []
+    for period in PERIODS:
+        row = {"user_id": user_id, "period": period, "period_start": period_start(day, period), "entry_count": 1}
+        for metric in ROLLUP_METRICS:
+            row[f"{metric}_sum"] = values[metric]
+            row[f"{metric}_min"] = values[metric]
+            row[f"{metric}_max"] = values[metric]
+        statement = upsert(table).values(**row)
+        excluded = statement.excluded
+        updates = {"entry_count": table.c.entry_count + 1}
+        for metric in ROLLUP_METRICS:
+            updates[f"{metric}_sum"] = table.c[f"{metric}_sum"] + excluded[f"{metric}_sum"]
+            updates[f"{metric}_min"] = least(table.c[f"{metric}_min"], excluded[f"{metric}_min"])
+            updates[f"{metric}_max"] = greatest(table.c[f"{metric}_max"], excluded[f"{metric}_max"])
+        statements.append(statement.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.period, table.c.period_start],
+            set_=updates
+        ))
+    return statements
+
+
+async def add_entry_to_rollups(db, entry):
+    """Fold a new tracker entry into its user's rollups, in the caller's transaction"""
+    values = {metric: getattr(entry, metric) for metric in ROLLUP_METRICS}
+    for statement in rollup_upserts(db.bind.dialect.name, entry.user_id, entry.date, values):
+        await db.execute(statement)
+
+
+def rollup_bucket(row):
+    """Public shape of one rollup row, as served by /tracker/trends"""
+    bucket = {
+        "period_start": row.period_start,
+        "label": period_label(row.period_start, row.period),
+        "count": row.entry_count,
+    }
+    for metric in ROLLUP_METRICS:
+        bucket[metric] = {
+            "mean": round(getattr(row, f"{metric}_sum") / row.entry_count, 2) if row.entry_count else None,
+            "min": getattr(row, f"{metric}_min"),
+            "max": getattr(row, f"{metric}_max"),
+        }
+    return bucket
+
+
+def _aggregate(rows):
+    buckets = {}
+    for row in rows:
+        for period in PERIODS:
+            key = (row.user_id, period, period_start(row.date, period))
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = {"user_id": key[0], "period": period, "period_start": key[2], "entry_count": 0}
+                for metric in ROLLUP_METRICS:
+                    bucket[f"{metric}_sum"] = 0.0
+                    bucket[f"{metric}_min"] = None
+                    bucket[f"{metric}_max"] = None
+            bucket["entry_count"] += 1
+            for metric in ROLLUP_METRICS:
+                value = getattr(row, metric)
+                bucket[f"{metric}_sum"] += value
+                if bucket[f"{metric}_min"] is None or value < bucket[f"{metric}_min"]:
+                    bucket[f"{metric}_min"] = value
+                if bucket[f"{metric}_max"] is None or value > bucket[f"{metric}_max"]:
+                    bucket[f"{metric}_max"] = value
+    return list(buckets.values())
+
+
+def rebuild_rollups(db, user_ids=None):
+    """Recompute the rollups of the given users (None: everyone) from their tracker entries
+
+    Runs on a sync session. Entries are streamed per user, so memory stays at one user's buckets.
+    Returns the number of rollup rows written.
+    """
+    entry = models.TrackerEntry
+    clear = delete(models.TrackerRollup)
+    query = select(entry.user_id, entry.date, *[getattr(entry, metric) for metric in ROLLUP_METRICS]).where(
+        # Entries only get a mood/stress score once predicted, the rest of the metrics come with them
+        *[getattr(entry, metric).is_not(None) for metric in ROLLUP_METRICS]
+    )
+    if user_ids is not None:
+        clear = clear.where(models.TrackerRollup.user_id.in_(user_ids))
+        query = query.where(entry.user_id.in_(user_ids))
+    db.execute(clear)
+
+    written = 0
+    current_user, rows = None, []
+
+    def flush():
+        nonlocal written
+        buckets = _aggregate(rows)
+        if buckets:
+            db.execute(insert(models.TrackerRollup), buckets)
+        written += len(buckets)
+        rows.clear()
+
+    result = db.execute(query.order_by(entry.user_id).execution_options(yield_per=BACKFILL_CHUNK_SIZE))
+    for row in result:
+        if row.user_id != current_user:
+            flush()
+            current_user = row.user_id
+        rows.append(row)
+    flush()
+    db.commit()
+    return written
+
+
+if __name__ == "__main__":
+    from ..database import SessionLocal, init_db
+
+    parser = argparse.ArgumentParser(description="Rebuild the weekly/monthly tracker rollups from tracker entries")
+    parser.add_argument("--user-id", type=int, action="append", help="Only rebuild this user, can be repeated")
+    args = parser.parse_args()
+    init_db()
+    db = SessionLocal()
+    try:
+        print(f"Wrote {rebuild_rollups(db, args.user_id)} rollup rows")
+    finally:
+        db.close()
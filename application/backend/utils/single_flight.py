@@ -0,0 +1,42 @@
+import asyncio
+
+
+# Set on a call's future when it failed, waiting duplicates then run the call themselves
+_FAILED = object()
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one, the duplicates await its result
+
+    Only calls that overlap in time are merged, nothing is cached once the call
+    returns. A failed or cancelled call is not shared: each duplicate that was
+    waiting on it retries on its own, so one client's disconnect never fails another.
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    async def run(self, key, call):
+        """Await call() or the in-flight call with the same key, returns (result, shared)"""
+        while True:
+            future = self._calls.get(key)
+            if future is None:
+                break
+            result = await asyncio.shield(future)
+            if result is not _FAILED:
+                return result, True
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await call()
+        except BaseException:
+            future.set_result(_FAILED)
+            raise
+        finally:
+            del self._calls[key]
+        future.set_result(result)
+        return result, False
+
+    def __len__(self):
+        return len(self._calls)
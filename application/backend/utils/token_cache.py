@@ -0,0 +1,61 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "4096"))
+
+
+class TokenClaimsCache:
+    """LRU of access tokens whose signature was already verified, mapped to their claims
+
+    Entries are keyed by the whole token (header, payload and signature) and
+    expire together with the token, so a hit is exactly as valid as decoding again.
+    """
+
+    def __init__(self, max_size=TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        with self._lock:
+            claims = self._entries.get(token)
+            if claims is not None:
+                if claims["exp"] > time.time():
+                    self._entries.move_to_end(token)
+                    self.hits += 1
+                    return claims
+                del self._entries[token]
+            self.misses += 1
+            return None
+
+    def set(self, token, claims):
+        if "exp" not in claims:
+            # Never cache tokens that do not expire
+            return
+        with self._lock:
+            self._entries[token] = claims
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def evict_subject(self, subject):
+        """Drop every token issued to subject, e.g. once the account was deleted"""
+        with self._lock:
+            for token in [token for token, claims in self._entries.items() if claims.get("sub") == subject]:
+                del self._entries[token]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+token_cache = TokenClaimsCache()
@@ -44,7 +44,9 @@ const Profile = () => {
         }
       });
       // Fetch tracker history jika sudah ada endpointnya
-      getData("/tracker/history").then(setHistory);
+      // Latest entries come newest first, the chart and table show them oldest first
+      getData("/tracker/history", { fields: "date,mood_score,stress_level" })
+        .then((data) => setHistory([...data.items].reverse()));
   }, [navigate]);
 
   const chartData = {
@@ -1,6 +1,6 @@
 import { useState } from "react";
 import ReactMarkdown from 'react-markdown';
-import { postData } from '../utils/api';
+import { getData, postData } from '../utils/api';
 import { toast } from 'react-toastify';
 
 const initialInput = {
@@ -17,12 +17,17 @@ const initialInput = {
 const sleepQualityOptions = ["Poor", "Fair", "Good", "Excellent"];
 const weatherOptions = ["Cloudy", "Rainy", "Sunny"];
 const dietQualityOptions = ["Average", "Good", "Poor"];
+const RECOMMENDATION_POLL_INTERVAL = 2000;
+const RECOMMENDATION_POLL_ATTEMPTS = 60;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
 
 const Tracker = () => {
   const [input, setInput] = useState(initialInput);
   const [result, setResult] = useState(null);
   const [aiMarkdown, setAiMarkdown] = useState("");
   const [loading, setLoading] = useState(false);
+  const [recommendationLoading, setRecommendationLoading] = useState(false);
 
   const handleChange = (e) => {
     const { name, value, type } = e.target;
@@ -32,6 +37,29 @@ const Tracker = () => {
     }));
   };
 
+  const pollRecommendation = async (entryId) => {
+    setRecommendationLoading(true);
+    try {
+      for (let attempt = 0; attempt < RECOMMENDATION_POLL_ATTEMPTS; attempt++) {
+        const data = await getData(`/tracker/recommendation/${entryId}`);
+        if (data.recommendation_status === "ready") {
+          setAiMarkdown(data.ai_recommendation || "");
+          return;
+        }
+        if (data.recommendation_status === "failed") {
+          toast.error("Failed to generate AI recommendations.");
+          return;
+        }
+        await sleep(RECOMMENDATION_POLL_INTERVAL);
+      }
+      toast.info("AI recommendations are taking longer than usual, check back later.");
+    } catch (err) {
+      toast.error("Failed to load AI recommendations.");
+    } finally {
+      setRecommendationLoading(false);
+    }
+  };
+
   const handlePredict = async () => {
     setLoading(true);
     const payload = {
@@ -55,6 +83,9 @@ const Tracker = () => {
         stressLevel: data.stress_level,
       });
       setAiMarkdown(data.ai_recommendation || "");
+      if (data.recommendation_status === "pending") {
+        pollRecommendation(data.id);
+      }
     } catch (err) {
       toast.error("Failed to predict mental health status.");
       setResult(null);
@@ -221,6 +252,11 @@ const Tracker = () => {
             </div>
         </div>
       )}
+      {recommendationLoading && (
+        <div className="mt-8 bg-gray-50 rounded-lg p-6 shadow text-center text-gray-600">
+            Generating AI recommendations...
+        </div>
+      )}
       {aiMarkdown && (
         <div className="mt-8 bg-gray-50 rounded-lg p-6 shadow">
             <ReactMarkdown>{aiMarkdown}</ReactMarkdown>
@@ -1,12 +1,17 @@
 import streamlit as st
-import numpy as np
 import joblib
+import os
+import sys
 import plotly.express as px
 import plotly.graph_objects as go
 from ai_agent import mental_health_agent
 import warnings
 warnings.filterwarnings('ignore')
 
+# Share the feature encoding with the FastAPI backend
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'application'))
+from backend.utils.encoding import FeatureEncoder, prepare_input_data
+
 # Page configuration
 st.set_page_config(
     page_title="Mental Health Tracker",
@@ -50,7 +55,8 @@ def load_models():
         le_sleep = joblib.load('../models/le_sleep_quality.joblib')
         le_weather = joblib.load('../models/le_weather.joblib')
         scaler = joblib.load('../models/scaler.joblib')
-        return model, le_diet, le_sleep, le_weather, scaler
+        encoder = FeatureEncoder.from_label_encoders(le_diet, le_sleep, le_weather)
+        return model, encoder, scaler
     except FileNotFoundError as e:
         st.error(f"Model file not found: {e}")
         st.stop()
@@ -61,7 +67,7 @@ def main():
     st.markdown("---")
     
     # Load models
-    model, le_diet, le_sleep, le_weather, scaler = load_models()
+    model, encoder, scaler = load_models()
     
     # Sidebar for input
     st.sidebar.header("📝 Input Your Daily Data")
@@ -97,7 +103,7 @@ def main():
         input_data = prepare_input_data(
             sleep_hours, sleep_quality, screen_time, physical_activity,
             social_interaction, work_productivity, weather, diet_quality,
-            le_diet, le_sleep, le_weather, scaler
+            encoder, scaler
         )
         
         # Make prediction
@@ -116,31 +122,6 @@ def main():
         display_recommendations(mood_score, stress_level, sleep_hours, 
                               screen_time, physical_activity)
 
-def prepare_input_data(sleep_hours, sleep_quality, screen_time, physical_activity,
-                      social_interaction, work_productivity, weather, diet_quality,
-                      le_diet, le_sleep, le_weather, scaler):
-    """Prepare input data for prediction"""
-    
-    # Encode categorical variables
-    sleep_quality_encoded = le_sleep.transform([sleep_quality])[0]
-    weather_encoded = le_weather.transform([weather])[0]
-    diet_quality_encoded = le_diet.transform([diet_quality])[0]
-    
-    # Create input array
-    input_data = np.array([[
-        sleep_hours,
-        sleep_quality_encoded,
-        screen_time,
-        physical_activity,
-        social_interaction,
-        work_productivity,
-        weather_encoded,
-        diet_quality_encoded
-    ]])
-    input_data = scaler.transform(input_data)
-    
-    return input_data
-
 def display_predictions(mood_score, stress_level):
     """Display prediction results"""
     col1, col2 = st.columns(2)